@@ -6,7 +6,10 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 
-from .const import DOMAIN
+from .const import CONF_GTFS_STATIC, DOMAIN
+from .gtfs import async_schedule_gtfs_updates
+from .hub import TransportNSWHub, async_remove_snapshots, get_hub
+from .sensor import async_update_stops
 
 PLATFORMS: list[Platform] = [Platform.SENSOR]
 
@@ -18,21 +21,39 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Set up an update listener to handle config changes (including subentry updates)
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
+    # Restore the saved departures and the requests already sent today
+    hub = get_hub(hass, entry)
+    await hub.async_load()
+
+    # The offline stop index is built from the GTFS static bundle
+    if entry.options.get(CONF_GTFS_STATIC, False):
+        async_schedule_gtfs_updates(hass, entry, hub)
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Handle config entry update by reloading the integration."""
-    # Check if this is a subentry update vs a main entry update
-    # For now, we'll use a full reload for all changes to ensure consistency
-    # In the future, we could implement selective updates for better performance
-    await hass.config_entries.async_reload(entry.entry_id)
+    """Handle config entry update.
+
+    Added, removed and edited stops are applied in place; anything else,
+    such as a new API key or options, reloads the whole entry.
+    """
+    if not await async_update_stops(hass, entry):
+        await hass.config_entries.async_reload(entry.entry_id)
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+        hub = hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+        # Make sure the next setup restores the latest departures
+        if isinstance(hub, TransportNSWHub):
+            await hub.async_flush_snapshots()
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the saved departures of a deleted config entry."""
+    await async_remove_snapshots(hass, entry)
@@ -0,0 +1,317 @@
+"""Async client for the Transport NSW Open Data API."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+import logging
+from typing import Any
+
+import aiohttp
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import json_loads_object
+
+from .departures import TRANSPORT_MODE_CLASSES, DepartureQuery
+from .journeys import JourneyQuery
+from .stats import PHASE_REQUEST, FetchTrace
+
+_LOGGER = logging.getLogger(__name__)
+
+API_BASE_URL = "https://api.transport.nsw.gov.au/v1/tp"
+REQUEST_TIMEOUT = 10
+
+# Dates and times sent to the trip planner API are in Sydney time
+API_TIME_ZONE = "Australia/Sydney"
+
+# The complete GTFS static bundle is a large download, so it gets its own
+# timeout and is streamed in chunks
+GTFS_SCHEDULE_URL = (
+    "https://api.transport.nsw.gov.au/v1/publictransport/timetables/complete/gtfs"
+)
+DOWNLOAD_TIMEOUT = 900
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# GTFS-realtime feeds are protobuf files of up to a few megabytes
+GTFS_REALTIME_BASE_URL = "https://api.transport.nsw.gov.au"
+FEED_TIMEOUT = 30
+
+DEPARTURE_MONITOR_PARAMS = {
+    "outputFormat": "rapidJSON",
+    "coordOutputFormat": "EPSG:4326",
+    "mode": "direct",
+    "type_dm": "stop",
+    "departureMonitorMacro": "true",
+    "TfNSWDM": "true",
+    "version": "10.2.1.42",
+}
+
+# A handful of journeys leaving after the requested time is plenty for the
+# sensors, and keeps the response small
+TRIP_PARAMS = {
+    "outputFormat": "rapidJSON",
+    "coordOutputFormat": "EPSG:4326",
+    "depArrMacro": "dep",
+    "type_origin": "any",
+    "type_destination": "any",
+    "calcNumberOfTrips": "6",
+    "TfNSWTR": "true",
+    "version": "10.2.1.42",
+}
+
+STOP_FINDER_PARAMS = {
+    "outputFormat": "rapidJSON",
+    "coordOutputFormat": "EPSG:4326",
+    "TfNSWSF": "true",
+    "version": "10.2.1.42",
+}
+
+
+class TransportNSWError(Exception):
+    """Base error for the Transport NSW API."""
+
+
+class TransportNSWConnectionError(TransportNSWError):
+    """Error raised when the API cannot be reached or times out."""
+
+
+class TransportNSWAuthError(TransportNSWError):
+    """Error raised when the API key is rejected."""
+
+
+class TransportNSWResponseError(TransportNSWError):
+    """Error raised when the API returns an unexpected response.
+
+    retry_after is the number of seconds the API asked clients to wait before
+    trying again, if it did.
+    """
+
+    def __init__(
+        self, message: str, status: int, retry_after: float | None = None
+    ) -> None:
+        """Initialize the error."""
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TransportNSWRateLimitError(TransportNSWResponseError):
+    """Error raised when the API key is over its rate limit or quota."""
+
+
+class TransportNSWApiClient:
+    """Talk to the Transport NSW Trip Planner APIs.
+
+    Requests share the given aiohttp session, so connections are kept alive
+    between polls instead of being opened for every request.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        api_key: str,
+        base_url: str = API_BASE_URL,
+    ) -> None:
+        """Initialize the client."""
+        self._session = session
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+
+    async def async_get_departure_monitor(
+        self,
+        stop_id: str,
+        trace: FetchTrace | None = None,
+        query: DepartureQuery | None = None,
+    ) -> dict[str, Any]:
+        """Return the raw departure monitor response for a stop.
+
+        The API narrows the departures to those the query asks for. The
+        request's duration and response size are added to trace.
+        """
+        params = {**DEPARTURE_MONITOR_PARAMS, "name_dm": stop_id}
+        if query is not None:
+            if query.max_results is not None:
+                params["limit"] = str(query.max_results)
+            if excluded := query.excluded_modes & TRANSPORT_MODE_CLASSES.keys():
+                params["excludedMeans"] = "checkbox"
+                for mode in sorted(excluded):
+                    params[f"exclMOT_{TRANSPORT_MODE_CLASSES[mode]}"] = "1"
+            if query.offset:
+                departs_after = (dt_util.utcnow() + query.offset).astimezone(
+                    dt_util.get_time_zone(API_TIME_ZONE)
+                )
+                params["itdDate"] = departs_after.strftime("%Y%m%d")
+                params["itdTime"] = departs_after.strftime("%H%M")
+        return await self._async_request("departure_mon", params, trace)
+
+    async def async_get_trip(
+        self,
+        query: JourneyQuery,
+        departs_after: datetime,
+        trace: FetchTrace | None = None,
+    ) -> dict[str, Any]:
+        """Return the raw trip planner response for journeys leaving after a time.
+
+        The request's duration and response size are added to trace.
+        """
+        departs_after = departs_after.astimezone(dt_util.get_time_zone(API_TIME_ZONE))
+        params = {
+            **TRIP_PARAMS,
+            "name_origin": query.origin,
+            "name_destination": query.destination,
+            "itdDate": departs_after.strftime("%Y%m%d"),
+            "itdTime": departs_after.strftime("%H%M"),
+        }
+        if query.via:
+            params["type_via"] = "any"
+            params["name_via"] = query.via
+        return await self._async_request("trip", params, trace)
+
+    async def async_get_stop_finder(
+        self, name: str, stop_type: str = "stop", max_results: int | None = None
+    ) -> dict[str, Any]:
+        """Return the raw stop finder response for a stop ID or name.
+
+        max_results caps the number of locations returned, which keeps the
+        response small when only the key or a single stop matters.
+        """
+        params = {**STOP_FINDER_PARAMS, "type_sf": stop_type, "name_sf": name}
+        if max_results is not None:
+            params["anyMaxSizeHitList"] = str(max_results)
+        return await self._async_request("stop_finder", params)
+
+    async def async_download_gtfs_schedule(
+        self,
+        write: Callable[[bytes], Awaitable[Any]],
+        url: str = GTFS_SCHEDULE_URL,
+    ) -> None:
+        """Download the GTFS static bundle, passing each chunk to write."""
+        try:
+            async with (
+                asyncio.timeout(DOWNLOAD_TIMEOUT),
+                self._session.get(
+                    url, headers=self._headers("application/zip")
+                ) as response,
+            ):
+                self._raise_for_status(response)
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    await write(chunk)
+        except TimeoutError as exc:
+            raise TransportNSWConnectionError(
+                "Timeout downloading the Transport NSW GTFS bundle"
+            ) from exc
+        except aiohttp.ClientError as exc:
+            raise TransportNSWConnectionError(
+                f"Error downloading the Transport NSW GTFS bundle: {exc}"
+            ) from exc
+
+    async def async_get_realtime_feed(
+        self, path: str, trace: FetchTrace | None = None
+    ) -> bytes:
+        """Return the raw protobuf of a GTFS-realtime feed, e.g. v2/gtfs/realtime/metro."""
+        url = f"{GTFS_REALTIME_BASE_URL}/{path}"
+        if trace is None:
+            trace = FetchTrace()
+        try:
+            with trace.phase(PHASE_REQUEST):
+                async with (
+                    asyncio.timeout(FEED_TIMEOUT),
+                    self._session.get(
+                        url, headers=self._headers("application/x-google-protobuf")
+                    ) as response,
+                ):
+                    self._raise_for_status(response)
+                    data = await response.read()
+            trace.payload_bytes = len(data)
+            return data
+        except TimeoutError as exc:
+            raise TransportNSWConnectionError(
+                f"Timeout requesting {path} from Transport NSW"
+            ) from exc
+        except aiohttp.ClientError as exc:
+            raise TransportNSWConnectionError(
+                f"Error requesting {path} from Transport NSW: {exc}"
+            ) from exc
+
+    def _headers(self, accept: str = "application/json") -> dict[str, str]:
+        """Return the request headers, including the API key."""
+        return {"Accept": accept, "Authorization": f"apikey {self.api_key}"}
+
+    @staticmethod
+    def _raise_for_status(response: aiohttp.ClientResponse) -> None:
+        """Raise the matching error for an unsuccessful response."""
+        if response.status in (401, 403):
+            raise TransportNSWAuthError(
+                f"API key rejected by Transport NSW ({response.status})"
+            )
+        if response.status == 429:
+            raise TransportNSWRateLimitError(
+                "Rate limit of the API key exceeded (429)",
+                response.status,
+                _retry_after(response),
+            )
+        if response.status != 200:
+            raise TransportNSWResponseError(
+                f"Unexpected response from Transport NSW ({response.status})",
+                response.status,
+                _retry_after(response),
+            )
+
+    async def _async_request(
+        self,
+        endpoint: str,
+        params: dict[str, str],
+        trace: FetchTrace | None = None,
+    ) -> dict[str, Any]:
+        """Send a GET request and return the decoded JSON body."""
+        if trace is None:
+            trace = FetchTrace()
+        try:
+            with trace.phase(PHASE_REQUEST):
+                async with (
+                    asyncio.timeout(REQUEST_TIMEOUT),
+                    self._session.get(
+                        f"{self.base_url}/{endpoint}",
+                        params=params,
+                        headers=self._headers(),
+                    ) as response,
+                ):
+                    self._raise_for_status(response)
+                    body = await response.read()
+            trace.payload_bytes = len(body)
+            trace.body = body
+            try:
+                return json_loads_object(body)
+            except ValueError as exc:
+                raise TransportNSWResponseError(
+                    "Invalid JSON in Transport NSW response", response.status
+                ) from exc
+        except TimeoutError as exc:
+            raise TransportNSWConnectionError(
+                f"Timeout requesting {endpoint} from Transport NSW"
+            ) from exc
+        except aiohttp.ClientError as exc:
+            raise TransportNSWConnectionError(
+                f"Error requesting {endpoint} from Transport NSW: {exc}"
+            ) from exc
+
+
+def _retry_after(response: aiohttp.ClientResponse) -> float | None:
+    """Return the seconds to wait from a Retry-After header, if there is one.
+
+    The header holds either a number of seconds or an HTTP date.
+    """
+    if (value := response.headers.get("Retry-After")) is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=dt_util.UTC)
+    return max((retry_at - dt_util.utcnow()).total_seconds(), 0.0)
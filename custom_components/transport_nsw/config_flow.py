@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
+from datetime import timedelta
+from hashlib import sha256
 import logging
+from time import monotonic
 from typing import Any, NoReturn
 
-from TransportNSW import TransportNSW
 import voluptuous as vol
 
 from homeassistant.config_entries import (
@@ -18,26 +20,79 @@ from homeassistant.config_entries import (
 )
 from homeassistant.const import CONF_API_KEY, CONF_NAME
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.selector import TextSelector
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.selector import (
+    BooleanSelector,
+    NumberSelector,
+    NumberSelectorConfig,
+    NumberSelectorMode,
+    SelectOptionDict,
+    SelectSelector,
+    SelectSelectorConfig,
+    SelectSelectorMode,
+    TextSelector,
+)
+from homeassistant.util import dt as dt_util
 
+from .api import TransportNSWApiClient
 from .const import (
+    CONF_ADAPTIVE_POLLING,
+    CONF_DEFER_FIRST_REFRESH,
+    CONF_DEPARTURE_COUNT,
+    CONF_DEPARTURE_OFFSET,
     CONF_DESTINATION,
+    CONF_DESTINATION_ID,
+    CONF_EXCLUDED_MODES,
+    CONF_GTFS_STATIC,
+    CONF_MAX_RESULTS,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_ORIGIN_ID,
+    CONF_RANKED_SENSORS,
+    CONF_REALTIME_FEEDS,
+    CONF_RECORD_STATE_ONLY,
     CONF_ROUTE,
     CONF_STOP_ID,
+    CONF_STOP_SEARCH,
+    CONF_VIA_ID,
+    DEFAULT_DEPARTURE_COUNT,
+    DEFAULT_DEPARTURE_OFFSET,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
     DEFAULT_NAME,
     DOMAIN,
+    MAX_DEPARTURE_COUNT,
+    MAX_DEPARTURE_OFFSET,
+    MAX_RESULTS,
+    SUBENTRY_TYPE_JOURNEY,
     SUBENTRY_TYPE_STOP,
 )
+from .departures import TRANSPORT_MODES
+from .gtfs import async_get_stop_index
+from .journeys import JourneyQuery
+from .realtime import REALTIME_FEEDS
 
 _LOGGER = logging.getLogger(__name__)
 
+# API keys are checked with a single-result stop finder lookup for this stop
+# (Central), which is a small fraction of the size of its departure board
+API_KEY_TEST_STOP = "10101100"
+
+# Keys that passed validation recently are not checked again, so repeated
+# submissions of the config and options flows don't cost a request each.
+# They are kept by hash in hass.data, apart from the per-entry hubs.
+VALIDATED_API_KEYS = f"{DOMAIN}_validated_api_keys"
+API_KEY_VALIDATION_TTL = timedelta(minutes=10)
+
 
 def _raise_no_data() -> NoReturn:
     """Raise ValueError for no data returned."""
     raise ValueError("No data returned from API")
 
 
-def _generate_subentry_title(data: dict[str, Any]) -> str:
+def _generate_subentry_title(
+    data: dict[str, Any], stop_name: str | None = None
+) -> str:
     """Generate descriptive title for subentry with route/destination context."""
     # Check for custom name first (highest priority)
     custom_name = data.get(CONF_NAME, "").strip()
@@ -48,8 +103,9 @@ def _generate_subentry_title(data: dict[str, Any]) -> str:
     route = data.get(CONF_ROUTE, "").strip()
     destination = data.get(CONF_DESTINATION, "").strip()
 
-    # Generate contextual title based on available information
-    title_parts = [f"Stop {stop_id}"]
+    # Generate contextual title based on available information, using the
+    # stop's name when it is known from the offline stop index
+    title_parts = [stop_name or f"Stop {stop_id}"]
 
     if route and destination:
         title_parts.append(f"({route} → {destination})")
@@ -76,17 +132,132 @@ SUBENTRY_SCHEMA = vol.Schema(
         vol.Optional(CONF_NAME, default=""): TextSelector(),
         vol.Optional(CONF_ROUTE, default=""): TextSelector(),
         vol.Optional(CONF_DESTINATION, default=""): TextSelector(),
+        vol.Optional(
+            CONF_DEPARTURE_COUNT, default=DEFAULT_DEPARTURE_COUNT
+        ): NumberSelector(
+            NumberSelectorConfig(
+                min=1, max=MAX_DEPARTURE_COUNT, step=1, mode=NumberSelectorMode.BOX
+            )
+        ),
+        vol.Optional(CONF_RANKED_SENSORS, default=False): BooleanSelector(),
+        # Narrowing applied by the API, so responses stay small
+        vol.Optional(CONF_MAX_RESULTS): NumberSelector(
+            NumberSelectorConfig(
+                min=1, max=MAX_RESULTS, step=1, mode=NumberSelectorMode.BOX
+            )
+        ),
+        # Modes are offered by the names the sensors show them as
+        vol.Optional(CONF_EXCLUDED_MODES, default=[]): SelectSelector(
+            SelectSelectorConfig(options=list(TRANSPORT_MODES.values()), multiple=True)
+        ),
+        vol.Optional(
+            CONF_DEPARTURE_OFFSET, default=DEFAULT_DEPARTURE_OFFSET
+        ): NumberSelector(
+            NumberSelectorConfig(
+                min=0,
+                max=MAX_DEPARTURE_OFFSET,
+                step=1,
+                unit_of_measurement="min",
+                mode=NumberSelectorMode.BOX,
+            )
+        ),
+    }
+)
+
+# Journey subentry schema - the stops a journey goes between
+JOURNEY_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_ORIGIN_ID): TextSelector(),
+        vol.Required(CONF_DESTINATION_ID): TextSelector(),
+        vol.Optional(CONF_VIA_ID, default=""): TextSelector(),
+        vol.Optional(CONF_NAME, default=""): TextSelector(),
     }
 )
 
+# Search step shown before the subentry schema when the offline stop index
+# is available
+SEARCH_SCHEMA = vol.Schema({vol.Required(CONF_STOP_SEARCH): TextSelector()})
+
+
+def _subentry_schema(stop_options: list[SelectOptionDict] | None) -> vol.Schema:
+    """Return the subentry schema, offering the stops found by a search."""
+    if not stop_options:
+        return SUBENTRY_SCHEMA
+    return SUBENTRY_SCHEMA.extend(
+        {
+            vol.Required(CONF_STOP_ID): SelectSelector(
+                SelectSelectorConfig(
+                    options=stop_options,
+                    custom_value=True,
+                    mode=SelectSelectorMode.DROPDOWN,
+                )
+            )
+        }
+    )
+
+
 OPTIONS_SCHEMA = vol.Schema(
     {
         vol.Optional(CONF_API_KEY, default=""): TextSelector(),
         vol.Optional(CONF_NAME, default=DEFAULT_NAME): TextSelector(),
+        vol.Optional(CONF_ADAPTIVE_POLLING, default=False): BooleanSelector(),
+        vol.Optional(
+            CONF_MIN_UPDATE_INTERVAL, default=DEFAULT_MIN_UPDATE_INTERVAL
+        ): NumberSelector(
+            NumberSelectorConfig(
+                min=10,
+                max=300,
+                step=5,
+                unit_of_measurement="s",
+                mode=NumberSelectorMode.BOX,
+            )
+        ),
+        vol.Optional(
+            CONF_MAX_UPDATE_INTERVAL, default=DEFAULT_MAX_UPDATE_INTERVAL
+        ): NumberSelector(
+            NumberSelectorConfig(
+                min=60,
+                max=3600,
+                step=30,
+                unit_of_measurement="s",
+                mode=NumberSelectorMode.BOX,
+            )
+        ),
+        vol.Optional(CONF_DEFER_FIRST_REFRESH, default=False): BooleanSelector(),
+        vol.Optional(CONF_RECORD_STATE_ONLY, default=False): BooleanSelector(),
+        vol.Optional(CONF_GTFS_STATIC, default=False): BooleanSelector(),
+        vol.Optional(CONF_REALTIME_FEEDS, default=[]): SelectSelector(
+            SelectSelectorConfig(
+                options=list(REALTIME_FEEDS),
+                multiple=True,
+                translation_key=CONF_REALTIME_FEEDS,
+            )
+        ),
     }
 )
 
 
+async def async_validate_api_key(hass: HomeAssistant, api_key: str) -> None:
+    """Check an API key with the smallest request the API allows.
+
+    Raises the client's errors if the key is rejected or the API cannot be
+    reached. Keys validated within the last API_KEY_VALIDATION_TTL are
+    accepted without a request.
+    """
+    validated: dict[str, float] = hass.data.setdefault(VALIDATED_API_KEYS, {})
+    key_hash = sha256(api_key.encode()).hexdigest()
+    checked_at = validated.get(key_hash)
+    if (
+        checked_at is not None
+        and monotonic() - checked_at < API_KEY_VALIDATION_TTL.total_seconds()
+    ):
+        return
+
+    client = TransportNSWApiClient(async_get_clientsession(hass), api_key)
+    await client.async_get_stop_finder(API_KEY_TEST_STOP, max_results=1)
+    validated[key_hash] = monotonic()
+
+
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
     """Validate the user input allows us to connect.
 
@@ -95,19 +266,8 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
     api_key = data[CONF_API_KEY]
     custom_name = data.get(CONF_NAME, "").strip()
 
-    # Test the API connection with a dummy stop ID
-    transport_nsw = TransportNSW()
-
     try:
-        # Try to get departures with a known valid stop ID to validate the API key
-        # Using Central Station stop ID as a test
-        await hass.async_add_executor_job(
-            transport_nsw.get_departures, "10101100", "", "", api_key
-        )
-
-        # We don't care about the result content, just that the API key works
-        # Even if this specific stop has no departures, a valid API key should not raise
-
+        await async_validate_api_key(hass, api_key)
     except Exception as exc:
         _LOGGER.error("Error connecting to Transport NSW API: %s", exc)
         raise ValueError("Cannot connect to Transport NSW API") from exc
@@ -131,17 +291,20 @@ async def validate_subentry_input(
     Data has the keys from SUBENTRY_SCHEMA with values provided by the user.
     """
     stop_id = data[CONF_STOP_ID]
-    route = data.get(CONF_ROUTE, "")
-    destination = data.get(CONF_DESTINATION, "")
+
+    # Stops in the offline index are known to exist, so no request is needed.
+    # The departure monitor also accepts IDs that aren't in the GTFS data,
+    # so anything else is still checked with the API.
+    index = await async_get_stop_index(hass)
+    if index is not None and (stop_name := index.get(stop_id)) is not None:
+        return {"title": _generate_subentry_title(data, stop_name)}
 
     # Test the API connection
-    transport_nsw = TransportNSW()
+    client = TransportNSWApiClient(async_get_clientsession(hass), api_key)
 
     try:
         # Try to get departures to validate the stop ID
-        result = await hass.async_add_executor_job(
-            transport_nsw.get_departures, stop_id, route, destination, api_key
-        )
+        result = await client.async_get_departure_monitor(stop_id)
 
         # Check if we got a valid response
         if result is None:
@@ -157,6 +320,48 @@ async def validate_subentry_input(
     return {"title": _generate_subentry_title(data)}
 
 
+async def validate_journey_input(
+    hass: HomeAssistant, api_key: str, data: dict[str, Any]
+) -> dict[str, Any]:
+    """Validate the journey subentry input allows us to connect.
+
+    Data has the keys from JOURNEY_SCHEMA with values provided by the user.
+    """
+    query = JourneyQuery.from_config(data)
+    stop_ids = [query.origin, query.destination]
+    if query.via:
+        stop_ids.append(query.via)
+
+    # Journeys between stops in the offline index are planned without a
+    # check, like stops. Anything else is checked with a single trip request.
+    index = await async_get_stop_index(hass)
+    names = [index.get(stop_id) if index else None for stop_id in stop_ids]
+    if None in names:
+        client = TransportNSWApiClient(async_get_clientsession(hass), api_key)
+        try:
+            result = await client.async_get_trip(query, dt_util.utcnow())
+            if result is None:
+                _raise_no_data()
+        except Exception as exc:
+            _LOGGER.error(
+                "Error planning a journey from %s to %s: %s",
+                query.origin,
+                query.destination,
+                exc,
+            )
+            raise ValueError("Cannot connect to Transport NSW API") from exc
+
+    if custom_name := data.get(CONF_NAME, "").strip():
+        return {"title": custom_name}
+    origin, destination, *via = [
+        name or f"Stop {stop_id}" for stop_id, name in zip(stop_ids, names, strict=True)
+    ]
+    title = f"{origin} → {destination}"
+    if via:
+        title = f"{title} via {via[0]}"
+    return {"title": title}
+
+
 class TransportNSWConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Transport NSW."""
 
@@ -200,7 +405,10 @@ class TransportNSWConfigFlow(ConfigFlow, domain=DOMAIN):
         cls, config_entry: ConfigEntry
     ) -> dict[str, type[ConfigSubentryFlow]]:
         """Return supported subentry types."""
-        return {SUBENTRY_TYPE_STOP: TransportNSWSubentryFlowHandler}
+        return {
+            SUBENTRY_TYPE_STOP: TransportNSWSubentryFlowHandler,
+            SUBENTRY_TYPE_JOURNEY: TransportNSWJourneySubentryFlowHandler,
+        }
 
 
 class TransportNSWOptionsFlow(OptionsFlow):
@@ -220,7 +428,11 @@ class TransportNSWOptionsFlow(OptionsFlow):
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
         """Manage the options."""
-        if user_input is not None:
+        errors: dict[str, str] = {}
+
+        if user_input is not None and not (
+            errors := await self._async_validate_options(user_input)
+        ):
             # Check if name or API key was changed
             new_name = user_input.get(CONF_NAME, "").strip()
             current_name = self.config_entry.data.get(CONF_NAME, "").strip()
@@ -285,12 +497,40 @@ class TransportNSWOptionsFlow(OptionsFlow):
                 OPTIONS_SCHEMA,
                 user_input or current_options,
             ),
+            errors=errors,
         )
 
+    async def _async_validate_options(
+        self, user_input: dict[str, Any]
+    ) -> dict[str, str]:
+        """Return the errors in the submitted options, if any."""
+        if user_input.get(
+            CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL
+        ) > user_input.get(CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL):
+            return {CONF_MAX_UPDATE_INTERVAL: "invalid_update_interval"}
+        if not await self._async_api_key_valid(user_input):
+            return {"base": "cannot_connect"}
+        return {}
+
+    async def _async_api_key_valid(self, user_input: dict[str, Any]) -> bool:
+        """Return whether a changed API key works; an unchanged one is not checked."""
+        new_api_key = user_input.get(CONF_API_KEY, "").strip()
+        if new_api_key == self.config_entry.data.get(CONF_API_KEY, "").strip():
+            return True
+
+        try:
+            await async_validate_api_key(self.hass, new_api_key)
+        except Exception as exc:  # noqa: BLE001  # pylint: disable=broad-exception-caught
+            _LOGGER.error("Error connecting to Transport NSW API: %s", exc)
+            return False
+        return True
+
 
 class TransportNSWSubentryFlowHandler(ConfigSubentryFlow):
     """Handle subentry flow for adding transport stops."""
 
+    _stop_options: list[SelectOptionDict] | None = None
+
     def _generate_subentry_unique_id(
         self, parent_entry_id: str, data: dict[str, Any]
     ) -> str:
@@ -315,6 +555,13 @@ class TransportNSWSubentryFlowHandler(ConfigSubentryFlow):
         """Handle user step for new subentry."""
         errors: dict[str, str] = {}
 
+        if (
+            user_input is None
+            and self._stop_options is None
+            and await async_get_stop_index(self.hass) is not None
+        ):
+            return await self.async_step_search()
+
         if user_input is not None:
             # Get the parent entry to access the API key
             parent_entry = self._get_entry()
@@ -342,11 +589,34 @@ class TransportNSWSubentryFlowHandler(ConfigSubentryFlow):
         return self.async_show_form(
             step_id="user",
             data_schema=self.add_suggested_values_to_schema(
-                SUBENTRY_SCHEMA, user_input
+                _subentry_schema(self._stop_options), user_input
             ),
             errors=errors,
         )
 
+    async def async_step_search(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """Search the offline stop index by stop name or ID."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            index = await async_get_stop_index(self.hass)
+            stops = index.search(user_input[CONF_STOP_SEARCH]) if index else []
+            if stops:
+                self._stop_options = [
+                    SelectOptionDict(value=stop_id, label=f"{name} ({stop_id})")
+                    for stop_id, name in stops
+                ]
+                return await self.async_step_user()
+            errors[CONF_STOP_SEARCH] = "no_stops_found"
+
+        return self.async_show_form(
+            step_id="search",
+            data_schema=self.add_suggested_values_to_schema(SEARCH_SCHEMA, user_input),
+            errors=errors,
+        )
+
     async def async_step_reconfigure(
         self, user_input: dict[str, Any] | None = None
     ) -> SubentryFlowResult:
@@ -384,3 +654,73 @@ class TransportNSWSubentryFlowHandler(ConfigSubentryFlow):
             ),
             errors=errors,
         )
+
+
+class TransportNSWJourneySubentryFlowHandler(ConfigSubentryFlow):
+    """Handle subentry flow for adding journeys between two stops."""
+
+    async def _async_validate(
+        self, user_input: dict[str, Any], errors: dict[str, str]
+    ) -> dict[str, Any] | None:
+        """Validate the input, returning the subentry info or setting errors."""
+        query = JourneyQuery.from_config(user_input)
+        if query.origin == query.destination:
+            errors[CONF_DESTINATION_ID] = "same_stop"
+            return None
+
+        api_key = self._get_entry().data[CONF_API_KEY]
+        try:
+            return await validate_journey_input(self.hass, api_key, user_input)
+        except ValueError:
+            errors["base"] = "cannot_connect"
+        except Exception:  # pylint: disable=broad-exception-caught
+            _LOGGER.exception("Unexpected exception")
+            errors["base"] = "unknown"
+        return None
+
+    async def async_step_user(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """Handle user step for new subentry."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            info = await self._async_validate(user_input, errors)
+            if info is not None:
+                query = JourneyQuery.from_config(user_input)
+                return self.async_create_entry(
+                    title=info["title"],
+                    data=user_input,
+                    unique_id=query.unique_id(self._get_entry().entry_id),
+                )
+
+        return self.async_show_form(
+            step_id="user",
+            data_schema=self.add_suggested_values_to_schema(JOURNEY_SCHEMA, user_input),
+            errors=errors,
+        )
+
+    async def async_step_reconfigure(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """Handle reconfiguration of existing subentry."""
+        subentry = self._get_reconfigure_subentry()
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            info = await self._async_validate(user_input, errors)
+            if info is not None:
+                return self.async_update_and_abort(
+                    self._get_entry(),
+                    subentry,
+                    title=info["title"],
+                    data_updates=user_input,
+                )
+
+        return self.async_show_form(
+            step_id="reconfigure",
+            data_schema=self.add_suggested_values_to_schema(
+                JOURNEY_SCHEMA, user_input or dict(subentry.data)
+            ),
+            errors=errors,
+        )
@@ -6,9 +6,26 @@ DOMAIN = "transport_nsw"
 CONF_STOP_ID = "stop_id"
 CONF_ROUTE = "route"
 CONF_DESTINATION = "destination"
+CONF_DEPARTURE_COUNT = "departure_count"
+CONF_MAX_RESULTS = "max_results"
+CONF_EXCLUDED_MODES = "excluded_modes"
+CONF_DEPARTURE_OFFSET = "departure_offset"
+CONF_RANKED_SENSORS = "ranked_sensors"
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+CONF_MIN_UPDATE_INTERVAL = "min_update_interval"
+CONF_MAX_UPDATE_INTERVAL = "max_update_interval"
+CONF_DEFER_FIRST_REFRESH = "defer_first_refresh"
+CONF_RECORD_STATE_ONLY = "record_state_only"
+CONF_GTFS_STATIC = "gtfs_static"
+CONF_REALTIME_FEEDS = "realtime_feeds"
+CONF_STOP_SEARCH = "stop_search"
+CONF_ORIGIN_ID = "origin_id"
+CONF_DESTINATION_ID = "destination_id"
+CONF_VIA_ID = "via_id"
 
 # Subentry constants
 SUBENTRY_TYPE_STOP = "stop"
+SUBENTRY_TYPE_JOURNEY = "journey"
 
 # Attribute constants
 ATTR_STOP_ID = "stop_id"
@@ -17,10 +34,29 @@ ATTR_DUE_IN = "due"
 ATTR_DELAY = "delay"
 ATTR_REAL_TIME = "real_time"
 ATTR_DESTINATION = "destination"
+ATTR_DEPARTURE_TIME = "departure_time"
+ATTR_DEPARTURES = "departures"
+ATTR_FETCHED_AT = "fetched_at"
+ATTR_ORIGIN_ID = "origin_id"
+ATTR_DESTINATION_ID = "destination_id"
+ATTR_VIA_ID = "via_id"
+ATTR_ROUTES = "routes"
+ATTR_ARRIVAL_TIME = "arrival_time"
+ATTR_DURATION = "duration"
+ATTR_CHANGES = "changes"
+ATTR_JOURNEYS = "journeys"
 
 # Default values
 DEFAULT_NAME = "Transport NSW"
 DEFAULT_STOP_NAME = "Transport NSW Stop"
+DEFAULT_DEPARTURE_COUNT = 3
+MAX_DEPARTURE_COUNT = 10
+MAX_RESULTS = 100
+DEFAULT_DEPARTURE_OFFSET = 0  # minutes
+MAX_DEPARTURE_OFFSET = 120  # minutes
+DEFAULT_MIN_UPDATE_INTERVAL = 30  # seconds
+DEFAULT_MAX_UPDATE_INTERVAL = 900  # seconds
+JOURNEY_COUNT = 3
 
 # Transport mode icons
 TRANSPORT_ICONS = {
@@ -2,33 +2,63 @@
 
 from __future__ import annotations
 
-from datetime import timedelta
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import islice
 import logging
+from time import perf_counter
+from types import MappingProxyType
 from typing import Any, NoReturn
 
-from TransportNSW import TransportNSW
-
 from homeassistant.config_entries import ConfigEntry, ConfigSubentry
 from homeassistant.const import ATTR_MODE, CONF_API_KEY
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
 
 from .const import (
     ATTR_DELAY,
+    ATTR_DEPARTURE_TIME,
+    ATTR_DEPARTURES,
     ATTR_DESTINATION,
     ATTR_DUE_IN,
+    ATTR_FETCHED_AT,
     ATTR_REAL_TIME,
     ATTR_ROUTE,
+    ATTR_STOP_ID,
+    CONF_ADAPTIVE_POLLING,
+    CONF_DEPARTURE_COUNT,
     CONF_DESTINATION,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_MIN_UPDATE_INTERVAL,
     CONF_ROUTE,
     CONF_STOP_ID,
+    DEFAULT_DEPARTURE_COUNT,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
     DEFAULT_NAME,
+    JOURNEY_COUNT,
+)
+from .departures import (
+    Departure,
+    DepartureFilter,
+    DepartureQuery,
+    minutes_until,
 )
+from .gtfs import async_get_timetable
+from .hub import STOP_CACHE_TOLERANCE, get_hub
+from .journeys import Journey, JourneyQuery
+from .stats import PHASE_EXECUTOR, FetchStats, FetchTrace
 
 _LOGGER = logging.getLogger(__name__)
 
 SCAN_INTERVAL = timedelta(seconds=60)
 
+# With adaptive polling, a stop is checked this many times before its next
+# service is due so that late changes are still picked up.
+ADAPTIVE_POLLS_BEFORE_DEPARTURE = 4
+
 
 def _raise_update_failed(message: str, exc: Exception | None = None) -> NoReturn:
     """Raise UpdateFailed with the given message."""
@@ -37,12 +67,116 @@ def _raise_update_failed(message: str, exc: Exception | None = None) -> NoReturn
     raise UpdateFailed(message)
 
 
-def _get_value(value):
-    """Replace the API response 'n/a' value with None."""
-    return None if (value is None or value == "n/a") else value
+@dataclass(frozen=True, slots=True)
+class UpcomingDeparture:
+    """A departure as the sensors show it, built once per refresh.
+
+    The departure time is kept so sensors can count down locally between
+    refreshes, and the state attributes are shared by every state written
+    until the next refresh. Departures compare equal when the sensors would
+    show them the same, so a later estimate of the same departure time is
+    left to the sensors' countdown. They are compared by the minute they
+    leave rather than the minutes left, which shrink with every refresh.
+    """
+
+    departure: Departure = field(compare=False)
+    # Minutes until departure as of the refresh, e.g. for adaptive polling
+    due: int = field(compare=False)
+    # The departure time rounded to whole minutes since the epoch
+    departure_minute: int
+    attributes: Mapping[str, Any]
+
+    @classmethod
+    def build(
+        cls, departure: Departure, stop_id: str, now: datetime
+    ) -> UpcomingDeparture:
+        """Build the upcoming departure of a stop as of now."""
+        return cls(
+            departure,
+            minutes_until(departure.departure_time, now),
+            round(departure.departure_time.timestamp() / 60),
+            MappingProxyType(
+                {
+                    ATTR_STOP_ID: stop_id,
+                    ATTR_ROUTE: departure.route,
+                    ATTR_DELAY: departure.delay,
+                    ATTR_REAL_TIME: departure.real_time,
+                    ATTR_DESTINATION: departure.destination,
+                    ATTR_MODE: departure.mode,
+                }
+            ),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class DepartureSnapshot:
+    """The upcoming departures of a stop from one refresh: the coordinator data."""
+
+    departures: tuple[UpcomingDeparture, ...]
+    # When departures restored after a restart were fetched
+    fetched_at: datetime | None = None
+    # The minute and attributes last built by listed_attributes
+    _listed: list[Any] = field(
+        default_factory=lambda: [None, None], init=False, repr=False, compare=False
+    )
+
+    @property
+    def next(self) -> UpcomingDeparture | None:
+        """Return the next departure, if any."""
+        return self.departures[0] if self.departures else None
+
+    def listed_attributes(self, now: datetime) -> Mapping[str, Any] | None:
+        """Return the next departure's attributes with the upcoming departures.
 
+        They are built once per minute, when the minutes until each departure
+        change, and shared by every state written in that minute. Returns
+        None without a next departure.
+        """
+        if (upcoming := self.next) is None:
+            return None
+        minute = int(now.timestamp() // 60)
+        if self._listed[0] == minute:
+            return self._listed[1]
 
-class TransportNSWCoordinator(DataUpdateCoordinator):
+        attributes: dict[str, Any] = {
+            **upcoming.attributes,
+            # Compact list of the upcoming departures from the same request
+            ATTR_DEPARTURES: [
+                {
+                    ATTR_ROUTE: departure.route,
+                    ATTR_DESTINATION: departure.destination,
+                    ATTR_DUE_IN: max(minutes_until(departure.departure_time, now), 0),
+                    ATTR_DELAY: departure.delay,
+                }
+                for departure in (item.departure for item in self.departures)
+            ],
+        }
+        # Departures restored after a restart are marked until the next update
+        if self.fetched_at:
+            attributes[ATTR_FETCHED_AT] = self.fetched_at
+        self._listed[:] = [minute, MappingProxyType(attributes)]
+        return self._listed[1]
+
+    def at_rank(self, rank: int) -> UpcomingDeparture | None:
+        """Return the departure at a rank (1 for the next one), if there is one."""
+        return self.departures[rank - 1] if len(self.departures) >= rank else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the snapshot as a dict, e.g. for diagnostics."""
+        return {
+            ATTR_DEPARTURES: [
+                {
+                    **upcoming.attributes,
+                    ATTR_DUE_IN: upcoming.due,
+                    ATTR_DEPARTURE_TIME: upcoming.departure.departure_time,
+                }
+                for upcoming in self.departures
+            ],
+            ATTR_FETCHED_AT: self.fetched_at,
+        }
+
+
+class TransportNSWCoordinator(DataUpdateCoordinator[DepartureSnapshot]):
     """Class to manage fetching Transport NSW data."""
 
     def __init__(
@@ -56,7 +190,8 @@ class TransportNSWCoordinator(DataUpdateCoordinator):
         self.subentry = subentry
         self._load_configuration()
 
-        self.transport_nsw = TransportNSW()
+        self.hub = get_hub(hass, config_entry)
+        self.stats = FetchStats()
 
         name = self._get_coordinator_name()
         super().__init__(
@@ -65,7 +200,13 @@ class TransportNSWCoordinator(DataUpdateCoordinator):
             name=f"Transport NSW {name}",
             update_interval=SCAN_INTERVAL,
             config_entry=config_entry,
+            # Only refreshes that change what the sensors show are passed on
+            always_update=False,
         )
+        self._stats_listeners: list[CALLBACK_TYPE] = []
+        # The interval picked after the last update; update_interval is typed
+        # optional, as coordinators may be refreshed manually only
+        self._polling_interval: timedelta = SCAN_INTERVAL
 
     def _load_configuration(self) -> None:
         """Load configuration from config entry and subentry."""
@@ -79,11 +220,34 @@ class TransportNSWCoordinator(DataUpdateCoordinator):
             self.stop_id = self.subentry.data[CONF_STOP_ID]
             self.route = self.subentry.data.get(CONF_ROUTE, "")
             self.destination = self.subentry.data.get(CONF_DESTINATION, "")
+            departure_count = self.subentry.data.get(
+                CONF_DEPARTURE_COUNT, DEFAULT_DEPARTURE_COUNT
+            )
         else:
             # Legacy mode
             self.stop_id = self.config_entry.data[CONF_STOP_ID]
             self.route = self.config_entry.options.get(CONF_ROUTE, "")
             self.destination = self.config_entry.options.get(CONF_DESTINATION, "")
+            departure_count = self.config_entry.options.get(
+                CONF_DEPARTURE_COUNT, DEFAULT_DEPARTURE_COUNT
+            )
+        self.departure_count = int(departure_count)
+        self.departure_filter = DepartureFilter.compile(self.route, self.destination)
+        # Legacy entries aren't narrowed
+        self.query = (
+            DepartureQuery.from_config(self.subentry.data)
+            if self.subentry
+            else DepartureQuery()
+        )
+
+        options = self.config_entry.options
+        self.adaptive_polling = options.get(CONF_ADAPTIVE_POLLING, False)
+        self.min_update_interval = timedelta(
+            seconds=options.get(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL)
+        )
+        self.max_update_interval = timedelta(
+            seconds=options.get(CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL)
+        )
 
     def _get_coordinator_name(self) -> str:
         """Get the coordinator name based on configuration."""
@@ -101,6 +265,7 @@ class TransportNSWCoordinator(DataUpdateCoordinator):
         self.config_entry = config_entry
         self.subentry = subentry
         self._load_configuration()
+        self.hub = get_hub(self.hass, config_entry)
 
         # Update coordinator name if needed
         new_name = self._get_coordinator_name()
@@ -109,29 +274,294 @@ class TransportNSWCoordinator(DataUpdateCoordinator):
         # Trigger immediate refresh with new configuration
         await self.async_request_refresh()
 
-    async def _async_update_data(self) -> dict[str, Any]:
-        """Fetch data from Transport NSW."""
+    @property
+    def snapshot_key(self) -> str:
+        """Return the key of this coordinator's saved snapshot."""
+        if self.subentry:
+            return self.subentry.subentry_id
+        if self.config_entry is None:
+            raise ValueError("Config entry is required")
+        return self.config_entry.entry_id
+
+    async def async_restore(self) -> bool:
+        """Restore the departures saved before the last restart.
+
+        Departures that have left since are dropped, and the restored data
+        carries the time it was fetched. Returns whether anything was
+        restored.
+        """
+        snapshot = await self.hub.async_get_snapshot(self.snapshot_key)
+        if not snapshot or snapshot.get("filter") != self._snapshot_filter():
+            return False
+
+        now = dt_util.utcnow()
         try:
-            data = await self.hass.async_add_executor_job(
-                self.transport_nsw.get_departures,
+            fetched_at = dt_util.parse_datetime(snapshot[ATTR_FETCHED_AT])
+            departures = [
+                Departure(
+                    **{
+                        **departure,
+                        ATTR_DEPARTURE_TIME: dt_util.parse_datetime(
+                            departure[ATTR_DEPARTURE_TIME]
+                        ),
+                    }
+                )
+                for departure in snapshot[ATTR_DEPARTURES]
+            ]
+        except (KeyError, TypeError, ValueError):
+            _LOGGER.debug("Ignoring invalid snapshot for stop %s", self.stop_id)
+            return False
+
+        upcoming = tuple(
+            UpcomingDeparture.build(departure, self.stop_id, now)
+            for departure in departures
+            if departure.departure_time
+            and departure.departure_time > now + self.query.offset
+        )[: self.departure_count]
+        if not upcoming:
+            return False
+
+        self.data = DepartureSnapshot(upcoming, fetched_at)
+        return True
+
+    def _save_snapshot(
+        self, upcoming: tuple[UpcomingDeparture, ...], now: datetime
+    ) -> None:
+        """Save the upcoming departures so they can be restored after a restart."""
+        departures = [item.departure for item in upcoming]
+        self.hub.async_save_snapshot(
+            self.snapshot_key,
+            {
+                "filter": self._snapshot_filter(),
+                ATTR_FETCHED_AT: now.isoformat(),
+                ATTR_DEPARTURES: [
+                    {
+                        ATTR_ROUTE: departure.route,
+                        ATTR_DEPARTURE_TIME: departure.departure_time.isoformat(),
+                        ATTR_DELAY: departure.delay,
+                        ATTR_REAL_TIME: departure.real_time,
+                        ATTR_DESTINATION: departure.destination,
+                        ATTR_MODE: departure.mode,
+                    }
+                    for departure in departures
+                ],
+            },
+        )
+
+    def _snapshot_filter(self) -> list[str]:
+        """Return what a snapshot was filtered by, to spot stale configuration."""
+        return [self.stop_id, self.route, self.destination]
+
+    def _next_update_interval(self, data: DepartureSnapshot) -> timedelta:
+        """Pick the next update interval from the latest departure."""
+        if not self.adaptive_polling:
+            return SCAN_INTERVAL
+
+        due = data.next.due if data.next else None
+        delay = data.next.departure.delay if data.next else None
+        previous_delay = (
+            self.data.next.departure.delay if self.data and self.data.next else None
+        )
+
+        if due is None:
+            # Nothing is coming, so back off as far as allowed
+            interval = self.max_update_interval
+        elif previous_delay is not None and delay != previous_delay:
+            interval = self.min_update_interval
+        else:
+            interval = timedelta(minutes=due) / ADAPTIVE_POLLS_BEFORE_DEPARTURE
+
+        return max(self.min_update_interval, min(interval, self.max_update_interval))
+
+    async def _async_fetch_departures(
+        self, trace: FetchTrace
+    ) -> tuple[list[Departure], bool]:
+        """Fetch the departures from the stop and whether they are real-time.
+
+        Scheduled departures from the GTFS timetable stand in when the API
+        can't be used, e.g. when it is down or the daily quota is used up.
+        """
+        try:
+            departures = await self.hub.async_get_departures(
                 self.stop_id,
-                self.route,
-                self.destination,
-                self.api_key,
+                max_age=self._polling_interval - STOP_CACHE_TOLERANCE,
+                trace=trace,
             )
-
-            if data is None:
+            if departures is None:
                 _raise_update_failed("No data returned from Transport NSW API")
+        except Exception as exc:  # noqa: BLE001  # pylint: disable=broad-exception-caught
+            if (scheduled := await self._async_get_scheduled_departures(trace)) is None:
+                raise
+            _LOGGER.debug("Using timetabled departures for stop %s: %s", self.stop_id, exc)
+            return scheduled, False
+        return departures, True
+
+    async def _async_get_scheduled_departures(
+        self, trace: FetchTrace
+    ) -> list[Departure] | None:
+        """Return the timetabled departures, or None without a timetable."""
+        if (timetable := await async_get_timetable(self.hass)) is None:
+            return None
+        with trace.phase(PHASE_EXECUTOR):
+            return await self.hass.async_add_executor_job(
+                timetable.departures, self.stop_id, dt_util.utcnow()
+            )
 
-            return {
-                ATTR_ROUTE: _get_value(data.get("route")),
-                ATTR_DUE_IN: _get_value(data.get("due")),
-                ATTR_DELAY: _get_value(data.get("delay")),
-                ATTR_REAL_TIME: _get_value(data.get("real_time")),
-                ATTR_DESTINATION: _get_value(data.get("destination")),
-                ATTR_MODE: _get_value(data.get("mode")),
-            }
+    def _upcoming(
+        self, departures: list[Departure], now: datetime
+    ) -> tuple[UpcomingDeparture, ...]:
+        """Return the upcoming departures matching the route and destination."""
+        # Departures are shared by every subentry watching this stop, so
+        # the route and destination filters are applied locally. The API
+        # only narrows them as far as all of those subentries allow, and
+        # timetabled departures aren't narrowed at all, so the query is
+        # applied again too.
+        earliest = now + self.query.offset
+        excluded_modes = self.query.excluded_modes
+        matches = self.departure_filter.matches
+        return tuple(
+            UpcomingDeparture.build(departure, self.stop_id, now)
+            for departure in islice(
+                (
+                    departure
+                    for departure in departures
+                    if departure.departure_time > earliest
+                    and departure.mode not in excluded_modes
+                    and matches(departure)
+                ),
+                self.departure_count,
+            )
+        )
+
+    @callback
+    def async_add_stats_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for the end of every update, whether or not the data changed.
+
+        Returns a callback that removes the listener.
+        """
+        self._stats_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._stats_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_refresh_finished(self) -> None:
+        """Tell the stats listeners an update finished."""
+        for update_callback in list(self._stats_listeners):
+            update_callback()
+
+    async def _async_update_data(self) -> DepartureSnapshot:
+        """Fetch data from Transport NSW, recording how long it took."""
+        trace = FetchTrace()
+        start = perf_counter()
+        try:
+            result = await self._async_fetch_result(trace)
+        except UpdateFailed:
+            self.stats.record(perf_counter() - start, trace, success=False)
+            raise
+        self.stats.record(perf_counter() - start, trace, success=True)
+        return result
+
+    async def _async_fetch_result(self, trace: FetchTrace) -> DepartureSnapshot:
+        """Fetch the departures and build the coordinator data."""
+        try:
+            departures, real_time = await self._async_fetch_departures(trace)
+
+            now = dt_util.utcnow()
+            upcoming = self._upcoming(departures, now)
+            if real_time:
+                self._save_snapshot(upcoming, now)
+                # The departure monitor only looks a little way ahead, so the
+                # timetable fills in when nothing is due soon
+                if not upcoming and (
+                    scheduled := await self._async_get_scheduled_departures(trace)
+                ):
+                    upcoming = self._upcoming(scheduled, now)
+
+            result = DepartureSnapshot(upcoming)
+            self._polling_interval = self._next_update_interval(result)
+            self.update_interval = self._polling_interval
+            return result
         except Exception as exc:  # noqa: BLE001  # pylint: disable=broad-exception-caught
             _raise_update_failed(
                 f"Error communicating with Transport NSW API: {exc}", exc
             )
+
+
+@dataclass(frozen=True, slots=True)
+class JourneySnapshot:
+    """The upcoming journeys between two stops: a journey coordinator's data."""
+
+    journeys: tuple[Journey, ...]
+
+    @property
+    def next(self) -> Journey | None:
+        """Return the next journey, if any."""
+        return self.journeys[0] if self.journeys else None
+
+
+class TransportNSWJourneyCoordinator(DataUpdateCoordinator[JourneySnapshot]):
+    """Fetch the upcoming journeys of a journey subentry from the trip planner.
+
+    The hub shares each trip planner response with every journey between
+    the same stops until its time bucket ends, so refreshes in between only
+    drop the journeys that have left.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, config_entry: ConfigEntry, subentry: ConfigSubentry
+    ) -> None:
+        """Initialize the coordinator."""
+        self.subentry = subentry
+        self.query = JourneyQuery.from_config(subentry.data)
+        self.hub = get_hub(hass, config_entry)
+        self.stats = FetchStats()
+        super().__init__(
+            hass,
+            logger=_LOGGER,
+            name=f"Transport NSW {subentry.title}",
+            update_interval=SCAN_INTERVAL,
+            config_entry=config_entry,
+            always_update=False,
+        )
+
+    async def async_update_config(
+        self, config_entry: ConfigEntry, subentry: ConfigSubentry
+    ) -> None:
+        """Update coordinator configuration and trigger refresh."""
+        self.config_entry = config_entry
+        self.subentry = subentry
+        self.query = JourneyQuery.from_config(subentry.data)
+        self.hub = get_hub(self.hass, config_entry)
+        self.name = f"Transport NSW {subentry.title}"
+        await self.async_request_refresh()
+
+    async def _async_update_data(self) -> JourneySnapshot:
+        """Fetch the journeys, recording how long it took."""
+        trace = FetchTrace()
+        start = perf_counter()
+        try:
+            journeys = await self.hub.async_get_journeys(self.query, trace)
+        except Exception as exc:  # noqa: BLE001  # pylint: disable=broad-exception-caught
+            self.stats.record(perf_counter() - start, trace, success=False)
+            _raise_update_failed(
+                f"Error communicating with Transport NSW API: {exc}", exc
+            )
+        self.stats.record(perf_counter() - start, trace, success=True)
+
+        now = dt_util.utcnow()
+        return JourneySnapshot(
+            tuple(
+                islice(
+                    (
+                        journey
+                        for journey in journeys
+                        if journey.departure_time >= now
+                    ),
+                    JOURNEY_COUNT,
+                )
+            )
+        )
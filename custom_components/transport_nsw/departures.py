@@ -0,0 +1,180 @@
+"""Departure monitor parsing for the Transport NSW integration."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_DEPARTURE_OFFSET,
+    CONF_DESTINATION,
+    CONF_EXCLUDED_MODES,
+    CONF_MAX_RESULTS,
+    CONF_ROUTE,
+    DEFAULT_DEPARTURE_OFFSET,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Maps the API product class to a transport mode name
+TRANSPORT_MODES = {
+    1: "Train",
+    4: "Lightrail",
+    5: "Bus",
+    7: "Coach",
+    9: "Ferry",
+    11: "Schoolbus",
+}
+
+# Maps a transport mode name back to its API product class
+TRANSPORT_MODE_CLASSES = {
+    mode: product_class for product_class, mode in TRANSPORT_MODES.items()
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Departure:
+    """A departure from a stop, from any of the departure sources.
+
+    The field names match the state attributes they are shown as.
+    """
+
+    route: str | None
+    destination: str | None
+    mode: str | None
+    real_time: str
+    delay: int | None
+    departure_time: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class DepartureQuery:
+    """How far the departure monitor narrows the departures it returns.
+
+    The API applies these before responding, so responses only hold
+    departures someone is watching for. Route and destination filters are
+    applied locally, after the API's cap, so a filtered stop is not capped.
+    """
+
+    # Most stop events returned, or None for as many as the API gives
+    max_results: int | None = None
+    # Transport modes left out, by name
+    excluded_modes: frozenset[str] = frozenset()
+    # Only departures at least this far from now are returned
+    offset: timedelta = timedelta()
+
+    @classmethod
+    def from_config(cls, data: Mapping[str, Any]) -> DepartureQuery:
+        """Return the query set by a stop's configuration."""
+        max_results = data.get(CONF_MAX_RESULTS)
+        if (data.get(CONF_ROUTE) or "").strip() or (
+            data.get(CONF_DESTINATION) or ""
+        ).strip():
+            # The cap could be filled by departures the filters drop
+            max_results = None
+        return cls(
+            int(max_results) if max_results else None,
+            frozenset(data.get(CONF_EXCLUDED_MODES) or ()),
+            timedelta(
+                minutes=data.get(CONF_DEPARTURE_OFFSET) or DEFAULT_DEPARTURE_OFFSET
+            ),
+        )
+
+    @classmethod
+    def merge(cls, queries: Iterable[DepartureQuery]) -> DepartureQuery:
+        """Return the narrowest query that returns what each of queries would."""
+        queries = list(queries)
+        if not queries:
+            return cls()
+        max_results = None
+        if all(query.max_results for query in queries):
+            max_results = max(query.max_results or 0 for query in queries)
+        return cls(
+            max_results,
+            frozenset.intersection(*(query.excluded_modes for query in queries)),
+            min(query.offset for query in queries),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class DepartureFilter:
+    """The route and destination filters of a stop, compiled once.
+
+    Each filter is a comma separated list of alternatives, e.g. "T1, T9",
+    matched in full but without regard to case. An empty filter matches
+    every departure.
+    """
+
+    routes: frozenset[str] = frozenset()
+    destinations: frozenset[str] = frozenset()
+
+    @classmethod
+    def compile(cls, route: str, destination: str) -> DepartureFilter:
+        """Return the filter for a stop's route and destination settings."""
+        return cls(_alternatives(route), _alternatives(destination))
+
+    def matches(self, departure: Departure) -> bool:
+        """Return whether a departure passes the filter."""
+        return (
+            not self.routes or (departure.route or "").casefold() in self.routes
+        ) and (
+            not self.destinations
+            or (departure.destination or "").casefold() in self.destinations
+        )
+
+
+def _alternatives(value: str) -> frozenset[str]:
+    """Return the case-folded alternatives of a comma separated filter."""
+    return frozenset(
+        alternative.strip().casefold()
+        for alternative in (value or "").split(",")
+        if alternative.strip()
+    )
+
+
+def parse_stop_events(payload: dict[str, Any]) -> list[Departure]:
+    """Pick the departures out of a departure monitor response.
+
+    Only the fields shown by the sensors are read from each event, and
+    events that cannot be parsed are skipped. The due time is not included
+    as it depends on when the departure is read; see minutes_until.
+    """
+    parse_datetime = dt_util.parse_datetime
+    modes = TRANSPORT_MODES
+    departures = []
+    for event in payload.get("stopEvents") or ():
+        try:
+            transportation = event["transportation"]
+            planned = parse_datetime(event["departureTimePlanned"])
+            estimated = None
+            if "isRealtimeControlled" in event:
+                estimated = parse_datetime(event.get("departureTimeEstimated", ""))
+            departure_time = estimated or planned
+            if planned is None or departure_time is None:
+                continue
+
+            product_class: Any = (transportation.get("product") or {}).get("class")
+            departures.append(
+                Departure(
+                    transportation.get("number"),
+                    (transportation.get("destination") or {}).get("name"),
+                    modes.get(product_class),
+                    "y" if estimated else "n",
+                    round((departure_time - planned).total_seconds() / 60),
+                    departure_time,
+                )
+            )
+        except (AttributeError, KeyError, TypeError, ValueError):
+            _LOGGER.debug("Skipping unparseable stop event: %s", event)
+
+    return departures
+
+
+def minutes_until(departure_time: datetime, now: datetime) -> int:
+    """Return the whole minutes from now until the departure time."""
+    return round((departure_time - now).total_seconds() / 60)
@@ -0,0 +1,116 @@
+"""Diagnostics support for the Transport NSW integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import TransportNSWCoordinator, TransportNSWJourneyCoordinator
+from .hub import TransportNSWHub
+
+TO_REDACT = {CONF_API_KEY}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry.
+
+    Besides the entry, this has the state and recent fetch timings of every
+    stop and journey, the API key's request stats and the latest raw
+    departure monitor responses.
+    """
+    diagnostics: dict[str, Any] = {
+        "entry": async_redact_data(config_entry.as_dict(), TO_REDACT),
+    }
+    hub = hass.data.get(DOMAIN, {}).get(config_entry.entry_id)
+    if not isinstance(hub, TransportNSWHub):
+        return diagnostics
+
+    scheduler = hub.scheduler
+    diagnostics["api_key"] = {
+        "requests_today": scheduler.requests_today,
+        "remaining_today": scheduler.remaining_today,
+        "queued": scheduler.queued,
+        "circuit": {
+            "state": hub.breaker.state,
+            "consecutive_failures": hub.breaker.failures,
+            "retry_in": hub.breaker.retry_in,
+            "last_error": hub.breaker.last_error,
+        },
+        "stats": hub.stats.as_dict(),
+        "recent_fetches": list(hub.stats.recent),
+    }
+    diagnostics["stops"] = {
+        key: _coordinator_diagnostics(stop.coordinator)
+        for key, stop in hub.stops.items()
+    }
+    diagnostics["journeys"] = {
+        key: _journey_diagnostics(journey.coordinator)
+        for key, journey in hub.journeys.items()
+    }
+    diagnostics["recent_responses"] = hub.responses.as_list(
+        [config_entry.data.get(CONF_API_KEY, "")]
+    )
+    return diagnostics
+
+
+def _coordinator_diagnostics(coordinator: TransportNSWCoordinator) -> dict[str, Any]:
+    """Return the state and recent fetch timings of a coordinator."""
+    return {
+        "name": coordinator.name,
+        "stop_id": coordinator.stop_id,
+        "route": coordinator.route,
+        "destination": coordinator.destination,
+        "departure_count": coordinator.departure_count,
+        "update_interval": (
+            coordinator.update_interval.total_seconds()
+            if coordinator.update_interval
+            else None
+        ),
+        "last_update_success": coordinator.last_update_success,
+        "last_exception": (
+            repr(coordinator.last_exception) if coordinator.last_exception else None
+        ),
+        "data": coordinator.data.as_dict() if coordinator.data else None,
+        "stats": coordinator.stats.as_dict(),
+        "recent_fetches": list(coordinator.stats.recent),
+    }
+
+
+def _journey_diagnostics(
+    coordinator: TransportNSWJourneyCoordinator,
+) -> dict[str, Any]:
+    """Return the state and recent fetch timings of a journey coordinator."""
+    return {
+        "name": coordinator.name,
+        "origin_id": coordinator.query.origin,
+        "destination_id": coordinator.query.destination,
+        "via_id": coordinator.query.via,
+        "last_update_success": coordinator.last_update_success,
+        "last_exception": (
+            repr(coordinator.last_exception) if coordinator.last_exception else None
+        ),
+        "journeys": (
+            [
+                {
+                    "departure_time": journey.departure_time.isoformat(),
+                    "arrival_time": journey.arrival_time.isoformat(),
+                    "routes": list(journey.routes),
+                    "mode": journey.mode,
+                    "real_time": journey.real_time,
+                    "delay": journey.delay,
+                }
+                for journey in coordinator.data.journeys
+            ]
+            if coordinator.data
+            else None
+        ),
+        "stats": coordinator.stats.as_dict(),
+        "recent_fetches": list(coordinator.stats.recent),
+    }
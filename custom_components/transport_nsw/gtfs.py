@@ -0,0 +1,201 @@
+"""GTFS static timetable data for the Transport NSW integration."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from datetime import datetime, timedelta
+import logging
+import os
+from pathlib import Path
+import struct
+import time
+from typing import TYPE_CHECKING
+import zipfile
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .api import TransportNSWError
+from .const import DOMAIN
+from .stops import StopIndex, build_stop_index, read_gtfs_stops
+from .timetable import Timetable, build_timetable
+
+if TYPE_CHECKING:
+    from .hub import TransportNSWHub
+
+_LOGGER = logging.getLogger(__name__)
+
+# Transport NSW publishes timetable changes a few times a week, so the bundle
+# is checked daily and downloaded again once it is a week old
+GTFS_MAX_AGE = timedelta(days=7)
+GTFS_CHECK_INTERVAL = timedelta(days=1)
+
+GTFS_BUNDLE_FILE = "gtfs.zip"
+STOP_INDEX_FILE = "stops.idx"
+TIMETABLE_FILE = "timetable.idx"
+
+# The GTFS data is shared by all config entries
+DATA_STOP_INDEX = f"{DOMAIN}_stop_index"
+DATA_TIMETABLE = f"{DOMAIN}_timetable"
+DATA_GTFS_LOCK = f"{DOMAIN}_gtfs_lock"
+# Indexes found missing or unreadable, so coordinators falling back to the
+# timetable don't look for the file on every update. Cleared once the
+# indexes are built.
+DATA_GTFS_MISSING = f"{DOMAIN}_gtfs_missing"
+
+
+def gtfs_path(hass: HomeAssistant, name: str) -> Path:
+    """Return the path of a GTFS file kept by the integration."""
+    return Path(hass.config.path(STORAGE_DIR, DOMAIN, name))
+
+
+async def async_get_stop_index(hass: HomeAssistant) -> StopIndex | None:
+    """Return the offline stop index, opening it on first use.
+
+    Returns None until the index has been built from a GTFS bundle.
+    """
+    return await _async_open(hass, DATA_STOP_INDEX, StopIndex, STOP_INDEX_FILE)
+
+
+async def async_get_timetable(hass: HomeAssistant) -> Timetable | None:
+    """Return the offline timetable, opening it on first use.
+
+    Returns None until the timetable has been built from a GTFS bundle.
+    """
+    return await _async_open(hass, DATA_TIMETABLE, Timetable, TIMETABLE_FILE)
+
+
+async def _async_open[_IndexT](
+    hass: HomeAssistant, key: str, index_class: Callable[[Path], _IndexT], name: str
+) -> _IndexT | None:
+    """Return an index kept in hass.data, opening its file on first use."""
+    if (index := hass.data.get(key)) is not None:
+        return index
+    missing: set[str] = hass.data.setdefault(DATA_GTFS_MISSING, set())
+    if key in missing:
+        return None
+
+    index = await hass.async_add_executor_job(
+        _open_index, index_class, gtfs_path(hass, name)
+    )
+    if index is None:
+        missing.add(key)
+    else:
+        hass.data[key] = index
+    return index
+
+
+def _open_index[_IndexT](
+    index_class: Callable[[Path], _IndexT], path: Path
+) -> _IndexT | None:
+    """Open the index at path, if there is a usable one."""
+    try:
+        return index_class(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error) as exc:
+        _LOGGER.warning("Ignoring unreadable GTFS index %s: %s", path, exc)
+        return None
+
+
+@callback
+def async_schedule_gtfs_updates(
+    hass: HomeAssistant, config_entry: ConfigEntry, hub: TransportNSWHub
+) -> None:
+    """Keep the GTFS bundle and indexes up to date while the entry is loaded."""
+
+    @callback
+    def _async_update(now: datetime | None = None) -> None:
+        config_entry.async_create_background_task(
+            hass, async_update_gtfs(hass, hub), "transport_nsw gtfs update"
+        )
+
+    _async_update()
+    config_entry.async_on_unload(
+        async_track_time_interval(hass, _async_update, GTFS_CHECK_INTERVAL)
+    )
+
+
+async def async_update_gtfs(hass: HomeAssistant, hub: TransportNSWHub) -> None:
+    """Download the GTFS bundle when it is missing or out of date.
+
+    The stop index and timetable are rebuilt after a download, or when
+    they are missing.
+    """
+    lock: asyncio.Lock = hass.data.setdefault(DATA_GTFS_LOCK, asyncio.Lock())
+    async with lock:
+        bundle = gtfs_path(hass, GTFS_BUNDLE_FILE)
+        if await hass.async_add_executor_job(_is_outdated, bundle):
+            try:
+                await _async_download_bundle(hass, hub, bundle)
+            except TransportNSWError as exc:
+                _LOGGER.warning("Could not download the GTFS bundle: %s", exc)
+                return
+        elif (
+            await async_get_stop_index(hass) is not None
+            and await async_get_timetable(hass) is not None
+        ):
+            return
+
+        try:
+            stop_index, timetable = await hass.async_add_executor_job(
+                _build_indexes, hass, bundle
+            )
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as exc:
+            _LOGGER.warning("Could not index the GTFS bundle %s: %s", bundle, exc)
+            return
+        # Previous indexes are closed once nothing refers to them any more
+        hass.data[DATA_STOP_INDEX] = stop_index
+        hass.data[DATA_TIMETABLE] = timetable
+        hass.data.pop(DATA_GTFS_MISSING, None)
+
+
+def _is_outdated(bundle: Path) -> bool:
+    """Return whether the bundle is missing or older than GTFS_MAX_AGE."""
+    try:
+        modified = bundle.stat().st_mtime
+    except FileNotFoundError:
+        return True
+    return time.time() - modified > GTFS_MAX_AGE.total_seconds()
+
+
+async def _async_download_bundle(
+    hass: HomeAssistant, hub: TransportNSWHub, bundle: Path
+) -> None:
+    """Download the GTFS bundle, replacing the previous one once complete."""
+    await hub.scheduler.async_acquire()
+    download = bundle.with_suffix(".download")
+    file = await hass.async_add_executor_job(_open_for_writing, download)
+    try:
+        await hub.client.async_download_gtfs_schedule(
+            lambda chunk: hass.async_add_executor_job(file.write, chunk)
+        )
+    except BaseException:
+        await hass.async_add_executor_job(file.close)
+        await hass.async_add_executor_job(download.unlink)
+        raise
+    await hass.async_add_executor_job(file.close)
+    await hass.async_add_executor_job(os.replace, download, bundle)
+    _LOGGER.debug("Downloaded GTFS bundle to %s", bundle)
+
+
+def _open_for_writing(path: Path):
+    """Open a file for writing, creating its directory."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path.open("wb")
+
+
+def _build_indexes(hass: HomeAssistant, bundle: Path) -> tuple[StopIndex, Timetable]:
+    """Build the stop index and timetable from the GTFS bundle and open them."""
+    stop_index_path = gtfs_path(hass, STOP_INDEX_FILE)
+    count = build_stop_index(read_gtfs_stops(bundle), stop_index_path)
+    _LOGGER.debug("Indexed %d stops from %s", count, bundle)
+
+    timetable_path = gtfs_path(hass, TIMETABLE_FILE)
+    count = build_timetable(bundle, timetable_path)
+    _LOGGER.debug("Indexed %d stop times from %s", count, bundle)
+
+    return StopIndex(stop_index_path), Timetable(timetable_path)
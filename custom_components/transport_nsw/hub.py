@@ -0,0 +1,367 @@
+"""Shared per-config-entry state for the Transport NSW integration."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from time import monotonic, perf_counter
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .api import TransportNSWApiClient
+from .const import (
+    CONF_REALTIME_FEEDS,
+    CONF_STOP_ID,
+    DOMAIN,
+    SUBENTRY_TYPE_JOURNEY,
+    SUBENTRY_TYPE_STOP,
+)
+from .departures import Departure, DepartureQuery, parse_stop_events
+from .journeys import Journey, JourneyQuery, parse_journeys, time_bucket
+from .realtime import REALTIME_FEEDS, RealtimeFeeds
+from .scheduler import CircuitBreaker, RequestScheduler
+from .stats import PHASE_PARSE, PHASE_QUEUE, FetchStats, FetchTrace, ResponseLog
+
+if TYPE_CHECKING:
+    from .sensor import JourneySensors, StopSensors
+
+# Departures fetched for a stop are shared with every coordinator that asks
+# for the same stop within this window, so subentries that only differ by
+# route or destination cost a single request per update interval.
+STOP_CACHE_MAX_AGE = timedelta(seconds=55)
+
+# Coordinators accept departures up to their own update interval less this
+# tolerance, so ticks that land slightly early still reuse a shared fetch.
+STOP_CACHE_TOLERANCE = timedelta(seconds=5)
+
+# Journeys are planned from the start of a time bucket, and shared by every
+# coordinator asking for the same stops until the bucket ends, so identical
+# journeys cost one trip planner request per bucket.
+JOURNEY_TIME_BUCKET = timedelta(minutes=5)
+
+# The latest departures of each coordinator are kept in storage so sensors
+# have a state straight after a restart, along with the requests counted
+# against today's budget. Writes are batched by this delay.
+STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 60
+
+
+@dataclass
+class _StopDepartures:
+    """Cached departures for a single stop."""
+
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    departures: list[Departure] | None = None
+    fetched_at: float = 0.0
+    # What the departures were narrowed to by the API
+    query: DepartureQuery | None = None
+
+
+@dataclass
+class _BucketJourneys:
+    """Cached journeys between two stops for a single time bucket."""
+
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    journeys: list[Journey] | None = None
+    bucket: datetime | None = None
+
+
+class TransportNSWHub:
+    """Share departure requests between the coordinators of a config entry."""
+
+    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+        """Initialize the hub."""
+        self.hass = hass
+        self.config_entry = config_entry
+        self._stops: dict[str, _StopDepartures] = {}
+        self._journeys: dict[JourneyQuery, _BucketJourneys] = {}
+        self._client: TransportNSWApiClient | None = None
+        self._realtime_feeds: RealtimeFeeds | None = None
+        # Fetches GTFS-realtime feeds by name, e.g. FileFeedSource.async_get_feed
+        # to replay feeds saved to disk
+        self.async_get_feed: Callable[[str], Awaitable[bytes]] = (
+            self._async_get_api_feed
+        )
+        # Every request made with the entry's API key goes through here, and
+        # none while the API is failing
+        self.scheduler = RequestScheduler()
+        self.breaker = CircuitBreaker()
+        # Every request sent with the entry's API key is recorded here, and
+        # the latest departure monitor responses are kept for diagnostics
+        self.stats = FetchStats()
+        self.responses = ResponseLog()
+        self.store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, _storage_key(config_entry)
+        )
+        self._snapshots: dict[str, dict[str, Any]] | None = None
+        self._snapshots_lock = asyncio.Lock()
+        self._store_dirty = False
+        # Stop subentries set up by the sensor platform, so later changes to
+        # them can be applied without reloading the entry. A legacy entry's
+        # stop is kept under the entry ID.
+        self.stops: dict[str, StopSensors] = {}
+        # Journey subentries set up by the sensor platform
+        self.journeys: dict[str, JourneySensors] = {}
+        self.entry_config: tuple[dict[str, Any], dict[str, Any]] | None = None
+        self.async_add_entities: AddConfigEntryEntitiesCallback | None = None
+
+    @property
+    def client(self) -> TransportNSWApiClient:
+        """Return the API client for the entry's current API key."""
+        api_key = self.config_entry.data[CONF_API_KEY]
+        if self._client is None or self._client.api_key != api_key:
+            self._client = TransportNSWApiClient(
+                async_get_clientsession(self.hass), api_key
+            )
+        return self._client
+
+    @property
+    def realtime_feeds(self) -> RealtimeFeeds | None:
+        """Return the GTFS-realtime feeds the entry is set to use, if any."""
+        feeds = tuple(self.config_entry.options.get(CONF_REALTIME_FEEDS) or ())
+        if not feeds:
+            return None
+        if self._realtime_feeds is None or self._realtime_feeds.feeds != feeds:
+            self._realtime_feeds = RealtimeFeeds(
+                self.hass, feeds, lambda feed: self.async_get_feed(feed)
+            )
+        return self._realtime_feeds
+
+    async def async_get_departures(
+        self,
+        stop_id: str,
+        max_age: timedelta = STOP_CACHE_MAX_AGE,
+        trace: FetchTrace | None = None,
+    ) -> list[Departure] | None:
+        """Return the departures for a stop, fetching them at most once per max_age.
+
+        Concurrent callers for the same stop wait for the request in flight
+        instead of sending their own, and the request is narrowed only as
+        far as every stop subentry watching the stop allows. With
+        GTFS-realtime feeds, all stops of the entry are served from one
+        fetch of the feeds. The phases of a fetch are added to trace.
+        """
+        if trace is None:
+            trace = FetchTrace()
+        if (realtime_feeds := self.realtime_feeds) is not None:
+            return await realtime_feeds.async_get_departures(
+                stop_id, self._stop_ids(), max_age
+            )
+
+        query = self._stop_query(stop_id)
+        stop = self._stops.setdefault(stop_id, _StopDepartures())
+        async with stop.lock:
+            if (
+                stop.departures is not None
+                and stop.query == query
+                and monotonic() - stop.fetched_at < max_age.total_seconds()
+            ):
+                return stop.departures
+
+            payload = await self._async_request(
+                lambda: self.client.async_get_departure_monitor(stop_id, trace, query),
+                trace,
+                f"departure_mon {stop_id}",
+            )
+            if payload is None:
+                return None
+
+            with trace.phase(PHASE_PARSE):
+                stop.departures = parse_stop_events(payload)
+            stop.fetched_at = monotonic()
+            stop.query = query
+            return stop.departures
+
+    async def async_get_journeys(
+        self, query: JourneyQuery, trace: FetchTrace | None = None
+    ) -> list[Journey]:
+        """Return the journeys leaving from the start of the current time bucket.
+
+        They are fetched once per bucket and query, and callers for the same
+        query wait for the request in flight instead of sending their own.
+        The phases of a fetch are added to trace.
+        """
+        if trace is None:
+            trace = FetchTrace()
+        bucket = time_bucket(dt_util.utcnow(), JOURNEY_TIME_BUCKET)
+        cached = self._journeys.setdefault(query, _BucketJourneys())
+        async with cached.lock:
+            if cached.journeys is not None and cached.bucket == bucket:
+                return cached.journeys
+
+            payload = await self._async_request(
+                lambda: self.client.async_get_trip(query, bucket, trace),
+                trace,
+                f"trip {query.origin} {query.destination}",
+            )
+            with trace.phase(PHASE_PARSE):
+                cached.journeys = parse_journeys(payload)
+            cached.bucket = bucket
+            return cached.journeys
+
+    @callback
+    def async_prune_journeys(self) -> None:
+        """Forget the cached journeys of queries no journey subentry asks for."""
+        queries = {
+            JourneyQuery.from_config(subentry.data)
+            for subentry in self.config_entry.subentries.values()
+            if subentry.subentry_type == SUBENTRY_TYPE_JOURNEY
+        }
+        for query in self._journeys.keys() - queries:
+            del self._journeys[query]
+
+    async def _async_get_api_feed(self, feed: str) -> bytes:
+        """Fetch a GTFS-realtime feed from the API."""
+        trace = FetchTrace()
+        return await self._async_request(
+            lambda: self.client.async_get_realtime_feed(REALTIME_FEEDS[feed], trace),
+            trace,
+        )
+
+    async def _async_request[_T](
+        self,
+        send: Callable[[], Awaitable[_T]],
+        trace: FetchTrace,
+        label: str | None = None,
+    ) -> _T:
+        """Send a request with the API key once its circuit and rate limit allow.
+
+        The request is recorded in the API key's stats and, with a label, its
+        response or error in the response log. A request cancelled while
+        queued or in flight gives up its turn as the half-open trial.
+        """
+        self.breaker.check()
+        try:
+            with trace.phase(PHASE_QUEUE):
+                await self.scheduler.async_acquire()
+        except Exception as exc:
+            self.breaker.record_failure(exc)
+            raise
+        except BaseException:
+            self.breaker.abandon_trial()
+            raise
+        self._async_delay_save()
+
+        start = perf_counter()
+        try:
+            result = await send()
+        except Exception as exc:
+            self.breaker.record_failure(exc)
+            self.stats.record(perf_counter() - start, trace, success=False)
+            if label is not None:
+                self.responses.add(label, None, str(exc))
+            raise
+        except BaseException:
+            self.breaker.abandon_trial()
+            raise
+        self.breaker.record_success()
+        self.stats.record(perf_counter() - start, trace, success=True)
+        if label is not None:
+            self.responses.add(label, trace.body)
+        return result
+
+    def _stop_query(self, stop_id: str) -> DepartureQuery:
+        """Return how far the departures of a stop can be narrowed by the API."""
+        queries = [
+            DepartureQuery.from_config(subentry.data)
+            for subentry in self.config_entry.subentries.values()
+            if subentry.subentry_type == SUBENTRY_TYPE_STOP
+            and subentry.data[CONF_STOP_ID] == stop_id
+        ]
+        if self.config_entry.data.get(CONF_STOP_ID) == stop_id:
+            queries.append(DepartureQuery())
+        return DepartureQuery.merge(queries)
+
+    def _stop_ids(self) -> set[str]:
+        """Return the IDs of the stops the entry watches."""
+        stop_ids = {
+            subentry.data[CONF_STOP_ID]
+            for subentry in self.config_entry.subentries.values()
+            if subentry.subentry_type == SUBENTRY_TYPE_STOP
+        }
+        if CONF_STOP_ID in self.config_entry.data:
+            stop_ids.add(self.config_entry.data[CONF_STOP_ID])
+        return stop_ids
+
+    async def async_load(self) -> None:
+        """Load the snapshots and today's request count from storage once."""
+        async with self._snapshots_lock:
+            if self._snapshots is not None:
+                return
+            stored = await self.store.async_load() or {}
+            self._snapshots = stored.get("snapshots", {})
+            if requests := stored.get("requests"):
+                self.scheduler.restore(
+                    date.fromisoformat(requests["date"]), requests["count"]
+                )
+
+    async def async_get_snapshot(self, key: str) -> dict[str, Any] | None:
+        """Return the saved snapshot of a coordinator, loading storage on first use."""
+        await self.async_load()
+        return (self._snapshots or {}).get(key)
+
+    @callback
+    def async_save_snapshot(self, key: str, snapshot: dict[str, Any]) -> None:
+        """Save the snapshot of a coordinator after a short delay."""
+        if self._snapshots is None:
+            self._snapshots = {}
+        self._snapshots[key] = snapshot
+        self._async_delay_save()
+
+    @callback
+    def async_remove_snapshot(self, key: str) -> None:
+        """Forget the snapshot of a removed coordinator."""
+        if self._snapshots and self._snapshots.pop(key, None) is not None:
+            self._async_delay_save()
+
+    async def async_flush_snapshots(self) -> None:
+        """Write pending changes now, e.g. before the entry is reloaded."""
+        if self._store_dirty:
+            await self.store.async_save(self._data_to_save())
+
+    @callback
+    def _async_delay_save(self) -> None:
+        """Write the snapshots and request count after a short delay."""
+        self._store_dirty = True
+        self.store.async_delay_save(self._data_to_save, SNAPSHOT_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the snapshots and today's request count to write to storage."""
+        self._store_dirty = False
+        return {
+            "snapshots": self._snapshots or {},
+            "requests": {
+                "date": self.scheduler.day.isoformat(),
+                "count": self.scheduler.requests_today,
+            },
+        }
+
+
+def _storage_key(config_entry: ConfigEntry) -> str:
+    """Return the storage key for the saved state of a config entry."""
+    return f"{DOMAIN}.{config_entry.entry_id}"
+
+
+async def async_remove_snapshots(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Remove the saved snapshots of a deleted config entry."""
+    await Store(hass, STORAGE_VERSION, _storage_key(config_entry)).async_remove()
+
+
+def get_hub(hass: HomeAssistant, config_entry: ConfigEntry) -> TransportNSWHub:
+    """Return the hub for a config entry, creating it on first use."""
+    entries = hass.data.setdefault(DOMAIN, {})
+    hub = entries.get(config_entry.entry_id)
+    if not isinstance(hub, TransportNSWHub):
+        hub = entries[config_entry.entry_id] = TransportNSWHub(hass, config_entry)
+    hub.config_entry = config_entry
+    return hub
@@ -0,0 +1,139 @@
+"""Trip planner journey parsing for the Transport NSW integration."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+from .const import CONF_DESTINATION_ID, CONF_ORIGIN_ID, CONF_VIA_ID
+from .departures import TRANSPORT_MODES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class JourneyQuery:
+    """The stops a journey goes between, as asked of the trip planner.
+
+    Journey subentries with equal queries share their results.
+    """
+
+    origin: str
+    destination: str
+    via: str | None = None
+
+    @classmethod
+    def from_config(cls, data: Mapping[str, Any]) -> JourneyQuery:
+        """Return the query of a journey's configuration."""
+        return cls(
+            data[CONF_ORIGIN_ID].strip(),
+            data[CONF_DESTINATION_ID].strip(),
+            (data.get(CONF_VIA_ID) or "").strip() or None,
+        )
+
+    def unique_id(self, entry_id: str) -> str:
+        """Return the unique ID of a journey subentry of a config entry.
+
+        A journey sensor's unique ID is this with the domain in front.
+        """
+        parts = [entry_id, "journey", self.origin, self.destination]
+        if self.via:
+            parts.append(f"via_{self.via}")
+        return "_".join(parts)
+
+
+@dataclass(frozen=True, slots=True)
+class Journey:
+    """A journey from the trip planner.
+
+    The departure details are those of the first leg on a service, so a
+    walk to the stop doesn't hide the delay or mode of the service taken.
+    """
+
+    departure_time: datetime
+    arrival_time: datetime
+    # Route of each leg on a service, in order; walking legs are left out
+    routes: tuple[str, ...]
+    mode: str | None
+    real_time: str
+    delay: int | None
+
+    @property
+    def duration(self) -> int:
+        """Return the whole minutes from departure to arrival."""
+        return round((self.arrival_time - self.departure_time).total_seconds() / 60)
+
+    @property
+    def changes(self) -> int:
+        """Return how many times the journey changes services."""
+        return max(len(self.routes) - 1, 0)
+
+
+def parse_journeys(payload: dict[str, Any]) -> list[Journey]:
+    """Pick the journeys out of a trip planner response.
+
+    The journey leaves when its first leg does, walking or not, and arrives
+    when its last leg does. Journeys that cannot be parsed are skipped.
+    """
+    journeys = []
+    for journey in payload.get("journeys") or ():
+        try:
+            legs = journey["legs"]
+            services = [
+                leg
+                for leg in legs
+                if ((leg.get("transportation") or {}).get("product") or {}).get(
+                    "class"
+                )
+                in TRANSPORT_MODES
+            ]
+            first = services[0] if services else legs[0]
+            planned, estimated = _leg_departure(first)
+            leaves_planned, leaves_estimated = _leg_departure(legs[0])
+            departure_time = leaves_estimated or leaves_planned
+            arrival = legs[-1]["destination"]
+            arrival_time = dt_util.parse_datetime(
+                arrival.get("arrivalTimeEstimated") or arrival["arrivalTimePlanned"]
+            )
+            if planned is None or departure_time is None or arrival_time is None:
+                continue
+
+            transportation = first.get("transportation") or {}
+            product_class: Any = (transportation.get("product") or {}).get("class")
+            journeys.append(
+                Journey(
+                    departure_time,
+                    arrival_time,
+                    tuple(
+                        leg["transportation"].get("number") or "" for leg in services
+                    ),
+                    TRANSPORT_MODES.get(product_class),
+                    "y" if estimated else "n",
+                    round(((estimated or planned) - planned).total_seconds() / 60),
+                )
+            )
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+            _LOGGER.debug("Skipping unparseable journey: %s", journey)
+
+    return journeys
+
+
+def _leg_departure(leg: dict[str, Any]) -> tuple[datetime | None, datetime | None]:
+    """Return the planned and, for real-time legs, estimated departure times."""
+    origin = leg["origin"]
+    planned = dt_util.parse_datetime(origin["departureTimePlanned"])
+    estimated = None
+    if leg.get("isRealtimeControlled"):
+        estimated = dt_util.parse_datetime(origin.get("departureTimeEstimated", ""))
+    return planned, estimated
+
+
+def time_bucket(now: datetime, size: timedelta) -> datetime:
+    """Return the start of the time bucket of the given size that now is in."""
+    seconds = size.total_seconds()
+    return datetime.fromtimestamp(now.timestamp() // seconds * seconds, dt_util.UTC)
@@ -0,0 +1,363 @@
+"""GTFS-realtime TripUpdates feeds for the Transport NSW integration."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable, Iterator, Set
+from datetime import timedelta
+import logging
+from pathlib import Path
+from time import monotonic
+from typing import Any, NamedTuple
+
+from homeassistant.const import ATTR_MODE
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import ATTR_DESTINATION, ATTR_ROUTE
+from .departures import Departure
+from .gtfs import async_get_timetable
+from .timetable import Timetable
+
+_LOGGER = logging.getLogger(__name__)
+
+# The TripUpdates feed of each operator, relative to the API's base URL
+REALTIME_FEEDS = {
+    "sydneytrains": "v2/gtfs/realtime/sydneytrains",
+    "metro": "v2/gtfs/realtime/metro",
+    "nswtrains": "v1/gtfs/realtime/nswtrains",
+    "buses": "v1/gtfs/realtime/buses",
+    "ferries": "v1/gtfs/realtime/ferries/sydneyferries",
+    "lightrail_cbdandsoutheast": "v1/gtfs/realtime/lightrail/cbdandsoutheast",
+    "lightrail_innerwest": "v1/gtfs/realtime/lightrail/innerwest",
+    "lightrail_newcastle": "v1/gtfs/realtime/lightrail/newcastle",
+}
+
+# Protobuf wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH_DELIMITED = 2
+_FIXED32 = 5
+
+# Field numbers of the messages in gtfs-realtime.proto that are decoded
+_FEED_ENTITY = 2  # FeedMessage.entity
+_ENTITY_IS_DELETED = 2  # FeedEntity.is_deleted
+_ENTITY_TRIP_UPDATE = 3  # FeedEntity.trip_update
+_TRIP_UPDATE_TRIP = 1  # TripUpdate.trip
+_TRIP_UPDATE_STOP_TIME_UPDATE = 2  # TripUpdate.stop_time_update
+_TRIP_ID = 1  # TripDescriptor.trip_id
+_TRIP_SCHEDULE_RELATIONSHIP = 4  # TripDescriptor.schedule_relationship
+_TRIP_ROUTE_ID = 5  # TripDescriptor.route_id
+_STOP_TIME_ARRIVAL = 2  # StopTimeUpdate.arrival
+_STOP_TIME_DEPARTURE = 3  # StopTimeUpdate.departure
+_STOP_TIME_STOP_ID = 4  # StopTimeUpdate.stop_id
+_STOP_TIME_SCHEDULE_RELATIONSHIP = 5  # StopTimeUpdate.schedule_relationship
+_EVENT_DELAY = 1  # StopTimeEvent.delay
+_EVENT_TIME = 2  # StopTimeEvent.time
+
+_TRIP_CANCELED = 3
+_STOP_SKIPPED = 1
+
+
+class TripStopUpdate(NamedTuple):
+    """A real-time departure of a trip from one or more watched stops."""
+
+    trip_id: str
+    route_id: str
+    stops: tuple[str, ...]
+    time: int
+    delay: int | None
+
+
+def _varint(data: memoryview, position: int) -> tuple[int, int]:
+    """Return the varint at position and the position after it."""
+    result = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+        if shift >= 70:
+            raise ValueError("Invalid varint in GTFS-realtime feed")
+
+
+def _signed(value: int) -> int:
+    """Return a varint as the signed 64-bit integer it encodes."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _fields(
+    data: memoryview, start: int, end: int
+) -> Iterator[tuple[int, int, int, int]]:
+    """Yield the number, wire type, value and end of each field of a message.
+
+    The value of a length-delimited field is the position it starts at, so
+    nested messages are decoded in place without copying.
+    """
+    position = start
+    while position < end:
+        key, position = _varint(data, position)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == _VARINT:
+            value, position = _varint(data, position)
+        elif wire_type == _LENGTH_DELIMITED:
+            length, value = _varint(data, position)
+            position = value + length
+        elif wire_type == _FIXED64:
+            value, position = position, position + 8
+        elif wire_type == _FIXED32:
+            value, position = position, position + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        if position > end:
+            raise ValueError("Truncated GTFS-realtime feed")
+        yield number, wire_type, value, position
+
+
+def decode_trip_updates(
+    data: bytes, watchers: Callable[[str], tuple[str, ...]]
+) -> Iterator[TripStopUpdate]:
+    """Yield the departures in a TripUpdates feed from the watched stops.
+
+    The feed is decoded in a single pass without building message objects.
+    watchers returns the watched stops a stop ID in the feed counts towards,
+    and updates for other stops are skipped before their times are read.
+    Cancelled trips, skipped stops and stops without a time are left out.
+    """
+    view = memoryview(data)
+    try:
+        for number, wire_type, start, end in _fields(view, 0, len(view)):
+            if number != _FEED_ENTITY or wire_type != _LENGTH_DELIMITED:
+                continue
+            trip_update = None
+            for number, wire_type, value, field_end in _fields(view, start, end):
+                if number == _ENTITY_IS_DELETED and wire_type == _VARINT and value:
+                    break
+                if number == _ENTITY_TRIP_UPDATE and wire_type == _LENGTH_DELIMITED:
+                    trip_update = (value, field_end)
+            else:
+                if trip_update is not None:
+                    yield from _decode_trip_update(view, *trip_update, watchers)
+    except IndexError as exc:
+        raise ValueError("Truncated GTFS-realtime feed") from exc
+
+
+def _decode_trip_update(
+    view: memoryview,
+    start: int,
+    end: int,
+    watchers: Callable[[str], tuple[str, ...]],
+) -> Iterator[TripStopUpdate]:
+    """Yield the departures of a TripUpdate from the watched stops."""
+    trip_id = route_id = ""
+    stop_time_updates: list[tuple[int, int]] = []
+    for number, wire_type, value, field_end in _fields(view, start, end):
+        if wire_type != _LENGTH_DELIMITED:
+            continue
+        if number == _TRIP_UPDATE_STOP_TIME_UPDATE:
+            stop_time_updates.append((value, field_end))
+        elif number == _TRIP_UPDATE_TRIP:
+            if (trip := _decode_trip(view, value, field_end)) is None:
+                return
+            trip_id, route_id = trip
+
+    for stop_time_update in stop_time_updates:
+        if (decoded := _decode_stop_time_update(view, *stop_time_update)) is None:
+            continue
+        stop_id, events = decoded
+        if (stops := watchers(stop_id)) and (
+            departure := _decode_departure_time(view, events)
+        ):
+            yield TripStopUpdate(trip_id, route_id, stops, *departure)
+
+
+def _decode_trip(view: memoryview, start: int, end: int) -> tuple[str, str] | None:
+    """Return the trip and route IDs of a TripDescriptor, or None if cancelled."""
+    trip_id = route_id = ""
+    for number, wire_type, value, field_end in _fields(view, start, end):
+        if wire_type == _LENGTH_DELIMITED:
+            if number == _TRIP_ID:
+                trip_id = str(view[value:field_end], "utf-8")
+            elif number == _TRIP_ROUTE_ID:
+                route_id = str(view[value:field_end], "utf-8")
+        elif number == _TRIP_SCHEDULE_RELATIONSHIP and value == _TRIP_CANCELED:
+            return None
+    return trip_id, route_id
+
+
+def _decode_stop_time_update(
+    view: memoryview, start: int, end: int
+) -> tuple[str, dict[int, tuple[int, int]]] | None:
+    """Return the stop ID and events of a StopTimeUpdate, or None if skipped.
+
+    The events are left undecoded, as the stop is usually not watched.
+    """
+    stop_id = ""
+    skipped = False
+    events: dict[int, tuple[int, int]] = {}
+    for number, wire_type, value, field_end in _fields(view, start, end):
+        if wire_type == _LENGTH_DELIMITED:
+            if number == _STOP_TIME_STOP_ID:
+                stop_id = str(view[value:field_end], "utf-8")
+            elif number in (_STOP_TIME_ARRIVAL, _STOP_TIME_DEPARTURE):
+                events[number] = (value, field_end)
+        elif number == _STOP_TIME_SCHEDULE_RELATIONSHIP:
+            skipped = value == _STOP_SKIPPED
+    return None if skipped else (stop_id, events)
+
+
+def _decode_departure_time(
+    view: memoryview, events: dict[int, tuple[int, int]]
+) -> tuple[int, int | None] | None:
+    """Return the time and delay of a stop's departure, or else its arrival."""
+    for event in (_STOP_TIME_DEPARTURE, _STOP_TIME_ARRIVAL):
+        if event not in events:
+            continue
+        time = delay = None
+        for number, wire_type, value, _ in _fields(view, *events[event]):
+            if wire_type != _VARINT:
+                continue
+            if number == _EVENT_TIME:
+                time = _signed(value)
+            elif number == _EVENT_DELAY:
+                delay = _signed(value)
+        if time is not None:
+            return time, delay
+    return None
+
+
+def index_departures(
+    feeds: Iterable[bytes], stop_ids: Set[str], timetable: Timetable | None
+) -> dict[str, list[Departure]]:
+    """Return the departures in the feeds from each of the given stops.
+
+    Without a timetable, routes are named by their route ID, and platforms
+    don't count towards their station.
+    """
+    watching: dict[str, tuple[str, ...]] = {}
+
+    def watchers(stop_id: str) -> tuple[str, ...]:
+        if (found := watching.get(stop_id)) is None:
+            parent = timetable.parent(stop_id) if timetable else None
+            found = watching[stop_id] = tuple(
+                watched
+                for watched in (stop_id, parent)
+                if watched is not None and watched in stop_ids
+            )
+        return found
+
+    trips: dict[str, dict[str, Any]] = {}
+
+    def trip(update: TripStopUpdate) -> dict[str, Any]:
+        if (found := trips.get(update.trip_id)) is None:
+            found = trips[update.trip_id] = (
+                timetable and timetable.trip(update.trip_id)
+            ) or {
+                ATTR_ROUTE: update.route_id,
+                ATTR_DESTINATION: None,
+                ATTR_MODE: None,
+            }
+        return found
+
+    departures: dict[str, list[Departure]] = defaultdict(list)
+    for feed in feeds:
+        for update in decode_trip_updates(feed, watchers):
+            departure = Departure(
+                **trip(update),
+                real_time="y",
+                delay=None if update.delay is None else round(update.delay / 60),
+                departure_time=dt_util.utc_from_timestamp(update.time),
+            )
+            for stop_id in update.stops:
+                departures[stop_id].append(departure)
+
+    for stop_departures in departures.values():
+        stop_departures.sort(key=lambda departure: departure.departure_time)
+    return dict(departures)
+
+
+class FileFeedSource:
+    """Read GTFS-realtime feeds from <feed>.pb files instead of the API.
+
+    Stands in for the API in tests and when replaying captured feeds.
+    """
+
+    def __init__(self, hass: HomeAssistant, directory: Path) -> None:
+        """Initialize the feed source."""
+        self.hass = hass
+        self.directory = directory
+
+    async def async_get_feed(self, feed: str) -> bytes:
+        """Return the contents of a feed's file."""
+        return await self.hass.async_add_executor_job(
+            (self.directory / f"{feed}.pb").read_bytes
+        )
+
+
+class RealtimeFeeds:
+    """Index the departures of many stops from a few GTFS-realtime feeds.
+
+    The feeds are fetched together at most once per max_age, whatever the
+    number of stops, and concurrent callers wait for the fetch in flight.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        feeds: Iterable[str],
+        async_get_feed: Callable[[str], Awaitable[bytes]],
+    ) -> None:
+        """Initialize the feeds."""
+        self.hass = hass
+        self.feeds = tuple(feeds)
+        self._async_get_feed = async_get_feed
+        self._lock = asyncio.Lock()
+        self._departures: dict[str, list[Departure]] = {}
+        self._stop_ids: frozenset[str] = frozenset()
+        self._fetched_at = 0.0
+
+    async def async_get_departures(
+        self, stop_id: str, stop_ids: Set[str], max_age: timedelta
+    ) -> list[Departure]:
+        """Return the departures from a stop.
+
+        When the feeds are fetched, the departures of all of stop_ids are
+        indexed so the other stops are served from the same fetch.
+        """
+        async with self._lock:
+            if (
+                stop_id not in self._stop_ids
+                or monotonic() - self._fetched_at >= max_age.total_seconds()
+            ):
+                await self._async_refresh(stop_ids | {stop_id})
+            return self._departures.get(stop_id, [])
+
+    async def _async_refresh(self, stop_ids: Set[str]) -> None:
+        """Fetch the feeds and index the departures of stop_ids.
+
+        A feed that can't be fetched is left out, unless none can be.
+        """
+        results = await asyncio.gather(
+            *(self._async_get_feed(feed) for feed in self.feeds),
+            return_exceptions=True,
+        )
+        feeds: list[bytes] = []
+        errors: list[BaseException] = []
+        for feed, result in zip(self.feeds, results, strict=True):
+            if isinstance(result, BaseException):
+                _LOGGER.debug("Could not fetch the %s feed: %s", feed, result)
+                errors.append(result)
+            else:
+                feeds.append(result)
+        if errors and not feeds:
+            raise errors[0]
+
+        timetable = await async_get_timetable(self.hass)
+        self._departures = await self.hass.async_add_executor_job(
+            index_departures, feeds, stop_ids, timetable
+        )
+        self._stop_ids = frozenset(stop_ids)
+        self._fetched_at = monotonic()
@@ -0,0 +1,236 @@
+"""Request scheduling for the Transport NSW API."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from datetime import date
+from time import monotonic
+
+from homeassistant.util import dt as dt_util
+
+from .api import (
+    TransportNSWAuthError,
+    TransportNSWConnectionError,
+    TransportNSWError,
+    TransportNSWRateLimitError,
+    TransportNSWResponseError,
+)
+
+# Limits of the free Transport NSW Open Data plan, per API key
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 5
+DEFAULT_DAILY_BUDGET = 60000
+
+# The circuit of an API key opens after this many timeouts or server errors
+# in a row. It stays open for a backoff that doubles each time it reopens,
+# or for as long as the API asks. A rejected key is only retried hourly.
+BREAKER_THRESHOLD = 3
+BREAKER_BASE_DELAY = 30.0  # seconds
+BREAKER_MAX_DELAY = 900.0  # seconds
+BREAKER_AUTH_DELAY = 3600.0  # seconds
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class QuotaExceededError(TransportNSWError):
+    """Error raised when the daily request budget of an API key is used up."""
+
+
+class CircuitOpenError(TransportNSWError):
+    """Error raised instead of sending a request while the circuit is open."""
+
+
+class RequestScheduler:
+    """Queue the requests made with an API key through a token bucket.
+
+    Tokens refill at `rate` per second up to `burst`. Callers wait in FIFO
+    order for a token, and each granted request counts against the daily
+    budget, which resets at local midnight. The count can be carried over
+    from an earlier scheduler with restore, e.g. across a restart.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        daily_budget: int = DEFAULT_DAILY_BUDGET,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.rate = rate
+        self.burst = burst
+        self.daily_budget = daily_budget
+        self.requests_today = 0
+        self.queued = 0
+        self._tokens = float(burst)
+        self._refilled_at = monotonic()
+        self._day = dt_util.now().date()
+        self._lock = asyncio.Lock()
+
+    @property
+    def day(self) -> date:
+        """Return the local date requests_today is counted for."""
+        self._roll_day()
+        return self._day
+
+    @property
+    def remaining_today(self) -> int:
+        """Return the number of requests left in today's budget."""
+        self._roll_day()
+        return max(self.daily_budget - self.requests_today, 0)
+
+    async def async_acquire(self) -> None:
+        """Wait until a request may be sent.
+
+        Raises QuotaExceededError without queueing once the daily budget is
+        exhausted.
+        """
+        self._check_budget()
+        self.queued += 1
+        try:
+            async with self._lock:
+                while (delay := self._take_token()) > 0:
+                    await asyncio.sleep(delay)
+                # The budget may have been used up while waiting in the queue
+                self._check_budget()
+                self._tokens -= 1
+                self.requests_today += 1
+        finally:
+            self.queued -= 1
+
+    def restore(self, day: date, requests: int) -> None:
+        """Add the requests counted on day by an earlier scheduler, if still today."""
+        if day == self.day:
+            self.requests_today += requests
+
+    def _take_token(self) -> float:
+        """Refill the bucket and return how long to wait for a whole token."""
+        now = monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._refilled_at) * self.rate, self.burst
+        )
+        self._refilled_at = now
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def _check_budget(self) -> None:
+        """Raise QuotaExceededError if today's budget is used up."""
+        if self.remaining_today <= 0:
+            raise QuotaExceededError(
+                f"Daily budget of {self.daily_budget} Transport NSW requests used up"
+            )
+
+    def _roll_day(self) -> None:
+        """Reset the daily counter when the local date changes."""
+        today = dt_util.now().date()
+        if today != self._day:
+            self._day = today
+            self.requests_today = 0
+
+
+class CircuitBreaker:
+    """Stop sending requests with an API key while the API is failing.
+
+    Errors are classified as they come back. A rejected key, a rate limit,
+    or repeated timeouts and server errors open the circuit, and every
+    request with the key then fails straight away with CircuitOpenError.
+    Once the wait is over, a single trial request is let through: its
+    success closes the circuit and its failure opens it again for longer.
+    Other errors, such as an unknown stop, show the API is up.
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        base_delay: float = BREAKER_BASE_DELAY,
+        max_delay: float = BREAKER_MAX_DELAY,
+    ) -> None:
+        """Initialize the breaker."""
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = 0
+        self.last_error: str | None = None
+        self._opened = 0
+        self._open_until: float | None = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        """Return whether the circuit is closed, open or half open."""
+        if self._open_until is None:
+            return CIRCUIT_CLOSED
+        if self.retry_in > 0:
+            return CIRCUIT_OPEN
+        return CIRCUIT_HALF_OPEN
+
+    @property
+    def retry_in(self) -> float:
+        """Return the seconds until the next trial request may be sent."""
+        if self._open_until is None:
+            return 0.0
+        return max(self._open_until - monotonic(), 0.0)
+
+    def check(self) -> None:
+        """Raise CircuitOpenError unless a request may be sent now.
+
+        While half open, the caller that gets through sends the trial
+        request and must report how it went.
+        """
+        if self._open_until is None:
+            return
+        if self._trial:
+            raise CircuitOpenError(
+                f"Transport NSW requests paused while retrying after: {self.last_error}"
+            )
+        if (retry_in := self.retry_in) > 0:
+            raise CircuitOpenError(
+                f"Transport NSW requests paused for {retry_in:.0f} s"
+                f" after: {self.last_error}"
+            )
+        self._trial = True
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful request."""
+        self.failures = 0
+        self._opened = 0
+        self._open_until = None
+        self._trial = False
+
+    def record_failure(self, exc: Exception) -> None:
+        """Open the circuit if the error shows the API can't be used."""
+        trial, self._trial = self._trial, False
+        if isinstance(exc, TransportNSWAuthError):
+            self._open(exc, BREAKER_AUTH_DELAY)
+        elif isinstance(exc, TransportNSWRateLimitError):
+            self._open(exc, exc.retry_after)
+        elif isinstance(exc, TransportNSWConnectionError) or (
+            isinstance(exc, TransportNSWResponseError) and exc.status >= 500
+        ):
+            self.failures += 1
+            if trial or self.failures >= self.threshold:
+                self._open(exc, getattr(exc, "retry_after", None))
+        elif isinstance(exc, TransportNSWResponseError):
+            # The API answered, so it is up; the request itself was bad
+            self.record_success()
+        # Anything else, e.g. QuotaExceededError, never reached the API
+
+    def abandon_trial(self) -> None:
+        """Let the next caller send the trial after a request was cancelled.
+
+        A cancelled request says nothing about the API, so the circuit is
+        left as it was.
+        """
+        self._trial = False
+
+    def _open(self, exc: Exception, delay: float | None) -> None:
+        """Open the circuit for delay seconds, or the next jittered backoff."""
+        if delay is None:
+            backoff = min(self.base_delay * 2**self._opened, self.max_delay)
+            delay = random.uniform(backoff / 2, backoff)
+        self._opened += 1
+        self._open_until = monotonic() + delay
+        self.last_error = str(exc)
@@ -2,35 +2,102 @@
 
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+import logging
 from typing import Any
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntity,
+    SensorEntityDescription,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry, ConfigSubentry
-from homeassistant.const import ATTR_MODE, CONF_NAME, UnitOfTime
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    ATTR_MODE,
+    CONF_NAME,
+    MATCH_ALL,
+    EntityCategory,
+    UnitOfInformation,
+    UnitOfTime,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.helpers.event import async_track_utc_time_change
+from homeassistant.helpers.update_coordinator import (
+    CoordinatorEntity,
+    DataUpdateCoordinator,
+)
+from homeassistant.util import dt as dt_util
 
 from .const import (
+    ATTR_ARRIVAL_TIME,
+    ATTR_CHANGES,
     ATTR_DELAY,
+    ATTR_DEPARTURE_TIME,
+    ATTR_DEPARTURES,
     ATTR_DESTINATION,
+    ATTR_DESTINATION_ID,
     ATTR_DUE_IN,
+    ATTR_DURATION,
+    ATTR_FETCHED_AT,
+    ATTR_JOURNEYS,
+    ATTR_ORIGIN_ID,
     ATTR_REAL_TIME,
     ATTR_ROUTE,
+    ATTR_ROUTES,
     ATTR_STOP_ID,
+    ATTR_VIA_ID,
+    CONF_DEFER_FIRST_REFRESH,
+    CONF_DEPARTURE_COUNT,
     CONF_DESTINATION,
+    CONF_RANKED_SENSORS,
+    CONF_RECORD_STATE_ONLY,
     CONF_ROUTE,
     CONF_STOP_ID,
+    DEFAULT_DEPARTURE_COUNT,
     DOMAIN,
+    SUBENTRY_TYPE_JOURNEY,
     SUBENTRY_TYPE_STOP,
     TRANSPORT_ICONS,
 )
-from .coordinator import TransportNSWCoordinator
+from .coordinator import (
+    TransportNSWCoordinator,
+    TransportNSWJourneyCoordinator,
+    UpcomingDeparture,
+)
+from .departures import minutes_until
+from .hub import TransportNSWHub, get_hub
+from .journeys import Journey, JourneyQuery
+from .stats import FetchStats
+
+_LOGGER = logging.getLogger(__name__)
+
+# State attributes of a sensor with no departure to follow
+NO_DEPARTURE_ATTRIBUTES = {
+    ATTR_ROUTE: None,
+    ATTR_DELAY: None,
+    ATTR_REAL_TIME: None,
+    ATTR_DESTINATION: None,
+    ATTR_MODE: None,
+}
+
+# State attributes of a journey sensor with no journey to follow
+NO_JOURNEY_ATTRIBUTES = {
+    ATTR_ROUTES: None,
+    ATTR_MODE: None,
+    ATTR_DELAY: None,
+    ATTR_REAL_TIME: None,
+    ATTR_DEPARTURE_TIME: None,
+    ATTR_ARRIVAL_TIME: None,
+    ATTR_DURATION: None,
+    ATTR_CHANGES: None,
+}
 
 
 async def async_setup_entry(
@@ -44,39 +111,279 @@ async def async_setup_entry(
     if CONF_STOP_ID in config_entry.data:
         # Legacy entry - create single sensor
         coordinator = TransportNSWCoordinator(hass, config_entry, None)
-        await coordinator.async_config_entry_first_refresh()
-        async_add_entities([TransportNSWSensor(coordinator, config_entry, None)], True)
-        return
+        coordinators = [coordinator]
+        sensor = _sensor_class(config_entry)(coordinator, config_entry, None)
+        stop = StopSensors(None, coordinator, [sensor], _stats_sensors(sensor))
+        # Kept for diagnostics only; legacy entries are reloaded on any change
+        get_hub(hass, config_entry).stops = {config_entry.entry_id: stop}
+        sensors = stop.entities
+    else:
+        # New subentry-based setup
+        hub = get_hub(hass, config_entry)
+        hub.stops = {
+            subentry_id: StopSensors.create(hass, config_entry, subentry)
+            for subentry_id, subentry in config_entry.subentries.items()
+            if subentry.subentry_type == SUBENTRY_TYPE_STOP
+        }
+        hub.journeys = {
+            subentry_id: JourneySensors.create(hass, config_entry, subentry)
+            for subentry_id, subentry in config_entry.subentries.items()
+            if subentry.subentry_type == SUBENTRY_TYPE_JOURNEY
+        }
+        # Kept so later subentry changes can be applied without a reload
+        hub.entry_config = _entry_config(config_entry)
+        hub.async_add_entities = async_add_entities
+
+        subentry_sensors: list[SubentrySensors[Any, Any]] = [
+            *hub.stops.values(),
+            *hub.journeys.values(),
+        ]
+        coordinators = [stop.coordinator for stop in subentry_sensors]
+        sensors = [sensor for stop in subentry_sensors for sensor in stop.entities]
+
+    # Sensors with departures saved before the restart have a state straight
+    # away, so their first refresh doesn't need to hold up startup. Journeys
+    # are not saved, as they are planned again every few minutes anyway.
+    for stop in get_hub(hass, config_entry).stops.values():
+        await stop.coordinator.async_restore()
+
+    # With the option set, no first refresh holds up startup and sensors are
+    # filled in as results arrive
+    defer = config_entry.options.get(CONF_DEFER_FIRST_REFRESH, False)
+    deferred = [
+        coordinator for coordinator in coordinators if defer or coordinator.data
+    ]
+
+    await _async_refresh_coordinators(
+        hass,
+        config_entry,
+        [coordinator for coordinator in coordinators if coordinator not in deferred],
+        True,
+    )
+    async_add_entities([*sensors, TransportNSWApiKeySensor(hass, config_entry)])
+
+    if deferred:
+        config_entry.async_create_background_task(
+            hass,
+            _async_refresh_coordinators(hass, config_entry, deferred, False),
+            "transport_nsw first refresh",
+        )
+
 
-    # New subentry-based setup
-    sensors = []
-    for subentry in config_entry.subentries.values():
-        if subentry.subentry_type == SUBENTRY_TYPE_STOP:
-            coordinator = TransportNSWCoordinator(hass, config_entry, subentry)
-            await coordinator.async_config_entry_first_refresh()
-            sensors.append(TransportNSWSensor(coordinator, config_entry, subentry))
+async def async_update_stops(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
+    """Apply added, removed and changed stop and journey subentries in place.
+
+    Only the coordinators and sensors of the affected subentries are touched.
+    Returns False when the entry needs a full reload instead, i.e. for
+    legacy entries and changes to the API key or options.
+    """
+    hub = hass.data.get(DOMAIN, {}).get(config_entry.entry_id)
+    if (
+        not isinstance(hub, TransportNSWHub)
+        or hub.async_add_entities is None
+        or hub.entry_config != _entry_config(config_entry)
+    ):
+        return False
+
+    stops_removed, stops_added = await _async_update_subentry_sensors(
+        hass,
+        config_entry,
+        SUBENTRY_TYPE_STOP,
+        hub.stops,
+        StopSensors.create,
+        _sensor_layout,
+    )
+    journeys_removed, journeys_added = await _async_update_subentry_sensors(
+        hass,
+        config_entry,
+        SUBENTRY_TYPE_JOURNEY,
+        hub.journeys,
+        JourneySensors.create,
+        _journey_layout,
+    )
+    removed: list[SubentrySensors[Any, Any]] = [*stops_removed, *journeys_removed]
+    added: list[SubentrySensors[Any, Any]] = [*stops_added, *journeys_added]
+
+    entity_registry = er.async_get(hass)
+    for sensors in removed:
+        await sensors.async_remove(entity_registry)
+    for stop in stops_removed:
+        if stop.subentry is not None and stop.subentry.subentry_id not in hub.stops:
+            hub.async_remove_snapshot(stop.coordinator.snapshot_key)
+    hub.async_prune_journeys()
+
+    if added:
+        await _async_refresh_coordinators(
+            hass, config_entry, [stop.coordinator for stop in added], False
+        )
+        hub.async_add_entities(
+            [sensor for stop in added for sensor in stop.entities]
+        )
 
-    async_add_entities(sensors, True)
+    _LOGGER.debug(
+        "Updated stops and journeys of %s: %d added, %d removed",
+        config_entry.title,
+        len(added),
+        len(removed),
+    )
+    return True
 
 
-class TransportNSWSensor(CoordinatorEntity, SensorEntity):
+async def _async_update_subentry_sensors[SensorsT: SubentrySensors[Any, Any]](
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    subentry_type: str,
+    subentry_sensors: dict[str, SensorsT],
+    create: Callable[[HomeAssistant, ConfigEntry, ConfigSubentry], SensorsT],
+    layout: Callable[[ConfigSubentry], Any],
+) -> tuple[list[SensorsT], list[SensorsT]]:
+    """Apply the changes to the subentries of a type to their sensors.
+
+    Returns the sensors that were removed and those that were added.
+    """
+    subentries = {
+        subentry_id: subentry
+        for subentry_id, subentry in config_entry.subentries.items()
+        if subentry.subentry_type == subentry_type
+    }
+    removed = [
+        subentry_sensors.pop(subentry_id)
+        for subentry_id in list(subentry_sensors)
+        if subentry_id not in subentries
+    ]
+    added: list[SensorsT] = []
+
+    for subentry_id, subentry in subentries.items():
+        sensors = subentry_sensors.get(subentry_id)
+        if (
+            sensors is None
+            or sensors.subentry is None
+            or layout(sensors.subentry) != layout(subentry)
+        ):
+            # New subentry, or the change affects which sensors exist or
+            # their unique IDs, so the old sensors are replaced
+            if sensors is not None:
+                removed.append(sensors)
+            sensors = subentry_sensors[subentry_id] = create(
+                hass, config_entry, subentry
+            )
+            added.append(sensors)
+        elif sensors.subentry != subentry:
+            sensors.subentry = subentry
+            for sensor in sensors.sensors:
+                await sensor.async_update_config(config_entry, subentry)
+    return removed, added
+
+
+def _entry_config(config_entry: ConfigEntry) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Return the entry settings shared by every stop."""
+    return dict(config_entry.data), dict(config_entry.options)
+
+
+def _sensor_layout(subentry: ConfigSubentry) -> tuple[Any, ...]:
+    """Return the settings that decide a stop's sensors and their unique IDs."""
+    data = subentry.data
+    ranked = data.get(CONF_RANKED_SENSORS, False)
+    return (
+        data[CONF_STOP_ID],
+        data.get(CONF_ROUTE, "").strip(),
+        data.get(CONF_DESTINATION, "").strip(),
+        int(data.get(CONF_DEPARTURE_COUNT, DEFAULT_DEPARTURE_COUNT)) if ranked else 1,
+    )
+
+
+def _journey_layout(subentry: ConfigSubentry) -> JourneyQuery:
+    """Return the settings that decide a journey sensor's unique ID."""
+    return JourneyQuery.from_config(subentry.data)
+
+
+async def _async_refresh_coordinators(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    coordinators: Sequence[TransportNSWCoordinator | TransportNSWJourneyCoordinator],
+    first_refresh: bool,
+) -> None:
+    """Refresh coordinators concurrently, a burst's worth at a time.
+
+    The concurrency follows the API key's rate limit burst, so requests
+    beyond it would only queue in the scheduler anyway. When a refresh
+    fails, e.g. with ConfigEntryNotReady, the others are cancelled before
+    the error is raised so none outlive the failed setup.
+    """
+    semaphore = asyncio.Semaphore(get_hub(hass, config_entry).scheduler.burst)
+
+    async def _async_refresh(
+        coordinator: TransportNSWCoordinator | TransportNSWJourneyCoordinator,
+    ) -> None:
+        async with semaphore:
+            if first_refresh:
+                await coordinator.async_config_entry_first_refresh()
+            else:
+                await coordinator.async_refresh()
+
+    tasks = [
+        asyncio.create_task(_async_refresh(coordinator)) for coordinator in coordinators
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def _device_info(config_entry: ConfigEntry) -> DeviceInfo:
+    """Return the service device grouping all sensors of an API key."""
+    return DeviceInfo(
+        identifiers={(DOMAIN, config_entry.entry_id)},
+        name="Transport NSW",
+        manufacturer="Transport NSW",
+        entry_type=DeviceEntryType.SERVICE,
+    )
+
+
+def _ordinal(rank: int) -> str:
+    """Return the ordinal for a departure rank, e.g. 2nd."""
+    if 10 <= rank % 100 <= 20:
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(rank % 10, "th")
+    return f"{rank}{suffix}"
+
+
+class TransportNSWSensor(CoordinatorEntity[TransportNSWCoordinator], SensorEntity):
     """Implementation of an Transport NSW sensor."""
 
     _attr_attribution = "Data provided by Transport NSW"
     _attr_device_class = SensorDeviceClass.DURATION
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = UnitOfTime.MINUTES
+    # The stop never changes, and the list of upcoming departures and the
+    # restore marker change with every refresh, so they are not recorded
+    _unrecorded_attributes = frozenset(
+        {ATTR_STOP_ID, ATTR_DEPARTURES, ATTR_FETCHED_AT}
+    )
 
     def __init__(
         self,
         coordinator: TransportNSWCoordinator,
         config_entry: ConfigEntry,
         subentry: ConfigSubentry | None = None,
+        rank: int = 1,
     ) -> None:
-        """Initialize the sensor."""
+        """Initialize the sensor.
+
+        The sensor follows the next departure, or the departure at the given
+        rank (2 for the one after next, and so on).
+        """
         super().__init__(coordinator)
         self.config_entry = config_entry
         self.subentry = subentry
+        self.rank = rank
+        self._written_due: int | None = None
+        # Availability and departures of the last state written on a refresh
+        self._written_data: tuple[bool, Any] | None = None
 
         if subentry:
             # New subentry mode - don't set _attr_name here, use dynamic property
@@ -97,22 +404,26 @@ class TransportNSWSensor(CoordinatorEntity, SensorEntity):
             if destination:
                 unique_id_parts.append(f"dest_{destination}")
 
+            if rank > 1:
+                unique_id_parts.append(f"rank_{rank}")
+
             self._attr_unique_id = "_".join(unique_id_parts)
         else:
             # Legacy mode - don't set _attr_name here, use dynamic property
             self._attr_unique_id = f"{DOMAIN}_{config_entry.entry_id}"
 
-        # Device info for grouping entities - all sensors for same API key group together
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, config_entry.entry_id)},
-            name="Transport NSW",
-            manufacturer="Transport NSW",
-            entry_type=DeviceEntryType.SERVICE,
-        )
+        self._attr_device_info = _device_info(config_entry)
 
     @property
     def name(self) -> str:
         """Return the name of the sensor (dynamically updateable)."""
+        if self.rank > 1:
+            return f"{self.base_name} {_ordinal(self.rank)}"
+        return self.base_name
+
+    @property
+    def base_name(self) -> str:
+        """Return the name of the stop the sensor belongs to."""
         if self.subentry:
             # Check if name is provided in subentry data
             custom_name = self.subentry.data.get(CONF_NAME, "").strip()
@@ -154,37 +465,486 @@ class TransportNSWSensor(CoordinatorEntity, SensorEntity):
         # Trigger entity state update to reflect new name/configuration
         self.async_write_ha_state()
 
+    async def async_added_to_hass(self) -> None:
+        """Start the local countdown when added to Home Assistant."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_utc_time_change(
+                self.hass, self._async_countdown_tick, second=0
+            )
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state after a refresh changed what this sensor shows.
+
+        The coordinator only passes on changed data, but a sensor for a later
+        departure is left alone when only others changed. The countdown is
+        re-anchored from the refresh.
+        """
+        written = (self.available, self._shown_data)
+        if written == self._written_data:
+            return
+        self._written_data = written
+        self._written_due = self.native_value
+        super()._handle_coordinator_update()
+
+    @property
+    def _shown_data(self) -> Any:
+        """Return the part of the coordinator data this sensor shows."""
+        if (data := self.coordinator.data) is None or self.rank == 1:
+            # The next departure sensor lists every upcoming departure
+            return data
+        return data.at_rank(self.rank)
+
+    @callback
+    def _async_countdown_tick(self, now: datetime) -> None:
+        """Recompute minutes until departure between coordinator refreshes."""
+        if (due := self.native_value) != self._written_due:
+            self._written_due = due
+            self.async_write_ha_state()
+
+    @property
+    def _departure(self) -> UpcomingDeparture | None:
+        """Return the departure this sensor follows, if there is one."""
+        if (data := self.coordinator.data) is None:
+            return None
+        return data.at_rank(self.rank)
+
     @property
     def native_value(self) -> int | None:
-        """Return the state of the sensor."""
-        if self.coordinator.data is None:
+        """Return the state of the sensor.
+
+        The countdown is computed from the departure time anchored by the last
+        refresh, so it stays current without polling the API every minute.
+        """
+        if (upcoming := self._departure) is None:
             return None
-        return self.coordinator.data.get(ATTR_DUE_IN)
+        return max(
+            minutes_until(upcoming.departure.departure_time, dt_util.utcnow()), 0
+        )
 
     @property
-    def extra_state_attributes(self) -> dict[str, Any] | None:
-        """Return the state attributes."""
-        if self.coordinator.data is None:
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        """Return the state attributes.
+
+        They were built with the departure, or for the next departure sensor
+        by the coordinator data once a minute, so they are shared between
+        state writes.
+        """
+        if (data := self.coordinator.data) is None:
             return None
 
-        if self.subentry:
-            stop_id = self.subentry.data[CONF_STOP_ID]
+        if self.rank == 1 and (
+            listed := data.listed_attributes(dt_util.utcnow())
+        ) is not None:
+            return listed
+
+        if (upcoming := data.at_rank(self.rank)) is not None:
+            attributes = upcoming.attributes
+        elif self.subentry:
+            attributes = {
+                ATTR_STOP_ID: self.subentry.data[CONF_STOP_ID],
+                **NO_DEPARTURE_ATTRIBUTES,
+            }
         else:
-            stop_id = self.config_entry.data[CONF_STOP_ID]
+            attributes = {
+                ATTR_STOP_ID: self.config_entry.data[CONF_STOP_ID],
+                **NO_DEPARTURE_ATTRIBUTES,
+            }
 
-        return {
-            ATTR_STOP_ID: stop_id,
-            ATTR_ROUTE: self.coordinator.data.get(ATTR_ROUTE),
-            ATTR_DELAY: self.coordinator.data.get(ATTR_DELAY),
-            ATTR_REAL_TIME: self.coordinator.data.get(ATTR_REAL_TIME),
-            ATTR_DESTINATION: self.coordinator.data.get(ATTR_DESTINATION),
-            ATTR_MODE: self.coordinator.data.get(ATTR_MODE),
+        if self.rank == 1:
+            # No upcoming departures to list
+            attributes = {**attributes, ATTR_DEPARTURES: []}
+
+        # Departures restored after a restart are marked until the next update
+        if data.fetched_at:
+            attributes = {**attributes, ATTR_FETCHED_AT: data.fetched_at}
+
+        return attributes
+
+    @property
+    def icon(self) -> str:
+        """Icon to use in the frontend, if any."""
+        if (upcoming := self._departure) is None:
+            return TRANSPORT_ICONS[None]
+        return TRANSPORT_ICONS.get(upcoming.departure.mode, TRANSPORT_ICONS[None])
+
+
+class TransportNSWStateOnlySensor(TransportNSWSensor):
+    """Departure sensor whose history only keeps the minutes until departure.
+
+    Used when the entry is set to record the state only, leaving all the
+    departure details out of the recorder.
+    """
+
+    _unrecorded_attributes = frozenset({MATCH_ALL})
+
+
+def _sensor_class(config_entry: ConfigEntry) -> type[TransportNSWSensor]:
+    """Return the class of the entry's departure sensors."""
+    if config_entry.options.get(CONF_RECORD_STATE_ONLY, False):
+        return TransportNSWStateOnlySensor
+    return TransportNSWSensor
+
+
+class TransportNSWJourneySensor(
+    CoordinatorEntity[TransportNSWJourneyCoordinator], SensorEntity
+):
+    """Sensor for the next journey between two stops.
+
+    The state is the minutes until the journey leaves, counted down locally
+    between refreshes like the departure sensors.
+    """
+
+    _attr_attribution = "Data provided by Transport NSW"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MINUTES
+    # The stops never change, and the times and the list of upcoming journeys
+    # shift with every refresh, so they are not recorded
+    _unrecorded_attributes = frozenset(
+        {
+            ATTR_ORIGIN_ID,
+            ATTR_DESTINATION_ID,
+            ATTR_VIA_ID,
+            ATTR_DEPARTURE_TIME,
+            ATTR_ARRIVAL_TIME,
+            ATTR_JOURNEYS,
+        }
+    )
+
+    def __init__(
+        self,
+        coordinator: TransportNSWJourneyCoordinator,
+        config_entry: ConfigEntry,
+        subentry: ConfigSubentry,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self.config_entry = config_entry
+        self.subentry = subentry
+        self._written_due: int | None = None
+
+        self._attr_unique_id = (
+            f"{DOMAIN}_{coordinator.query.unique_id(config_entry.entry_id)}"
+        )
+        self._attr_device_info = _device_info(config_entry)
+
+    @property
+    def name(self) -> str:
+        """Return the name of the journey."""
+        return self.subentry.data.get(CONF_NAME, "").strip() or self.subentry.title
+
+    async def async_update_config(
+        self, config_entry: ConfigEntry, subentry: ConfigSubentry
+    ) -> None:
+        """Update sensor configuration and refresh coordinator."""
+        self.config_entry = config_entry
+        self.subentry = subentry
+        await self.coordinator.async_update_config(config_entry, subentry)
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self) -> None:
+        """Start the local countdown when added to Home Assistant."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_utc_time_change(
+                self.hass, self._async_countdown_tick, second=0
+            )
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Re-anchor the countdown from the refresh and write the state."""
+        self._written_due = self.native_value
+        super()._handle_coordinator_update()
+
+    @callback
+    def _async_countdown_tick(self, now: datetime) -> None:
+        """Recompute minutes until the journey leaves between refreshes."""
+        if (due := self.native_value) != self._written_due:
+            self._written_due = due
+            self.async_write_ha_state()
+
+    @property
+    def _journey(self) -> Journey | None:
+        """Return the journey this sensor follows, if there is one."""
+        if (data := self.coordinator.data) is None:
+            return None
+        return data.next
+
+    @property
+    def native_value(self) -> int | None:
+        """Return the minutes until the next journey leaves."""
+        if (journey := self._journey) is None:
+            return None
+        return max(minutes_until(journey.departure_time, dt_util.utcnow()), 0)
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        """Return the state attributes."""
+        if (data := self.coordinator.data) is None:
+            return None
+
+        query = self.coordinator.query
+        attributes: dict[str, Any] = {
+            ATTR_ORIGIN_ID: query.origin,
+            ATTR_DESTINATION_ID: query.destination,
+            ATTR_VIA_ID: query.via,
+            **NO_JOURNEY_ATTRIBUTES,
         }
+        if (journey := data.next) is not None:
+            attributes.update(
+                {
+                    ATTR_ROUTES: list(journey.routes),
+                    ATTR_MODE: journey.mode,
+                    ATTR_DELAY: journey.delay,
+                    ATTR_REAL_TIME: journey.real_time,
+                    ATTR_DEPARTURE_TIME: journey.departure_time,
+                    ATTR_ARRIVAL_TIME: journey.arrival_time,
+                    ATTR_DURATION: journey.duration,
+                    ATTR_CHANGES: journey.changes,
+                }
+            )
+
+        # Compact list of the upcoming journeys from the same request
+        now = dt_util.utcnow()
+        attributes[ATTR_JOURNEYS] = [
+            {
+                ATTR_ROUTES: list(journey.routes),
+                ATTR_DUE_IN: max(minutes_until(journey.departure_time, now), 0),
+                ATTR_DURATION: journey.duration,
+                ATTR_DELAY: journey.delay,
+            }
+            for journey in data.journeys
+        ]
+        return attributes
 
     @property
     def icon(self) -> str:
         """Icon to use in the frontend, if any."""
-        if self.coordinator.data is None:
+        if (journey := self._journey) is None:
             return TRANSPORT_ICONS[None]
-        mode = self.coordinator.data.get(ATTR_MODE)
-        return TRANSPORT_ICONS.get(mode, TRANSPORT_ICONS[None])
+        return TRANSPORT_ICONS.get(journey.mode, TRANSPORT_ICONS[None])
+
+
+class TransportNSWJourneyStateOnlySensor(TransportNSWJourneySensor):
+    """Journey sensor whose history only keeps the minutes until it leaves."""
+
+    _unrecorded_attributes = frozenset({MATCH_ALL})
+
+
+def _journey_sensor_class(
+    config_entry: ConfigEntry,
+) -> type[TransportNSWJourneySensor]:
+    """Return the class of the entry's journey sensors."""
+    if config_entry.options.get(CONF_RECORD_STATE_ONLY, False):
+        return TransportNSWJourneyStateOnlySensor
+    return TransportNSWJourneySensor
+
+
+@dataclass(frozen=True, kw_only=True)
+class TransportNSWStatsSensorEntityDescription(SensorEntityDescription):
+    """Describes a diagnostic sensor for the updates of a stop."""
+
+    value_fn: Callable[[FetchStats], float | int | None]
+
+
+STATS_SENSORS: tuple[TransportNSWStatsSensorEntityDescription, ...] = (
+    TransportNSWStatsSensorEntityDescription(
+        key="update_duration",
+        name="update duration",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        suggested_display_precision=0,
+        value_fn=lambda stats: (
+            None if stats.last_duration is None else stats.last_duration * 1000
+        ),
+    ),
+    TransportNSWStatsSensorEntityDescription(
+        key="response_size",
+        name="response size",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        value_fn=lambda stats: stats.last_payload_bytes,
+    ),
+)
+
+
+def _stats_sensors(sensor: TransportNSWSensor) -> list[TransportNSWStatsSensor]:
+    """Return the diagnostic sensors for the stop of a sensor."""
+    return [TransportNSWStatsSensor(sensor, description) for description in STATS_SENSORS]
+
+
+class TransportNSWStatsSensor(
+    CoordinatorEntity[TransportNSWCoordinator], SensorEntity
+):
+    """Diagnostic sensor reporting how the updates of a stop went.
+
+    The sensors are disabled by default. Their attributes hold the success
+    and failure counts, the time spent in each phase of the last update and
+    a histogram of update durations.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    # The stats change with every update; only the value is worth recording
+    _unrecorded_attributes = frozenset({MATCH_ALL})
+    entity_description: TransportNSWStatsSensorEntityDescription
+
+    def __init__(
+        self,
+        sensor: TransportNSWSensor,
+        description: TransportNSWStatsSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor for the stop of the given departure sensor."""
+        super().__init__(sensor.coordinator)
+        self.entity_description = description
+        self._sensor = sensor
+        self._attr_unique_id = f"{sensor.unique_id}_{description.key}"
+        self._attr_device_info = sensor.device_info
+
+    @property
+    def name(self) -> str:
+        """Return the name of the sensor, following its stop's name."""
+        return f"{self._sensor.base_name} {self.entity_description.name}"
+
+    @property
+    def available(self) -> bool:
+        """Return True, as failed updates are worth reporting too."""
+        return True
+
+    async def async_added_to_hass(self) -> None:
+        """Write the stats after every update, even one with unchanged data."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_stats_listener(self.async_write_ha_state)
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Ignore changed data, which the stats listener has already written."""
+
+    @property
+    def native_value(self) -> float | int | None:
+        """Return the value from the coordinator's stats."""
+        return self.entity_description.value_fn(self.coordinator.stats)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the coordinator's stats."""
+        return self.coordinator.stats.as_dict()
+
+
+class TransportNSWApiKeySensor(SensorEntity):
+    """Diagnostic sensor counting today's requests with the entry's API key.
+
+    The attributes hold the rest of today's budget, whether requests are
+    paused by the circuit breaker, and the outcomes and durations of all
+    requests sent with the key. The sensor is polled, as the count changes
+    with every coordinator's updates.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = "requests"
+    _attr_icon = "mdi:counter"
+    _attr_name = "Transport NSW API requests today"
+    # The budget and stats change with every request; only the count is
+    # worth recording
+    _unrecorded_attributes = frozenset({MATCH_ALL})
+
+    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+        """Initialize the sensor."""
+        self._hub = get_hub(hass, config_entry)
+        self._attr_unique_id = f"{DOMAIN}_{config_entry.entry_id}_api_requests_today"
+        self._attr_device_info = _device_info(config_entry)
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of requests sent today."""
+        # The remaining budget is reset at midnight, unlike the raw count
+        scheduler = self._hub.scheduler
+        return scheduler.daily_budget - scheduler.remaining_today
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the remaining budget and the stats of the API key."""
+        return {
+            "remaining_today": self._hub.scheduler.remaining_today,
+            "circuit": self._hub.breaker.state,
+            **self._hub.stats.as_dict(),
+        }
+
+
+@dataclass
+class SubentrySensors[
+    CoordinatorT: DataUpdateCoordinator[Any], SensorT: SensorEntity
+]:
+    """The coordinator and sensors of a subentry, or of a legacy entry."""
+
+    subentry: ConfigSubentry | None
+    coordinator: CoordinatorT
+    sensors: list[SensorT]
+    # Diagnostic sensors reporting how the coordinator's updates went
+    stats_sensors: list[TransportNSWStatsSensor] = field(default_factory=list)
+
+    @property
+    def entities(self) -> list[SensorEntity]:
+        """Return all sensors of the subentry."""
+        return [*self.sensors, *self.stats_sensors]
+
+    async def async_remove(self, entity_registry: er.EntityRegistry) -> None:
+        """Remove the sensors and stop the coordinator."""
+        for sensor in self.entities:
+            if sensor.registry_entry is not None:
+                # Removing the registry entry also removes the entity
+                entity_registry.async_remove(sensor.entity_id)
+            elif sensor.hass is not None:
+                await sensor.async_remove()
+        await self.coordinator.async_shutdown()
+
+
+@dataclass
+class StopSensors(SubentrySensors[TransportNSWCoordinator, TransportNSWSensor]):
+    """The coordinator and sensors of a stop subentry, or of a legacy entry."""
+
+    @classmethod
+    def create(
+        cls, hass: HomeAssistant, config_entry: ConfigEntry, subentry: ConfigSubentry
+    ) -> StopSensors:
+        """Create the coordinator and sensors for a subentry."""
+        coordinator = TransportNSWCoordinator(hass, config_entry, subentry)
+        sensor_class = _sensor_class(config_entry)
+        sensors = [sensor_class(coordinator, config_entry, subentry)]
+
+        # Optional sensors for the 2nd, 3rd, ... departure share the
+        # coordinator, so they cost no extra requests
+        if subentry.data.get(CONF_RANKED_SENSORS, False):
+            sensors.extend(
+                sensor_class(coordinator, config_entry, subentry, rank)
+                for rank in range(2, coordinator.departure_count + 1)
+            )
+        return cls(subentry, coordinator, sensors, _stats_sensors(sensors[0]))
+
+
+@dataclass
+class JourneySensors(
+    SubentrySensors[TransportNSWJourneyCoordinator, TransportNSWJourneySensor]
+):
+    """The coordinator and sensor of a journey subentry."""
+
+    @classmethod
+    def create(
+        cls, hass: HomeAssistant, config_entry: ConfigEntry, subentry: ConfigSubentry
+    ) -> JourneySensors:
+        """Create the coordinator and sensor for a subentry."""
+        coordinator = TransportNSWJourneyCoordinator(hass, config_entry, subentry)
+        sensor_class = _journey_sensor_class(config_entry)
+        return cls(
+            subentry, coordinator, [sensor_class(coordinator, config_entry, subentry)]
+        )
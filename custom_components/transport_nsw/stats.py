@@ -0,0 +1,186 @@
+"""Fetch instrumentation for the Transport NSW integration."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+from time import perf_counter
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+# Upper bounds of the latency histogram buckets, in seconds. Slower
+# requests fall into a final, unbounded bucket.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Phases of a fetch, in the order they happen
+PHASE_QUEUE = "queue"  # waiting for the API key's rate limit
+PHASE_REQUEST = "request"  # the HTTP request, including reading the body
+PHASE_PARSE = "parse"  # normalising the response
+PHASE_EXECUTOR = "executor"  # timetable lookups in the executor
+
+# Number of fetches whose timings are kept for diagnostics
+RECENT_FETCHES = 20
+
+# The latest raw responses are kept for diagnostics, up to this many and
+# this many bytes in total. They are only decoded when diagnostics are
+# downloaded.
+RESPONSE_LOG_MAX_COUNT = 10
+RESPONSE_LOG_MAX_BYTES = 1 << 20
+
+
+class Histogram:
+    """Count observations into fixed buckets."""
+
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Initialize the histogram."""
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """Count a value into its bucket."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def as_dict(self) -> dict[str, int]:
+        """Return the bucket counts keyed by their upper bound, e.g. le_0.5."""
+        labels = [f"le_{bound:g}" for bound in self.bounds] + ["le_inf"]
+        return dict(zip(labels, self.counts, strict=True))
+
+
+@dataclass(slots=True)
+class FetchTrace:
+    """Timings and size of a single fetch, filled in as it goes."""
+
+    phases: dict[str, float] = field(default_factory=dict)
+    payload_bytes: int | None = None
+    # The raw response body, kept for the response log
+    body: bytes | None = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the time spent in the block to the named phase."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - start
+
+
+@dataclass(slots=True)
+class FetchStats:
+    """Running totals of the fetches of a coordinator or an API key."""
+
+    successes: int = 0
+    failures: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+    last_duration: float | None = None
+    last_phases: dict[str, float] = field(default_factory=dict)
+    last_payload_bytes: int | None = None
+    payload_bytes: int = 0
+    recent: deque[dict[str, Any]] = field(
+        default_factory=lambda: deque(maxlen=RECENT_FETCHES)
+    )
+
+    def record(self, duration: float, trace: FetchTrace | None, success: bool) -> None:
+        """Record a finished fetch."""
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.latency.observe(duration)
+        self.last_duration = duration
+        if trace is not None:
+            self.last_phases = dict(trace.phases)
+            if trace.payload_bytes is not None:
+                self.last_payload_bytes = trace.payload_bytes
+                self.payload_bytes += trace.payload_bytes
+        self.recent.append(
+            {
+                "at": dt_util.utcnow(),
+                "success": success,
+                "duration": duration,
+                "phases": self.last_phases if trace is not None else {},
+                "payload_bytes": trace.payload_bytes if trace is not None else None,
+            }
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the totals as state attributes or diagnostics."""
+        return {
+            "successes": self.successes,
+            "failures": self.failures,
+            "last_phases": {
+                phase: round(seconds, 4) for phase, seconds in self.last_phases.items()
+            },
+            "last_payload_bytes": self.last_payload_bytes,
+            "payload_bytes": self.payload_bytes,
+            "latency_histogram": self.latency.as_dict(),
+        }
+
+
+class ResponseLog:
+    """Keep the latest raw API responses, within a count and size limit.
+
+    The bodies are kept as received, so logging a response costs a reference
+    rather than a copy. Failed requests are logged with their error.
+    """
+
+    def __init__(
+        self,
+        max_count: int = RESPONSE_LOG_MAX_COUNT,
+        max_bytes: int = RESPONSE_LOG_MAX_BYTES,
+    ) -> None:
+        """Initialize the log."""
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: deque[tuple[datetime, str, bytes | None, str | None]] = deque()
+
+    def __len__(self) -> int:
+        """Return the number of logged responses."""
+        return len(self._entries)
+
+    def add(self, request: str, body: bytes | None, error: str | None = None) -> None:
+        """Log the response to a request, dropping the oldest beyond the limits."""
+        if body is not None and len(body) > self.max_bytes:
+            error = f"{len(body)} byte response too large to keep"
+            body = None
+        self._entries.append((dt_util.utcnow(), request, body, error))
+        self.size += len(body or b"")
+        while len(self._entries) > self.max_count or self.size > self.max_bytes:
+            self.size -= len(self._entries.popleft()[2] or b"")
+
+    def as_list(self, secrets: Iterable[str] = ()) -> list[dict[str, Any]]:
+        """Return the logged responses, oldest first, with secrets redacted."""
+        secrets = [secret for secret in secrets if secret]
+        return [
+            {
+                "at": at,
+                "request": request,
+                "error": error,
+                "response": None if body is None else _decode(body, secrets),
+            }
+            for at, request, body, error in self._entries
+        ]
+
+
+def _decode(body: bytes, secrets: list[str]) -> Any:
+    """Decode a logged response body, replacing secrets in it."""
+    text = body.decode(errors="replace")
+    for secret in secrets:
+        text = text.replace(secret, "**REDACTED**")
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
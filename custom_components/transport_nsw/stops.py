@@ -0,0 +1,172 @@
+"""Offline index of Transport NSW stops built from GTFS static data."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator
+import csv
+import io
+import mmap
+import os
+from pathlib import Path
+import struct
+import zipfile
+
+STOP_INDEX_MAGIC = b"TNSWSTP1"
+MAX_SEARCH_RESULTS = 20
+
+# Stops, stations and platforms; entrances, generic nodes and boarding
+# areas (location types 2 to 4) cannot be used with the departure monitor
+_STOP_LOCATION_TYPES = ("", "0", "1")
+
+# The index file is laid out as:
+#   header     magic and number of stops
+#   by name    offset of each record, sorted by case-folded name
+#   by ID      offset of each record, sorted by stop ID
+#   records    length-prefixed UTF-8 stop ID and name of each stop
+_HEADER = struct.Struct("<8sI")
+_OFFSET = struct.Struct("<I")
+_LENGTH = struct.Struct("<H")
+
+
+def read_gtfs_stops(source: Path) -> Iterator[tuple[str, str]]:
+    """Yield the ID and name of each stop in a GTFS bundle or stops.txt file."""
+    if zipfile.is_zipfile(source):
+        with (
+            zipfile.ZipFile(source) as bundle,
+            bundle.open("stops.txt") as member,
+        ):
+            yield from _read_stops(io.TextIOWrapper(member, encoding="utf-8-sig"))
+    else:
+        with source.open(encoding="utf-8-sig", newline="") as file:
+            yield from _read_stops(file)
+
+
+def _read_stops(file: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """Yield the ID and name of each usable stop in stops.txt rows."""
+    for row in csv.DictReader(file):
+        if row.get("location_type", "") in _STOP_LOCATION_TYPES:
+            yield row["stop_id"], row["stop_name"]
+
+
+def build_stop_index(stops: Iterable[tuple[str, str]], path: Path) -> int:
+    """Write the index of the given stops to path and return the stop count.
+
+    The file is written next to path and then moved into place, so an open
+    index keeps working until it is reopened.
+    """
+    records = bytearray()
+    offsets: dict[str, int] = {}
+    names: dict[str, str] = {}
+    for stop_id, name in stops:
+        if stop_id in offsets:
+            continue
+        offsets[stop_id] = len(records)
+        names[stop_id] = name
+        for value in (stop_id, name):
+            encoded = value.encode()
+            records += _LENGTH.pack(len(encoded)) + encoded
+
+    count = len(offsets)
+    base = _HEADER.size + 2 * count * _OFFSET.size
+    by_name = sorted(offsets, key=lambda stop_id: (names[stop_id].casefold(), stop_id))
+    by_id = sorted(offsets)
+
+    tmp_path = path.with_suffix(".tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tmp_path.open("wb") as file:
+        file.write(_HEADER.pack(STOP_INDEX_MAGIC, count))
+        for order in (by_name, by_id):
+            file.write(
+                b"".join(_OFFSET.pack(base + offsets[stop_id]) for stop_id in order)
+            )
+        file.write(records)
+    os.replace(tmp_path, path)
+    return count
+
+
+def _lower_bound(count: int, key_at: Callable[[int], str], target: str) -> int:
+    """Return the first position whose key is not less than target."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if key_at(middle) < target:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+class StopIndex:
+    """Look up stops in an index file written by build_stop_index.
+
+    The file is memory-mapped, so only the pages touched by a lookup are
+    read from disk.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Open the index."""
+        with path.open("rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != STOP_INDEX_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a Transport NSW stop index")
+        self._by_name = _HEADER.size
+        self._by_id = self._by_name + self._count * _OFFSET.size
+
+    def __len__(self) -> int:
+        """Return the number of stops."""
+        return self._count
+
+    def get(self, stop_id: str) -> str | None:
+        """Return the name of a stop, or None if it isn't in the index."""
+        position = _lower_bound(
+            self._count, lambda i: self._stop(self._by_id, i)[0], stop_id
+        )
+        if position < self._count:
+            found_id, name = self._stop(self._by_id, position)
+            if found_id == stop_id:
+                return name
+        return None
+
+    def search(
+        self, query: str, limit: int = MAX_SEARCH_RESULTS
+    ) -> list[tuple[str, str]]:
+        """Return the ID and name of stops whose name starts with query.
+
+        A query that is a known stop ID returns that stop first.
+        """
+        query = query.strip()
+        results: list[tuple[str, str]] = []
+        if not query:
+            return results
+        if (name := self.get(query)) is not None:
+            results.append((query, name))
+
+        prefix = query.casefold()
+        position = _lower_bound(
+            self._count, lambda i: self._stop(self._by_name, i)[1].casefold(), prefix
+        )
+        while len(results) < limit and position < self._count:
+            stop_id, name = self._stop(self._by_name, position)
+            if not name.casefold().startswith(prefix):
+                break
+            if stop_id != query:
+                results.append((stop_id, name))
+            position += 1
+        return results
+
+    def close(self) -> None:
+        """Close the index."""
+        self._mmap.close()
+
+    def _stop(self, order: int, position: int) -> tuple[str, str]:
+        """Return the ID and name of the stop at a position in a sort order."""
+        (offset,) = _OFFSET.unpack_from(self._mmap, order + position * _OFFSET.size)
+        (id_length,) = _LENGTH.unpack_from(self._mmap, offset)
+        offset += _LENGTH.size
+        stop_id = self._mmap[offset:offset + id_length].decode()
+        offset += id_length
+        (name_length,) = _LENGTH.unpack_from(self._mmap, offset)
+        offset += _LENGTH.size
+        return stop_id, self._mmap[offset:offset + name_length].decode()
@@ -0,0 +1,467 @@
+"""Offline timetable of Transport NSW departures built from GTFS static data."""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterator
+import csv
+from datetime import date, datetime, time, timedelta, tzinfo
+import io
+import mmap
+import os
+from pathlib import Path
+import struct
+from typing import Any
+import zipfile
+from zoneinfo import ZoneInfo
+
+from homeassistant.const import ATTR_MODE
+from homeassistant.util import dt as dt_util
+
+from .const import ATTR_DESTINATION, ATTR_ROUTE
+from .departures import Departure
+
+TIMETABLE_MAGIC = b"TNSWTTB2"
+
+# GTFS times are relative to the service day in the agency's time zone
+GTFS_TIME_ZONE = "Australia/Sydney"
+
+# How far ahead scheduled departures are looked up
+TIMETABLE_HORIZON = timedelta(hours=3)
+
+# GTFS calendar_dates exception types
+_SERVICE_ADDED = 1
+
+# Marks a stop without a parent station
+_NO_PARENT = 0xFFFFFFFF
+
+# The file is a header followed by uint32 columns in this order, then the
+# UTF-8 blob of the string table. Stop times are grouped by stop and sorted
+# by departure time, so a stop's departures are one slice of each column.
+_COLUMNS = (
+    ("stop_key", "stops"),  # string of each stop ID, sorted by stop ID
+    ("stop_start", "stops+1"),  # first stop time of each stop
+    ("stop_parent", "stops"),  # string of the parent station ID, or _NO_PARENT
+    ("time_seconds", "times"),  # departure in seconds from the service day
+    ("time_trip", "times"),
+    ("trip_route", "trips"),
+    ("trip_service", "trips"),
+    ("trip_headsign", "trips"),  # string
+    ("trip_key", "trips"),  # string of each trip ID
+    ("trip_order", "trips"),  # trips sorted by trip ID
+    ("route_name", "routes"),  # string
+    ("route_type", "routes"),
+    ("service_days", "services"),  # bit 0 for Monday to bit 6 for Sunday
+    ("service_start", "services"),  # YYYYMMDD
+    ("service_end", "services"),  # YYYYMMDD
+    ("exception_start", "services+1"),
+    ("exception_date", "exceptions"),  # YYYYMMDD
+    ("exception_type", "exceptions"),
+    ("string_start", "strings+1"),
+)
+_COUNTS = ("stops", "times", "trips", "routes", "services", "exceptions", "strings")
+_HEADER = struct.Struct(f"<8s{len(_COUNTS)}I")
+_WEEKDAYS = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+
+
+def _mode(route_type: int) -> str | None:
+    """Return the transport mode of a GTFS route type, incl. extended types."""
+    if route_type == 712:
+        return "Schoolbus"
+    if route_type in (0, 5) or 900 <= route_type < 1000:
+        return "Lightrail"
+    if route_type in (1, 2, 12) or 100 <= route_type < 200 or 400 <= route_type < 500:
+        return "Train"
+    if route_type == 3 or 700 <= route_type < 800:
+        return "Bus"
+    if 200 <= route_type < 300:
+        return "Coach"
+    if route_type == 4 or 1000 <= route_type < 1300:
+        return "Ferry"
+    return None
+
+
+def _seconds(value: str) -> int:
+    """Return the seconds of a GTFS HH:MM:SS time, which may pass 24:00:00."""
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _service_day_start(day: date, time_zone: tzinfo) -> datetime:
+    """Return the time GTFS times of a service day count from.
+
+    That is noon minus 12 hours, which is an hour off midnight on the days
+    daylight saving time starts or ends. The subtraction is done in UTC, as
+    it would otherwise land on the wall clock's midnight again.
+    """
+    return dt_util.as_utc(datetime.combine(day, time(12), time_zone)) - timedelta(
+        hours=12
+    )
+
+
+def _yyyymmdd(day: date) -> int:
+    """Return a date as a YYYYMMDD number, like GTFS dates."""
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+class _Strings:
+    """Deduplicated string table."""
+
+    def __init__(self) -> None:
+        self.index: dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        """Return the index of a string, adding it if needed."""
+        return self.index.setdefault(value, len(self.index))
+
+
+class _TimetableBuilder:
+    """Collect the columns of a timetable from the files of a GTFS bundle."""
+
+    def __init__(self, gtfs: zipfile.ZipFile) -> None:
+        self._gtfs = gtfs
+        self._names = set(gtfs.namelist())
+        self.strings = _Strings()
+        self.columns: dict[str, array] = {name: array("I") for name, _ in _COLUMNS}
+        self.routes: dict[str, int] = {}
+        self.services: dict[str, int] = {}
+        self.trips: dict[str, int] = {}
+        self._exceptions: dict[int, list[tuple[int, int]]] = defaultdict(list)
+
+    def rows(self, name: str) -> Iterator[dict[str, str]]:
+        """Yield the rows of a file of the bundle, if it has one."""
+        if name not in self._names:
+            return
+        with self._gtfs.open(name) as member:
+            yield from csv.DictReader(io.TextIOWrapper(member, encoding="utf-8-sig"))
+
+    def service(self, service_id: str) -> int:
+        """Return the position of a service, adding one that runs on no days."""
+        if service_id not in self.services:
+            self.services[service_id] = len(self.services)
+            for name in ("service_days", "service_start", "service_end"):
+                self.columns[name].append(0)
+        return self.services[service_id]
+
+    def add_routes(self) -> None:
+        """Add the routes from routes.txt."""
+        columns = self.columns
+        for row in self.rows("routes.txt"):
+            self.routes[row["route_id"]] = len(self.routes)
+            columns["route_name"].append(
+                self.strings.add(
+                    row.get("route_short_name") or row.get("route_long_name", "")
+                )
+            )
+            columns["route_type"].append(int(row.get("route_type") or 3))
+
+    def add_calendar(self) -> None:
+        """Add the services from calendar.txt and their calendar_dates.txt exceptions."""
+        columns = self.columns
+        for row in self.rows("calendar.txt"):
+            index = self.service(row["service_id"])
+            columns["service_days"][index] = sum(
+                1 << bit for bit, day in enumerate(_WEEKDAYS) if row.get(day) == "1"
+            )
+            columns["service_start"][index] = int(row["start_date"])
+            columns["service_end"][index] = int(row["end_date"])
+
+        for row in self.rows("calendar_dates.txt"):
+            self._exceptions[self.service(row["service_id"])].append(
+                (int(row["date"]), int(row["exception_type"]))
+            )
+
+    def add_trips(self) -> None:
+        """Add the trips of known routes from trips.txt."""
+        columns = self.columns
+        for row in self.rows("trips.txt"):
+            if row["route_id"] not in self.routes:
+                continue
+            self.trips[row["trip_id"]] = len(self.trips)
+            columns["trip_route"].append(self.routes[row["route_id"]])
+            columns["trip_service"].append(self.service(row["service_id"]))
+            columns["trip_headsign"].append(
+                self.strings.add(row.get("trip_headsign", ""))
+            )
+            columns["trip_key"].append(self.strings.add(row["trip_id"]))
+        columns["trip_order"].extend(
+            self.trips[trip_id] for trip_id in sorted(self.trips)
+        )
+
+    def add_exceptions(self) -> None:
+        """Add the exceptions of every service, once all services are known."""
+        columns = self.columns
+        for index in range(len(self.services)):
+            columns["exception_start"].append(len(columns["exception_date"]))
+            for exception_date, exception_type in sorted(self._exceptions[index]):
+                columns["exception_date"].append(exception_date)
+                columns["exception_type"].append(exception_type)
+        columns["exception_start"].append(len(columns["exception_date"]))
+
+    def add_stop_times(self) -> None:
+        """Add the departures from stop_times.txt, grouped by stop and sorted."""
+        columns = self.columns
+        parents = {
+            row["stop_id"]: row["parent_station"]
+            for row in self.rows("stops.txt")
+            if row.get("parent_station")
+        }
+
+        # First pass: count the departures of each stop to size its slice
+        counts: dict[str, int] = defaultdict(int)
+        for stops, _, _ in self._departures(parents):
+            for stop_id in stops:
+                counts[stop_id] += 1
+
+        positions: dict[str, int] = {}
+        for stop_id in sorted(counts):
+            positions[stop_id] = len(columns["time_seconds"])
+            columns["stop_key"].append(self.strings.add(stop_id))
+            parent = parents.get(stop_id)
+            columns["stop_parent"].append(
+                self.strings.add(parent) if parent else _NO_PARENT
+            )
+            columns["stop_start"].append(positions[stop_id])
+            columns["time_seconds"].extend(array("I", bytes(4 * counts[stop_id])))
+        columns["stop_start"].append(len(columns["time_seconds"]))
+        columns["time_trip"] = array("I", bytes(4 * len(columns["time_seconds"])))
+
+        # Second pass: fill in each stop's slice, then sort it by time
+        for stops, trip, seconds in self._departures(parents):
+            for stop_id in stops:
+                position = positions[stop_id]
+                columns["time_seconds"][position] = seconds
+                columns["time_trip"][position] = trip
+                positions[stop_id] = position + 1
+
+        seconds_column, trip_column = columns["time_seconds"], columns["time_trip"]
+        starts = columns["stop_start"]
+        for start, end in zip(starts, starts[1:]):
+            ordered = sorted(zip(seconds_column[start:end], trip_column[start:end]))
+            seconds_column[start:end] = array("I", (seconds for seconds, _ in ordered))
+            trip_column[start:end] = array("I", (trip for _, trip in ordered))
+
+    def _departures(
+        self, parents: dict[str, str]
+    ) -> Iterator[tuple[list[str], int, int]]:
+        """Yield the stops, trip and time of each boardable stop time."""
+        for row in self.rows("stop_times.txt"):
+            # Services that can't be boarded here aren't departures
+            if row.get("pickup_type") == "1" or not row.get("departure_time"):
+                continue
+            if (trip := self.trips.get(row["trip_id"])) is None:
+                continue
+            stop_id = row["stop_id"]
+            stops = [stop_id]
+            if parent := parents.get(stop_id):
+                stops.append(parent)
+            yield stops, trip, _seconds(row["departure_time"])
+
+    def write(self, path: Path) -> int:
+        """Write the timetable to path and return its number of stop times."""
+        columns = self.columns
+        blob = bytearray()
+        for value in self.strings.index:
+            columns["string_start"].append(len(blob))
+            blob += value.encode()
+        columns["string_start"].append(len(blob))
+
+        counts_header = {
+            "stops": len(columns["stop_key"]),
+            "times": len(columns["time_seconds"]),
+            "trips": len(self.trips),
+            "routes": len(self.routes),
+            "services": len(self.services),
+            "exceptions": len(columns["exception_date"]),
+            "strings": len(self.strings.index),
+        }
+        tmp_path = path.with_suffix(".tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_path.open("wb") as file:
+            file.write(
+                _HEADER.pack(TIMETABLE_MAGIC, *(counts_header[name] for name in _COUNTS))
+            )
+            for name, _ in _COLUMNS:
+                file.write(columns[name].tobytes())
+            file.write(blob)
+        os.replace(tmp_path, path)
+        return counts_header["times"]
+
+
+def build_timetable(bundle: Path, path: Path) -> int:
+    """Write the timetable of a GTFS bundle to path and return its stop times.
+
+    Stop times are grouped by stop with two passes over stop_times.txt, so
+    memory use stays at a few bytes per stop time. Departures from a
+    platform are also listed under its parent station.
+    """
+    with zipfile.ZipFile(bundle) as gtfs:
+        builder = _TimetableBuilder(gtfs)
+        builder.add_routes()
+        builder.add_calendar()
+        # Trips can refer to services only listed in calendar_dates.txt, so
+        # the exceptions are added once every service is known
+        builder.add_trips()
+        builder.add_exceptions()
+        builder.add_stop_times()
+    return builder.write(path)
+
+
+class Timetable:
+    """Look up scheduled departures in a file written by build_timetable.
+
+    The file is memory-mapped and its columns are read in place, so only
+    the slices of the stops that are looked up are read from disk.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Open the timetable."""
+        with path.open("rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *counts = _HEADER.unpack_from(self._mmap, 0)
+        if magic != TIMETABLE_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a Transport NSW timetable")
+        sizes = dict(zip(_COUNTS, counts))
+
+        view = memoryview(self._mmap)
+        offset = _HEADER.size
+        self._columns: dict[str, memoryview] = {}
+        for name, size in _COLUMNS:
+            count, _, extra = size.partition("+")
+            length = sizes[count] + int(extra or 0)
+            self._columns[name] = view[offset:offset + 4 * length].cast("I")
+            offset += 4 * length
+        self._strings = view[offset:]
+        self._time_zone = ZoneInfo(GTFS_TIME_ZONE)
+
+    def __len__(self) -> int:
+        """Return the number of stop times."""
+        return len(self._columns["time_seconds"])
+
+    def departures(
+        self,
+        stop_id: str,
+        now: datetime,
+        horizon: timedelta = TIMETABLE_HORIZON,
+    ) -> list[Departure]:
+        """Return the scheduled departures from a stop within horizon of now.
+
+        Departures are marked as not real-time.
+        """
+        if (stop := self._find_stop(stop_id)) is None:
+            return []
+        columns = self._columns
+        start, end = columns["stop_start"][stop], columns["stop_start"][stop + 1]
+        seconds_column = columns["time_seconds"]
+
+        found: list[tuple[datetime, int]] = []
+        today = now.astimezone(self._time_zone).date()
+        # Trips of the previous service day can run past midnight
+        for day in (today - timedelta(days=1), today, today + timedelta(days=1)):
+            day_start = _service_day_start(day, self._time_zone)
+            earliest = (now - day_start).total_seconds()
+            latest = earliest + horizon.total_seconds()
+            if latest < 0:
+                continue
+            position = bisect_left(seconds_column, max(earliest, 0), start, end)
+            while position < end and seconds_column[position] < latest:
+                trip = columns["time_trip"][position]
+                if self._runs_on(columns["trip_service"][trip], day):
+                    found.append(
+                        (day_start + timedelta(seconds=seconds_column[position]), trip)
+                    )
+                position += 1
+
+        found.sort()
+        return [self._departure(departure_time, trip) for departure_time, trip in found]
+
+    def trip(self, trip_id: str) -> dict[str, Any] | None:
+        """Return the route, destination and mode of a trip, if it is known."""
+        columns = self._columns
+        order = columns["trip_order"]
+        position = bisect_left(
+            range(len(order)),
+            trip_id,
+            key=lambda i: self._string(columns["trip_key"][order[i]]),
+        )
+        if (
+            position == len(order)
+            or self._string(columns["trip_key"][order[position]]) != trip_id
+        ):
+            return None
+        return self._trip(order[position])
+
+    def parent(self, stop_id: str) -> str | None:
+        """Return the parent station of a stop, if it has one."""
+        if (stop := self._find_stop(stop_id)) is None:
+            return None
+        if (parent := self._columns["stop_parent"][stop]) == _NO_PARENT:
+            return None
+        return self._string(parent)
+
+    def close(self) -> None:
+        """Close the timetable."""
+        for column in self._columns.values():
+            column.release()
+        self._columns.clear()
+        self._strings.release()
+        self._mmap.close()
+
+    def _departure(self, departure_time: datetime, trip: int) -> Departure:
+        """Return a scheduled departure of the trip at a position."""
+        return Departure(
+            **self._trip(trip),
+            real_time="n",
+            delay=0,
+            departure_time=dt_util.as_utc(departure_time),
+        )
+
+    def _trip(self, trip: int) -> dict[str, Any]:
+        """Return the route, destination and mode of the trip at a position."""
+        columns = self._columns
+        route = columns["trip_route"][trip]
+        return {
+            ATTR_ROUTE: self._string(columns["route_name"][route]),
+            ATTR_DESTINATION: self._string(columns["trip_headsign"][trip]),
+            ATTR_MODE: _mode(columns["route_type"][route]),
+        }
+
+    def _find_stop(self, stop_id: str) -> int | None:
+        """Return the position of a stop, or None if it has no departures."""
+        keys = self._columns["stop_key"]
+        position = bisect_left(
+            range(len(keys)), stop_id, key=lambda i: self._string(keys[i])
+        )
+        if position < len(keys) and self._string(keys[position]) == stop_id:
+            return position
+        return None
+
+    def _runs_on(self, service: int, day: date) -> bool:
+        """Return whether a service runs on a day."""
+        columns = self._columns
+        value = _yyyymmdd(day)
+        for position in range(
+            columns["exception_start"][service], columns["exception_start"][service + 1]
+        ):
+            if columns["exception_date"][position] == value:
+                return columns["exception_type"][position] == _SERVICE_ADDED
+        return (
+            columns["service_start"][service] <= value <= columns["service_end"][service]
+            and bool(columns["service_days"][service] & 1 << day.weekday())
+        )
+
+    def _string(self, index: int) -> str:
+        """Return a string from the string table."""
+        starts = self._columns["string_start"]
+        return bytes(self._strings[starts[index]:starts[index + 1]]).decode()
@@ -0,0 +1,188 @@
+"""Fixtures for the Transport NSW benchmarks.
+
+The benchmarks are skipped unless pytest is run with --benchmarks, e.g.
+
+    pytest tests/benchmarks --benchmarks --benchmark-save=baseline.json
+    pytest tests/benchmarks --benchmarks --benchmark-compare=baseline.json
+
+Timings depend on the machine, so only compare results from the same one.
+"""
+
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+import inspect
+import json
+from pathlib import Path
+from statistics import median
+import time
+import tracemalloc
+from typing import Any
+
+import pytest
+from homeassistant.config_entries import ConfigSubentry
+from homeassistant.const import CONF_API_KEY
+
+from custom_components.transport_nsw.const import (
+    CONF_DEPARTURE_COUNT,
+    CONF_RANKED_SENSORS,
+    CONF_ROUTE,
+    CONF_STOP_ID,
+    DOMAIN,
+    SUBENTRY_TYPE_STOP,
+)
+from custom_components.transport_nsw.hub import TransportNSWHub, get_hub
+from custom_components.transport_nsw.scheduler import RequestScheduler
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+# Number of stop subentries each benchmark is run with
+STOP_COUNTS = [10, 100, 1000]
+
+
+@dataclass
+class BenchmarkResult:
+    """Timing and memory of a benchmark."""
+
+    rounds: int
+    min_seconds: float
+    median_seconds: float
+    peak_memory_bytes: int
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip the benchmarks unless they were asked for."""
+    if config.getoption("--benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with --benchmarks")
+    benchmarks = Path(__file__).parent
+    for item in items:
+        if benchmarks in Path(item.fspath).parents:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(request):
+    """Collect the results of all benchmarks and save them at the end."""
+    results: dict[str, BenchmarkResult] = {}
+    yield results
+    if (path := request.config.getoption("--benchmark-save")) and results:
+        Path(path).write_text(
+            json.dumps(
+                {name: asdict(result) for name, result in sorted(results.items())},
+                indent=2,
+            )
+            + "\n"
+        )
+
+
+@pytest.fixture(scope="session")
+def benchmark_baseline(request) -> dict[str, dict[str, Any]]:
+    """Return the saved results to compare against, if any."""
+    if path := request.config.getoption("--benchmark-compare"):
+        return json.loads(Path(path).read_text())
+    return {}
+
+
+@pytest.fixture
+def benchmark(request, benchmark_results, benchmark_baseline):
+    """Return a function that times a target and records its peak memory.
+
+    setup is called before each round, untimed, and returns the target's
+    arguments. Both may be coroutine functions. The peak memory is measured
+    in an extra round, as tracing allocations slows everything down.
+    """
+    tolerance = request.config.getoption("--benchmark-tolerance")
+
+    async def _benchmark(
+        target: Callable[..., Any | Awaitable[Any]],
+        setup: Callable[[], tuple | Awaitable[tuple]] | None = None,
+        rounds: int = 5,
+    ) -> BenchmarkResult:
+        async def _round() -> float:
+            args = await _call(setup) if setup else ()
+            start = time.perf_counter()
+            await _call(target, *args)
+            return time.perf_counter() - start
+
+        timings = [await _round() for _ in range(rounds)]
+
+        tracemalloc.start()
+        try:
+            await _round()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        result = BenchmarkResult(rounds, min(timings), median(timings), peak)
+        benchmark_results[request.node.nodeid] = result
+        _compare(result, benchmark_baseline.get(request.node.nodeid), tolerance)
+        return result
+
+    return _benchmark
+
+
+async def _call(function: Callable[..., Any], *args: Any) -> Any:
+    """Call a function and await its result if it is awaitable."""
+    result = function(*args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def _compare(
+    result: BenchmarkResult, baseline: dict[str, Any] | None, tolerance: float
+) -> None:
+    """Fail if a result regressed from its baseline by more than tolerance."""
+    if baseline is None:
+        return
+    for key, value in (
+        ("median_seconds", result.median_seconds),
+        ("peak_memory_bytes", result.peak_memory_bytes),
+    ):
+        if value > baseline[key] * (1 + tolerance):
+            pytest.fail(
+                f"{key} regressed from {baseline[key]:.6g} to {value:.6g}"
+                f" (tolerance {tolerance:.0%})"
+            )
+
+
+def make_config_entry(stop_count: int, shared_stop: bool = False) -> MockConfigEntry:
+    """Return a config entry with the given number of stop subentries.
+
+    Every other stop filters by route and has ranked sensors, so both
+    code paths are covered. With shared_stop, all subentries watch the same
+    stop.
+    """
+    config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+    config_entry.subentries = {
+        f"sub{index}": ConfigSubentry(
+            data={
+                CONF_STOP_ID: "200000" if shared_stop else f"{200000 + index}",
+                CONF_ROUTE: "T1" if index % 2 else "",
+                CONF_DEPARTURE_COUNT: 3,
+                CONF_RANKED_SENSORS: bool(index % 2),
+            },
+            subentry_id=f"sub{index}",
+            subentry_type=SUBENTRY_TYPE_STOP,
+            title=f"Stop {index}",
+            unique_id=f"unique_{index}",
+        )
+        for index in range(stop_count)
+    }
+    return config_entry
+
+
+def make_unthrottled_hub(hass, config_entry: MockConfigEntry) -> TransportNSWHub:
+    """Return the entry's hub without the API key's rate limit.
+
+    The burst, which also bounds the concurrency of the first refresh, is
+    left as it is.
+    """
+    hub = get_hub(hass, config_entry)
+    hub.scheduler = RequestScheduler(rate=1e9, daily_budget=10**9)
+    return hub
+
+
+@pytest.fixture(params=STOP_COUNTS, ids=lambda count: f"{count}_stops")
+def stop_count(request) -> int:
+    """Return the number of stops to benchmark with."""
+    return request.param
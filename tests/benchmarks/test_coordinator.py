@@ -0,0 +1,59 @@
+"""Benchmark the Transport NSW coordinator."""
+
+import asyncio
+
+import pytest
+from homeassistant.core import HomeAssistant
+
+from custom_components.transport_nsw.coordinator import TransportNSWCoordinator
+
+from ..conftest import make_departure_monitor_response
+from .conftest import make_config_entry, make_unthrottled_hub
+
+
+class TestCoordinatorBenchmarks:
+    """Benchmark coordinator updates."""
+
+    @pytest.mark.asyncio
+    async def test_update_data(self, hass: HomeAssistant, benchmark, stop_count, mock_transport_nsw_api):
+        """Benchmark a tick of every stop, each fetching and parsing its departures."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = make_departure_monitor_response()
+        config_entry = make_config_entry(stop_count)
+        hub = make_unthrottled_hub(hass, config_entry)
+        coordinators = [
+            TransportNSWCoordinator(hass, config_entry, subentry)
+            for subentry in config_entry.subentries.values()
+        ]
+
+        def _setup():
+            # Empty the shared cache so every stop is fetched and parsed again
+            hub._stops.clear()
+            return ()
+
+        await benchmark(
+            lambda: asyncio.gather(
+                *(coordinator._async_update_data() for coordinator in coordinators)
+            ),
+            _setup,
+        )
+
+        assert mock_transport_nsw_api.async_get_departure_monitor.await_count == stop_count * 6
+
+    @pytest.mark.asyncio
+    async def test_update_data_cached(self, hass: HomeAssistant, benchmark, stop_count, mock_transport_nsw_api):
+        """Benchmark a tick of every stop sharing one stop's cached departures."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = make_departure_monitor_response()
+        config_entry = make_config_entry(stop_count, shared_stop=True)
+        make_unthrottled_hub(hass, config_entry)
+        coordinators = [
+            TransportNSWCoordinator(hass, config_entry, subentry)
+            for subentry in config_entry.subentries.values()
+        ]
+
+        await benchmark(
+            lambda: asyncio.gather(
+                *(coordinator._async_update_data() for coordinator in coordinators)
+            )
+        )
+
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once()
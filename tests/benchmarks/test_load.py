@@ -0,0 +1,47 @@
+"""Load test the Transport NSW coordinators against the fake API server."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from homeassistant.core import HomeAssistant
+
+from custom_components.transport_nsw.coordinator import TransportNSWCoordinator
+
+from ..fake_api import lognormal_latency
+from .conftest import make_config_entry, make_unthrottled_hub
+
+
+class TestLoadBenchmarks:
+    """Benchmark coordinator updates over HTTP."""
+
+    @pytest.mark.asyncio
+    async def test_update_data(self, hass: HomeAssistant, benchmark, stop_count, fake_api, fake_api_client):
+        """Benchmark a tick of every stop against an API with realistic latency."""
+        fake_api.latency = lognormal_latency(0.02)
+        config_entry = make_config_entry(stop_count)
+        hub = make_unthrottled_hub(hass, config_entry)
+        hub._client = fake_api_client
+        coordinators = [
+            TransportNSWCoordinator(hass, config_entry, subentry)
+            for subentry in config_entry.subentries.values()
+        ]
+
+        def _setup():
+            # Empty the shared cache so every stop is fetched again
+            hub._stops.clear()
+            return ()
+
+        # The server shares the event loop, and slows down with it while
+        # allocations are traced
+        with patch("custom_components.transport_nsw.api.REQUEST_TIMEOUT", 120):
+            await benchmark(
+                lambda: asyncio.gather(
+                    *(coordinator._async_update_data() for coordinator in coordinators)
+                ),
+                _setup,
+                rounds=3,
+            )
+
+        assert fake_api.stats.requests["departure_mon"] == stop_count * 4
+        assert fake_api.stats.statuses.keys() == {200}
@@ -0,0 +1,121 @@
+"""Benchmark the Transport NSW sensor platform."""
+
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+from homeassistant.components.recorder.db_schema import StateAttributes
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import Event, HomeAssistant, State
+
+from custom_components.transport_nsw.scheduler import RequestScheduler
+from custom_components.transport_nsw.sensor import (
+    StopSensors,
+    TransportNSWSensor,
+    TransportNSWStateOnlySensor,
+    async_setup_entry,
+)
+
+from ..conftest import make_departure_monitor_response
+from .conftest import make_config_entry, make_unthrottled_hub
+
+
+class TestSensorBenchmarks:
+    """Benchmark sensor setup and state rendering."""
+
+    @pytest.mark.asyncio
+    async def test_setup_entry(self, hass: HomeAssistant, benchmark, stop_count, mock_transport_nsw_api):
+        """Benchmark setting up an entry, including the first refresh of every stop."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = make_departure_monitor_response()
+        config_entry = make_config_entry(stop_count)
+        config_entry.mock_state(hass, ConfigEntryState.SETUP_IN_PROGRESS)
+        mock_add_entities = Mock()
+
+        def _setup():
+            # Start from a fresh hub, as after a restart
+            hass.data.clear()
+            make_unthrottled_hub(hass, config_entry)
+            return hass, config_entry, mock_add_entities
+
+        await benchmark(async_setup_entry, _setup)
+
+        sensors = [
+            sensor
+            for sensor in mock_add_entities.call_args[0][0]
+            if isinstance(sensor, TransportNSWSensor)
+        ]
+        assert len(sensors) == stop_count // 2 * 4
+        assert all(sensor.coordinator.data for sensor in sensors)
+
+    @pytest.mark.asyncio
+    async def test_render_state(self, hass: HomeAssistant, benchmark, stop_count, mock_transport_nsw_api):
+        """Benchmark evaluating the state, name, icon and attributes of every sensor."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = make_departure_monitor_response()
+        config_entry = make_config_entry(stop_count)
+        make_unthrottled_hub(hass, config_entry)
+        stops = [
+            StopSensors.create(hass, config_entry, subentry)
+            for subentry in config_entry.subentries.values()
+        ]
+        for stop in stops:
+            stop.coordinator.data = await stop.coordinator._async_update_data()
+        sensors = [sensor for stop in stops for sensor in stop.sensors]
+
+        def _render():
+            for sensor in sensors:
+                _ = sensor.native_value, sensor.name, sensor.icon, sensor.extra_state_attributes
+
+        await benchmark(_render, rounds=20)
+
+    @pytest.mark.asyncio
+    async def test_recorded_attributes(self, hass: HomeAssistant, freezer, mock_transport_nsw_api, record_property):
+        """Measure the attributes the recorder stores for 100 sensors over an hour.
+
+        Every sensor writes its state once a minute after a refresh. The
+        recorder stores each distinct set of attributes once, so the growth
+        is the size of the distinct sets, compared with recording all
+        attributes and with the option to record the state only.
+        """
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = make_departure_monitor_response(40)
+        config_entry = make_config_entry(50)
+        hub = make_unthrottled_hub(hass, config_entry)
+        # Time is frozen between refreshes, so the burst is never refilled
+        hub.scheduler = RequestScheduler(rate=1e9, burst=10**6, daily_budget=10**9)
+        stops = [
+            StopSensors.create(hass, config_entry, subentry)
+            for subentry in config_entry.subentries.values()
+        ]
+        sensors = [sensor for stop in stops for sensor in stop.sensors]
+        assert len(sensors) == 100
+
+        unrecorded = {
+            "all_attributes": frozenset(),
+            "default": TransportNSWSensor._unrecorded_attributes,
+            "state_only": TransportNSWStateOnlySensor._unrecorded_attributes,
+        }
+        recorded: dict[str, set[bytes]] = {name: set() for name in unrecorded}
+        for _ in range(60):
+            freezer.tick(timedelta(minutes=1))
+            # Refresh every stop, as the shared fetches are a minute old
+            hub._stops.clear()
+            for stop in stops:
+                stop.coordinator.data = await stop.coordinator._async_update_data()
+            for sensor in sensors:
+                state = State(
+                    "sensor.benchmark",
+                    str(sensor.native_value),
+                    sensor.extra_state_attributes,
+                )
+                for name, attributes in unrecorded.items():
+                    state.state_info = {"unrecorded_attributes": attributes}
+                    event = Event(EVENT_STATE_CHANGED, {"new_state": state})
+                    recorded[name].add(
+                        StateAttributes.shared_attrs_bytes_from_event(event, None)
+                    )
+
+        growth = {name: sum(map(len, blobs)) for name, blobs in recorded.items()}
+        for name, size in growth.items():
+            record_property(f"{name}_bytes_per_hour", size)
+            record_property(f"{name}_rows_per_hour", len(recorded[name]))
+        assert growth["state_only"] < growth["default"] < growth["all_attributes"] / 4
@@ -1,8 +1,11 @@
 """Common fixtures for the Transport NSW tests."""
 
-from unittest.mock import patch
+from datetime import timedelta
+from unittest.mock import AsyncMock, patch
 
+import aiohttp
 import pytest
+import pytest_asyncio
 
 # Use the homeassistant custom component plugin but add our own fixture
 # pytest_plugins = "pytest_homeassistant_custom_component"
@@ -10,6 +13,28 @@ import pytest
 from homeassistant.core import HomeAssistant
 
 
+def pytest_addoption(parser):
+    """Add the options of the benchmarks in tests/benchmarks."""
+    group = parser.getgroup("benchmarks")
+    group.addoption(
+        "--benchmarks", action="store_true", help="run the benchmarks in tests/benchmarks"
+    )
+    group.addoption(
+        "--benchmark-save", metavar="PATH", help="save the benchmark results as JSON"
+    )
+    group.addoption(
+        "--benchmark-compare",
+        metavar="PATH",
+        help="fail benchmarks that are slower or use more memory than in saved results",
+    )
+    group.addoption(
+        "--benchmark-tolerance",
+        type=float,
+        default=0.5,
+        help="allowed regression when comparing, as a fraction (default 0.5)",
+    )
+
+
 @pytest.fixture
 def hass():
     """Create a test HomeAssistant instance."""
@@ -23,6 +48,7 @@ def hass():
     
     return hass_instance
 
+from custom_components.transport_nsw.api import TransportNSWApiClient
 from custom_components.transport_nsw.const import (
     CONF_DESTINATION,
     CONF_ROUTE,
@@ -32,25 +58,219 @@ from custom_components.transport_nsw.const import (
 )
 from homeassistant.config_entries import ConfigSubentry
 from homeassistant.const import CONF_API_KEY, CONF_NAME
+from homeassistant.util import dt as dt_util
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 
+def make_stop_event(
+    route="T1",
+    destination="Hornsby",
+    product_class=1,
+    minutes=5,
+    delay=0,
+    real_time=True,
+):
+    """Build a departure monitor stop event leaving in the given minutes."""
+    # Offset by a few seconds so the due time rounds to whole minutes
+    estimated = dt_util.utcnow() + timedelta(minutes=minutes, seconds=10)
+    planned = estimated - timedelta(minutes=delay)
+    event = {
+        "departureTimePlanned": planned.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "transportation": {
+            "number": route,
+            "destination": {"name": destination},
+            "product": {"class": product_class},
+        },
+    }
+    if real_time:
+        event["isRealtimeControlled"] = True
+        event["departureTimeEstimated"] = estimated.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return event
+
+
+def make_departure_monitor_response(count=20):
+    """Build a departure monitor response with count stop events."""
+    return {
+        "stopEvents": [
+            make_stop_event(
+                route=("T1", "T2", "T9")[index % 3],
+                minutes=index * 3,
+                delay=index % 4,
+                real_time=bool(index % 5),
+            )
+            for index in range(count)
+        ]
+    }
+
+
+def make_journey(
+    legs=(("T1", 1, 5, 20),),
+    delay=0,
+    real_time=True,
+    walk_first=0,
+):
+    """Build a trip planner journey.
+
+    Each leg is (route, product class, minutes until it leaves, minutes it
+    takes). With walk_first, the journey starts with a walk of that many
+    minutes to the first leg.
+    """
+
+    def _time(minutes):
+        # Offset by a few seconds so the due time rounds to whole minutes
+        when = dt_util.utcnow() + timedelta(minutes=minutes, seconds=10)
+        return when.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    journey_legs = []
+    if walk_first:
+        leaves = legs[0][2] - walk_first
+        journey_legs.append(
+            {
+                "origin": {"departureTimePlanned": _time(leaves)},
+                "destination": {"arrivalTimePlanned": _time(legs[0][2])},
+                "transportation": {"product": {"class": 100}},
+            }
+        )
+    for route, product_class, minutes, takes in legs:
+        leg = {
+            "origin": {"departureTimePlanned": _time(minutes - delay)},
+            "destination": {"arrivalTimePlanned": _time(minutes + takes)},
+            "transportation": {"number": route, "product": {"class": product_class}},
+        }
+        if real_time:
+            leg["isRealtimeControlled"] = True
+            leg["origin"]["departureTimeEstimated"] = _time(minutes)
+        journey_legs.append(leg)
+    return {"legs": journey_legs}
+
+
+def make_trip_response(*journeys):
+    """Build a trip planner response with the given journeys."""
+    return {"journeys": list(journeys)}
+
+
+def _protobuf_field(number, value):
+    """Encode a protobuf varint or length-delimited field."""
+    if isinstance(value, int):
+        key, payload = number << 3, _protobuf_varint(value)
+    else:
+        value = value.encode() if isinstance(value, str) else value
+        key, payload = number << 3 | 2, _protobuf_varint(len(value)) + value
+    return _protobuf_varint(key) + payload
+
+
+def _protobuf_varint(value):
+    """Encode a protobuf varint, with negative numbers as 64-bit."""
+    value &= (1 << 64) - 1
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append(value & 0x7F | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def make_trip_update(trip_id, route_id, stop_times, cancelled=False):
+    """Build a GTFS-realtime FeedEntity with a TripUpdate.
+
+    stop_times holds (stop ID, departure time, delay in seconds) tuples.
+    """
+    trip = _protobuf_field(1, trip_id) + _protobuf_field(5, route_id)
+    if cancelled:
+        trip += _protobuf_field(4, 3)
+    trip_update = _protobuf_field(1, trip)
+    for sequence, (stop_id, departure_time, delay) in enumerate(stop_times, 1):
+        event = _protobuf_field(1, delay) + _protobuf_field(2, int(departure_time.timestamp()))
+        trip_update += _protobuf_field(
+            2,
+            _protobuf_field(1, sequence) + _protobuf_field(3, event) + _protobuf_field(4, stop_id),
+        )
+    return _protobuf_field(1, trip_id) + _protobuf_field(3, trip_update)
+
+
+def make_feed(*entities):
+    """Build a GTFS-realtime FeedMessage with the given entities."""
+    header = _protobuf_field(1, "2.0") + _protobuf_field(3, int(dt_util.utcnow().timestamp()))
+    return _protobuf_field(1, header) + b"".join(_protobuf_field(2, entity) for entity in entities)
+
+
+@pytest.fixture(autouse=True)
+def mock_store():
+    """Keep saved snapshots in memory instead of on disk."""
+    with patch("custom_components.transport_nsw.hub.Store") as mock_class:
+        mock_instance = mock_class.return_value
+        mock_instance.async_load = AsyncMock(return_value=None)
+        mock_instance.async_save = AsyncMock()
+        mock_instance.async_remove = AsyncMock()
+        yield mock_instance
+
+
+@pytest.fixture(autouse=True)
+def mock_stop_index():
+    """Start the config flow without an offline stop index."""
+    with patch(
+        "custom_components.transport_nsw.config_flow.async_get_stop_index",
+        new_callable=AsyncMock,
+        return_value=None,
+    ) as mock_get_stop_index:
+        yield mock_get_stop_index
+
+
+@pytest.fixture(autouse=True)
+def mock_timetable():
+    """Update coordinators and real-time feeds without an offline timetable."""
+    mock_get_timetable = AsyncMock(return_value=None)
+    with patch(
+        "custom_components.transport_nsw.coordinator.async_get_timetable",
+        mock_get_timetable,
+    ), patch(
+        "custom_components.transport_nsw.realtime.async_get_timetable",
+        mock_get_timetable,
+    ):
+        yield mock_get_timetable
+
+
 @pytest.fixture
 def mock_transport_nsw_api():
-    """Mock the TransportNSW API."""
-    with patch("custom_components.transport_nsw.coordinator.TransportNSW") as mock_class:
+    """Mock the API client used by the hub."""
+    with patch("custom_components.transport_nsw.hub.async_get_clientsession"), \
+         patch("custom_components.transport_nsw.hub.TransportNSWApiClient") as mock_class:
         mock_instance = mock_class.return_value
+        mock_instance.async_get_departure_monitor = AsyncMock()
+        mock_instance.async_get_trip = AsyncMock()
         yield mock_instance
 
 
 @pytest.fixture
 def mock_transport_nsw_config_flow():
-    """Mock the TransportNSW API for config flow."""
-    with patch("custom_components.transport_nsw.config_flow.TransportNSW") as mock_class:
+    """Mock the API client for config flow."""
+    with patch("custom_components.transport_nsw.config_flow.async_get_clientsession"), \
+         patch("custom_components.transport_nsw.config_flow.TransportNSWApiClient") as mock_class:
         mock_instance = mock_class.return_value
+        mock_instance.async_get_departure_monitor = AsyncMock()
+        mock_instance.async_get_trip = AsyncMock(return_value={"journeys": []})
+        mock_instance.async_get_stop_finder = AsyncMock(return_value={"locations": []})
         yield mock_instance
 
 
+@pytest_asyncio.fixture
+async def fake_api(socket_enabled):
+    """Start a fake Transport NSW API server, see tests/fake_api.py."""
+    from .fake_api import FakeTransportNSWApi
+
+    server = FakeTransportNSWApi(seed=0)
+    await server.async_start()
+    yield server
+    await server.async_stop()
+
+
+@pytest_asyncio.fixture
+async def fake_api_client(fake_api):
+    """Return an API client talking to the fake API server."""
+    async with aiohttp.ClientSession() as session:
+        yield TransportNSWApiClient(session, "test_api_key", base_url=fake_api.base_url)
+
+
 @pytest.fixture
 def mock_config_entry_legacy():
     """Mock legacy config entry."""
@@ -109,28 +329,20 @@ def mock_config_entry_with_subentries():
 
 @pytest.fixture
 def mock_api_response():
-    """Mock successful API response."""
+    """Mock successful departure monitor response."""
     return {
-        "route": "T1",
-        "due": 5,
-        "delay": 0,
-        "real_time": True,
-        "destination": "Hornsby",
-        "mode": "Train",
+        "stopEvents": [
+            make_stop_event("T1", "Hornsby", 1, minutes=5),
+            make_stop_event("T9", "Gordon", 1, minutes=8, delay=2),
+            make_stop_event("T1", "Berowra", 1, minutes=12, real_time=False),
+        ]
     }
 
 
 @pytest.fixture
 def mock_api_response_with_nulls():
-    """Mock API response with None and n/a values."""
-    return {
-        "route": None,
-        "due": "n/a",
-        "delay": 0,
-        "real_time": True,
-        "destination": None,
-        "mode": "Bus",
-    }
+    """Mock departure monitor response without any stop events."""
+    return {"stopEvents": []}
 
 
 @pytest.fixture
@@ -0,0 +1,272 @@
+"""Fake Transport NSW API server for HTTP, latency and load testing.
+
+The server implements the departure monitor, trip and stop finder endpoints
+of the Trip Planner API, with configurable latency, injected errors and
+timeouts, a per-key rate limit and generated payloads of any size. Tests
+start it with the fake_api fixture; to run it on its own:
+
+    python -m tests.fake_api --port 8080 --latency 0.2 --error-rate 0.05
+
+and point a TransportNSWApiClient at http://localhost:8080/v1/tp.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+import math
+import random
+from time import monotonic
+from typing import Any
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from .conftest import make_departure_monitor_response, make_journey, make_trip_response
+
+BASE_PATH = "/v1/tp"
+
+# A request picked to time out is held this long, which is longer than
+# any client timeout
+HANG_SECONDS = 3600
+
+Latency = Callable[[random.Random], float]
+
+
+def no_latency(rng: random.Random) -> float:
+    """Respond straight away."""
+    return 0.0
+
+
+def constant_latency(seconds: float) -> Latency:
+    """Respond after a fixed delay."""
+    return lambda rng: seconds
+
+
+def uniform_latency(low: float, high: float) -> Latency:
+    """Respond after a delay spread evenly between low and high."""
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal_latency(median: float, sigma: float = 0.5) -> Latency:
+    """Respond after a long-tailed delay around median, like a real API."""
+    return lambda rng: median * rng.lognormvariate(0, sigma)
+
+
+@dataclass
+class FakeApiStats:
+    """What the fake API has been asked for and how it responded."""
+
+    requests: Counter[str] = field(default_factory=Counter)
+    statuses: Counter[int] = field(default_factory=Counter)
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+
+class FakeTransportNSWApi:
+    """Serve Trip Planner API responses with configurable misbehaviour.
+
+    Each request is checked in this order: unknown API keys get a 401, keys
+    over the rate limit a 429 with a Retry-After header, and then, after the
+    latency, error_rate of requests get error_status and timeout_rate of them
+    never complete.
+    """
+
+    def __init__(
+        self,
+        api_keys: Iterable[str] = ("test_api_key",),
+        latency: Latency = no_latency,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        timeout_rate: float = 0.0,
+        rate_limit: tuple[float, int] | None = None,
+        events_per_stop: int = 20,
+        seed: int | None = None,
+    ) -> None:
+        """Initialize the fake API.
+
+        rate_limit is a (requests per second, burst) token bucket per key.
+        """
+        self.api_keys = set(api_keys)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.rate_limit = rate_limit
+        self.events_per_stop = events_per_stop
+        self.stats = FakeApiStats()
+        self._random = random.Random(seed)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self.base_url: str | None = None
+        self._server: TestServer | None = None
+
+        self.app = web.Application()
+        self.app.router.add_get(f"{BASE_PATH}/departure_mon", self._departure_monitor)
+        self.app.router.add_get(f"{BASE_PATH}/trip", self._trip)
+        self.app.router.add_get(f"{BASE_PATH}/stop_finder", self._stop_finder)
+
+    async def _departure_monitor(self, request: web.Request) -> web.Response:
+        """Return generated departures for the requested stop.
+
+        Like the API, modes excluded with exclMOT_<class> are left out and
+        limit caps the number of departures.
+        """
+        excluded = {
+            int(param.removeprefix("exclMOT_"))
+            for param in request.query
+            if param.startswith("exclMOT_")
+        }
+        limit = int(request.query.get("limit", self.events_per_stop))
+
+        def payload() -> dict[str, Any]:
+            events = make_departure_monitor_response(self.events_per_stop)["stopEvents"]
+            return {
+                "stopEvents": [
+                    event
+                    for event in events
+                    if event["transportation"]["product"]["class"] not in excluded
+                ][:limit]
+            }
+
+        return await self._respond(request, "departure_mon", payload)
+
+    async def _trip(self, request: web.Request) -> web.Response:
+        """Return generated journeys, as many as calcNumberOfTrips asks for.
+
+        Every other journey changes to a bus halfway.
+        """
+        count = int(request.query.get("calcNumberOfTrips", 6))
+        return await self._respond(
+            request,
+            "trip",
+            lambda: make_trip_response(
+                *(
+                    make_journey(
+                        [("T1", 1, index * 5, 20)]
+                        if index % 2
+                        else [("T1", 1, index * 5, 10), ("333", 5, index * 5 + 12, 10)]
+                    )
+                    for index in range(count)
+                )
+            ),
+        )
+
+    async def _stop_finder(self, request: web.Request) -> web.Response:
+        """Return a stop named after the query."""
+        name = request.query.get("name_sf", "")
+        return await self._respond(
+            request,
+            "stop_finder",
+            lambda: {
+                "locations": [
+                    {
+                        "id": name,
+                        "name": f"Stop {name}",
+                        "type": "stop",
+                        "isBest": True,
+                        "matchQuality": 1000,
+                    }
+                ]
+            },
+        )
+
+    async def _respond(
+        self,
+        request: web.Request,
+        endpoint: str,
+        payload: Callable[[], dict[str, Any]],
+    ) -> web.Response:
+        """Apply the configured behaviour, then respond with the payload."""
+        stats = self.stats
+        stats.requests[endpoint] += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            response = await self._async_response(request, payload)
+        finally:
+            stats.in_flight -= 1
+        stats.statuses[response.status] += 1
+        return response
+
+    async def _async_response(
+        self, request: web.Request, payload: Callable[[], dict[str, Any]]
+    ) -> web.Response:
+        """Return the response to a request."""
+        api_key = request.headers.get("Authorization", "").removeprefix("apikey ")
+        if api_key not in self.api_keys:
+            return web.json_response({"ErrorDetails": "Invalid API key"}, status=401)
+        if (retry_after := self._take_token(api_key)) is not None:
+            return web.json_response(
+                {"ErrorDetails": "Rate limit exceeded"},
+                status=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+        await asyncio.sleep(self.latency(self._random))
+        if self._random.random() < self.error_rate:
+            return web.json_response({"ErrorDetails": "Injected error"}, status=self.error_status)
+        if self._random.random() < self.timeout_rate:
+            await asyncio.sleep(HANG_SECONDS)
+        return web.json_response(payload())
+
+    def _take_token(self, api_key: str) -> float | None:
+        """Take a request from the key's rate limit.
+
+        Returns None if the request is allowed, or else the seconds until it
+        would be.
+        """
+        if self.rate_limit is None:
+            return None
+        rate, burst = self.rate_limit
+        now = monotonic()
+        tokens, updated_at = self._buckets.get(api_key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        if tokens < 1:
+            self._buckets[api_key] = (tokens, now)
+            return (1 - tokens) / rate
+        self._buckets[api_key] = (tokens - 1, now)
+        return None
+
+    async def async_start(self) -> str:
+        """Start serving on a free port and return the API's base URL."""
+        self._server = TestServer(self.app)
+        await self._server.start_server(access_log=None)
+        self.base_url = str(self._server.make_url(BASE_PATH))
+        return self.base_url
+
+    async def async_stop(self) -> None:
+        """Stop serving, cancelling any requests still being held."""
+        if self._server is not None:
+            await self._server.close()
+            self._server = None
+
+
+def main() -> None:
+    """Run the fake API until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--api-key", action="append", default=[], dest="api_keys")
+    parser.add_argument("--latency", type=float, default=0.0, help="median latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, help="requests per second allowed per key")
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--events", type=int, default=20, help="departures per stop")
+    args = parser.parse_args()
+
+    fake_api = FakeTransportNSWApi(
+        api_keys=args.api_keys or ["test_api_key"],
+        latency=lognormal_latency(args.latency) if args.latency else no_latency,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        rate_limit=(args.rate, args.burst) if args.rate else None,
+        events_per_stop=args.events,
+    )
+    web.run_app(fake_api.app, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
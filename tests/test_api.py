@@ -0,0 +1,250 @@
+"""Test the Transport NSW API client."""
+
+from datetime import datetime, timedelta
+import re
+from unittest.mock import AsyncMock
+
+import aiohttp
+from aioresponses import aioresponses
+import pytest
+import pytest_asyncio
+
+from custom_components.transport_nsw.api import (
+    API_BASE_URL,
+    GTFS_REALTIME_BASE_URL,
+    GTFS_SCHEDULE_URL,
+    TransportNSWApiClient,
+    TransportNSWAuthError,
+    TransportNSWConnectionError,
+    TransportNSWRateLimitError,
+    TransportNSWResponseError,
+)
+from custom_components.transport_nsw.departures import DepartureQuery
+from custom_components.transport_nsw.journeys import JourneyQuery
+
+DEPARTURE_MONITOR = re.compile(rf"^{API_BASE_URL}/departure_mon\?.*$")
+TRIP = re.compile(rf"^{API_BASE_URL}/trip\?.*$")
+STOP_FINDER = re.compile(rf"^{API_BASE_URL}/stop_finder\?.*$")
+
+
+@pytest_asyncio.fixture
+async def session():
+    """Return an aiohttp session for the client."""
+    async with aiohttp.ClientSession() as client_session:
+        yield client_session
+
+
+class TestTransportNSWApiClient:
+    """Test TransportNSWApiClient."""
+
+    @pytest.mark.asyncio
+    async def test_get_departure_monitor(self, session):
+        """Test the departure monitor request and response."""
+        client = TransportNSWApiClient(session, "test_api_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(DEPARTURE_MONITOR, payload={"stopEvents": []})
+            result = await client.async_get_departure_monitor("123")
+
+        assert result == {"stopEvents": []}
+        (request,) = next(iter(mock_api.requests.values()))
+        assert request.kwargs["params"]["name_dm"] == "123"
+        assert request.kwargs["headers"]["Authorization"] == "apikey test_api_key"
+        assert "limit" not in request.kwargs["params"]
+
+    @pytest.mark.asyncio
+    async def test_get_departure_monitor_narrowed(self, session, freezer):
+        """Test the query is sent for the API to narrow the departures."""
+        freezer.move_to("2026-10-15T21:50:00+00:00")
+        client = TransportNSWApiClient(session, "test_api_key")
+        query = DepartureQuery(
+            max_results=5,
+            excluded_modes=frozenset({"Bus", "Schoolbus", "Hovercraft"}),
+            offset=timedelta(minutes=15),
+        )
+
+        with aioresponses() as mock_api:
+            mock_api.get(DEPARTURE_MONITOR, payload={"stopEvents": []})
+            await client.async_get_departure_monitor("123", None, query)
+
+        (request,) = next(iter(mock_api.requests.values()))
+        params = request.kwargs["params"]
+        assert params["limit"] == "5"
+        assert params["excludedMeans"] == "checkbox"
+        assert [param for param in params if param.startswith("exclMOT_")] == [
+            "exclMOT_5",
+            "exclMOT_11",
+        ]
+        # 9:05 the next morning in Sydney, during daylight saving
+        assert params["itdDate"] == "20261016"
+        assert params["itdTime"] == "0905"
+
+    @pytest.mark.asyncio
+    async def test_get_trip(self, session):
+        """Test the trip request plans journeys leaving after the given time."""
+        client = TransportNSWApiClient(session, "test_api_key")
+        departs_after = datetime.fromisoformat("2026-10-15T21:50:00+00:00")
+
+        with aioresponses() as mock_api:
+            mock_api.get(TRIP, payload={"journeys": []})
+            result = await client.async_get_trip(
+                JourneyQuery("200060", "2000338"), departs_after
+            )
+
+        assert result == {"journeys": []}
+        (request,) = next(iter(mock_api.requests.values()))
+        params = request.kwargs["params"]
+        assert params["name_origin"] == "200060"
+        assert params["name_destination"] == "2000338"
+        assert params["depArrMacro"] == "dep"
+        # 8:50 the next morning in Sydney, during daylight saving
+        assert params["itdDate"] == "20261016"
+        assert params["itdTime"] == "0850"
+        assert "name_via" not in params
+
+    @pytest.mark.asyncio
+    async def test_get_trip_via(self, session):
+        """Test a via stop is sent with the trip request."""
+        client = TransportNSWApiClient(session, "test_api_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(TRIP, payload={"journeys": []})
+            await client.async_get_trip(
+                JourneyQuery("200060", "2000338", "2000441"),
+                datetime.fromisoformat("2026-10-15T21:50:00+00:00"),
+            )
+
+        (request,) = next(iter(mock_api.requests.values()))
+        assert request.kwargs["params"]["type_via"] == "any"
+        assert request.kwargs["params"]["name_via"] == "2000441"
+
+    @pytest.mark.asyncio
+    async def test_get_stop_finder(self, session):
+        """Test the stop finder request can be capped to a single result."""
+        client = TransportNSWApiClient(session, "test_api_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(STOP_FINDER, payload={"locations": []})
+            result = await client.async_get_stop_finder("10101100", max_results=1)
+
+        assert result == {"locations": []}
+        (request,) = next(iter(mock_api.requests.values()))
+        assert request.kwargs["params"]["name_sf"] == "10101100"
+        assert request.kwargs["params"]["type_sf"] == "stop"
+        assert request.kwargs["params"]["anyMaxSizeHitList"] == "1"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("status", [401, 403])
+    async def test_auth_error(self, session, status):
+        """Test a rejected API key raises an auth error."""
+        client = TransportNSWApiClient(session, "bad_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(DEPARTURE_MONITOR, status=status)
+            with pytest.raises(TransportNSWAuthError):
+                await client.async_get_departure_monitor("123")
+
+    @pytest.mark.asyncio
+    async def test_unexpected_status(self, session):
+        """Test an unexpected status raises a response error."""
+        client = TransportNSWApiClient(session, "test_api_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(DEPARTURE_MONITOR, status=500)
+            with pytest.raises(TransportNSWResponseError) as exc_info:
+                await client.async_get_departure_monitor("123")
+
+        assert exc_info.value.status == 500
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("retry_after", "expected"),
+        [("120", 120), ("Wed, 21 Oct 2015 07:28:00 GMT", 0), ("soon", None), (None, None)],
+    )
+    async def test_rate_limited(self, session, retry_after, expected):
+        """Test a 429 raises a rate limit error with the Retry-After delay."""
+        client = TransportNSWApiClient(session, "test_api_key")
+        headers = {"Retry-After": retry_after} if retry_after else None
+
+        with aioresponses() as mock_api:
+            mock_api.get(DEPARTURE_MONITOR, status=429, headers=headers)
+            with pytest.raises(TransportNSWRateLimitError) as exc_info:
+                await client.async_get_departure_monitor("123")
+
+        assert exc_info.value.status == 429
+        assert exc_info.value.retry_after == expected
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("body", ["not json", "[]"])
+    async def test_invalid_json(self, session, body):
+        """Test an invalid body, or JSON that isn't an object, raises a response error."""
+        client = TransportNSWApiClient(session, "test_api_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(DEPARTURE_MONITOR, body=body)
+            with pytest.raises(TransportNSWResponseError):
+                await client.async_get_departure_monitor("123")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "exception", [TimeoutError(), aiohttp.ClientConnectionError("refused")]
+    )
+    async def test_connection_error(self, session, exception):
+        """Test network failures and timeouts raise a connection error."""
+        client = TransportNSWApiClient(session, "test_api_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(DEPARTURE_MONITOR, exception=exception)
+            with pytest.raises(TransportNSWConnectionError):
+                await client.async_get_departure_monitor("123")
+
+    @pytest.mark.asyncio
+    async def test_download_gtfs_schedule(self, session):
+        """Test the GTFS bundle is streamed to the writer."""
+        client = TransportNSWApiClient(session, "test_api_key")
+        chunks = []
+
+        async def _write(chunk):
+            chunks.append(chunk)
+
+        with aioresponses() as mock_api:
+            mock_api.get(GTFS_SCHEDULE_URL, body=b"PK zip bytes")
+            await client.async_download_gtfs_schedule(_write)
+
+        assert b"".join(chunks) == b"PK zip bytes"
+
+    @pytest.mark.asyncio
+    async def test_download_gtfs_schedule_auth_error(self, session):
+        """Test a rejected key fails the download."""
+        client = TransportNSWApiClient(session, "bad_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(GTFS_SCHEDULE_URL, status=401)
+            with pytest.raises(TransportNSWAuthError):
+                await client.async_download_gtfs_schedule(AsyncMock())
+
+    @pytest.mark.asyncio
+    async def test_get_realtime_feed(self, session):
+        """Test a GTFS-realtime feed is returned as raw bytes."""
+        client = TransportNSWApiClient(session, "test_api_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(
+                f"{GTFS_REALTIME_BASE_URL}/v2/gtfs/realtime/metro", body=b"\x0a\x00"
+            )
+            assert await client.async_get_realtime_feed("v2/gtfs/realtime/metro") == b"\x0a\x00"
+
+    @pytest.mark.asyncio
+    async def test_get_realtime_feed_connection_error(self, session):
+        """Test a feed that can't be fetched raises a connection error."""
+        client = TransportNSWApiClient(session, "test_api_key")
+
+        with aioresponses() as mock_api:
+            mock_api.get(f"{GTFS_REALTIME_BASE_URL}/v1/gtfs/realtime/buses", exception=TimeoutError())
+            with pytest.raises(TransportNSWConnectionError):
+                await client.async_get_realtime_feed("v1/gtfs/realtime/buses")
+
+    def test_base_url(self):
+        """Test a custom base URL is normalised."""
+        client = TransportNSWApiClient(None, "key", base_url="http://localhost:8080/v1/tp/")
+        assert client.base_url == "http://localhost:8080/v1/tp"
@@ -8,22 +8,41 @@ from homeassistant.const import CONF_API_KEY, CONF_NAME
 from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResultType
 
+from custom_components.transport_nsw.api import (
+    TransportNSWAuthError,
+    TransportNSWConnectionError,
+)
 from custom_components.transport_nsw.config_flow import (
+    API_KEY_VALIDATION_TTL,
+    VALIDATED_API_KEYS,
     TransportNSWConfigFlow,
+    TransportNSWJourneySubentryFlowHandler,
     TransportNSWOptionsFlow,
     TransportNSWSubentryFlowHandler,
     _generate_subentry_title,
     _raise_no_data,
+    async_validate_api_key,
     validate_input,
+    validate_journey_input,
     validate_subentry_input,
 )
 from custom_components.transport_nsw.const import (
+    CONF_ADAPTIVE_POLLING,
     CONF_DESTINATION,
+    CONF_DESTINATION_ID,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_ORIGIN_ID,
     CONF_ROUTE,
     CONF_STOP_ID,
+    CONF_STOP_SEARCH,
+    CONF_VIA_ID,
     DOMAIN,
+    SUBENTRY_TYPE_JOURNEY,
     SUBENTRY_TYPE_STOP,
 )
+from custom_components.transport_nsw.journeys import JourneyQuery
+from custom_components.transport_nsw.stops import StopIndex, build_stop_index
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 
@@ -70,117 +89,109 @@ class TestValidationFunctions:
     """Test validation functions."""
 
     @pytest.mark.asyncio
-    async def test_validate_input_success(self, hass: HomeAssistant):
+    async def test_validate_input_success(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test successful input validation."""
-        with patch("custom_components.transport_nsw.config_flow.TransportNSW") as mock_transport_class:
-            mock_transport_instance = mock_transport_class.return_value
-            mock_transport_instance.get_departures.return_value = {"route": "T1"}
-            
-            # Mock hass.async_add_executor_job to return the API response
-            hass.async_add_executor_job.return_value = {"route": "T1"}
-            
-            data = {CONF_API_KEY: "test_api_key", CONF_NAME: "Custom Name"}
-            result = await validate_input(hass, data)
+        data = {CONF_API_KEY: "test_api_key", CONF_NAME: "Custom Name"}
+        result = await validate_input(hass, data)
 
-            assert result["title"] == "Custom Name"
-            hass.async_add_executor_job.assert_called_once_with(
-                mock_transport_instance.get_departures,
-                "10101100", "", "", "test_api_key"
-            )
+        assert result["title"] == "Custom Name"
+        mock_transport_nsw_config_flow.async_get_stop_finder.assert_awaited_once_with(
+            "10101100", max_results=1
+        )
+        mock_transport_nsw_config_flow.async_get_departure_monitor.assert_not_awaited()
 
     @pytest.mark.asyncio
-    async def test_validate_input_success_no_custom_name(self, hass: HomeAssistant):
+    async def test_validate_input_success_no_custom_name(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test successful input validation without custom name."""
-        with patch("custom_components.transport_nsw.config_flow.TransportNSW") as mock_transport_class:
-            mock_transport_instance = mock_transport_class.return_value
-            mock_transport_instance.get_departures.return_value = {"route": "T1"}
-            
-            # Mock hass.async_add_executor_job to return the API response
-            hass.async_add_executor_job.return_value = {"route": "T1"}
-            
-            data = {CONF_API_KEY: "test_api_key_1234"}
-            result = await validate_input(hass, data)
+        data = {CONF_API_KEY: "test_api_key_1234"}
+        result = await validate_input(hass, data)
 
-            assert result["title"] == "Transport NSW (1234)"
+        assert result["title"] == "Transport NSW (1234)"
 
     @pytest.mark.asyncio
-    async def test_validate_input_short_api_key(self, hass: HomeAssistant):
+    async def test_validate_input_short_api_key(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test input validation with short API key."""
-        with patch("custom_components.transport_nsw.config_flow.TransportNSW") as mock_transport_class:
-            mock_transport_instance = mock_transport_class.return_value
-            mock_transport_instance.get_departures.return_value = {"route": "T1"}
-            
-            # Mock hass.async_add_executor_job to return the API response
-            hass.async_add_executor_job.return_value = {"route": "T1"}
-            
-            data = {CONF_API_KEY: "123"}
-            result = await validate_input(hass, data)
+        data = {CONF_API_KEY: "123"}
+        result = await validate_input(hass, data)
 
-            assert result["title"] == "Transport NSW (123)"
+        assert result["title"] == "Transport NSW (123)"
 
     @pytest.mark.asyncio
-    async def test_validate_input_api_error(self, hass: HomeAssistant):
+    async def test_validate_input_api_error(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test input validation with API error."""
-        with patch("custom_components.transport_nsw.config_flow.TransportNSW") as mock_transport_class:
-            mock_transport_instance = mock_transport_class.return_value
-            mock_transport_instance.get_departures.side_effect = Exception("API Error")
-            
-            # Mock hass.async_add_executor_job to raise the exception
-            hass.async_add_executor_job.side_effect = Exception("API Error")
-            
-            data = {CONF_API_KEY: "test_api_key"}
+        mock_transport_nsw_config_flow.async_get_stop_finder.side_effect = TransportNSWAuthError("API Error")
+
+        data = {CONF_API_KEY: "test_api_key"}
+
+        with pytest.raises(ValueError, match="Cannot connect to Transport NSW API"):
+            await validate_input(hass, data)
+
+    @pytest.mark.asyncio
+    async def test_validated_api_key_is_cached(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
+        """Test a recently validated key is not checked again."""
+        await async_validate_api_key(hass, "test_api_key")
+        await async_validate_api_key(hass, "test_api_key")
+
+        mock_transport_nsw_config_flow.async_get_stop_finder.assert_awaited_once()
+        # Only a hash of the key is kept
+        assert "test_api_key" not in hass.data[VALIDATED_API_KEYS]
+
+        await async_validate_api_key(hass, "other_api_key")
+        assert mock_transport_nsw_config_flow.async_get_stop_finder.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_validated_api_key_expires(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
+        """Test a key is checked again once its validation has expired."""
+        await async_validate_api_key(hass, "test_api_key")
+        for key_hash in hass.data[VALIDATED_API_KEYS]:
+            hass.data[VALIDATED_API_KEYS][key_hash] -= API_KEY_VALIDATION_TTL.total_seconds()
+
+        await async_validate_api_key(hass, "test_api_key")
 
-            with pytest.raises(ValueError, match="Cannot connect to Transport NSW API"):
-                await validate_input(hass, data)
+        assert mock_transport_nsw_config_flow.async_get_stop_finder.await_count == 2
 
     @pytest.mark.asyncio
-    async def test_validate_subentry_input_success(self, hass: HomeAssistant):
+    async def test_rejected_api_key_is_not_cached(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
+        """Test a failed validation is retried on the next attempt."""
+        mock_transport_nsw_config_flow.async_get_stop_finder.side_effect = TransportNSWAuthError("API Error")
+        with pytest.raises(TransportNSWAuthError):
+            await async_validate_api_key(hass, "test_api_key")
+
+        mock_transport_nsw_config_flow.async_get_stop_finder.side_effect = None
+        await async_validate_api_key(hass, "test_api_key")
+
+        assert mock_transport_nsw_config_flow.async_get_stop_finder.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_validate_subentry_input_success(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test successful subentry input validation."""
-        with patch("custom_components.transport_nsw.config_flow.TransportNSW") as mock_transport_class:
-            mock_transport_instance = mock_transport_class.return_value
-            mock_transport_instance.get_departures.return_value = {"route": "T1"}
-            
-            # Mock hass.async_add_executor_job to return the API response
-            hass.async_add_executor_job.return_value = {"route": "T1"}
-            
-            data = {CONF_STOP_ID: "123", CONF_ROUTE: "T1", CONF_DESTINATION: "Hornsby"}
-            result = await validate_subentry_input(hass, "test_api_key", data)
+        mock_transport_nsw_config_flow.async_get_departure_monitor.return_value = {"stopEvents": []}
 
-            assert result["title"] == "Stop 123 (T1 → Hornsby)"
-            hass.async_add_executor_job.assert_called_once_with(
-                mock_transport_instance.get_departures,
-                "123", "T1", "Hornsby", "test_api_key"
-            )
+        data = {CONF_STOP_ID: "123", CONF_ROUTE: "T1", CONF_DESTINATION: "Hornsby"}
+        result = await validate_subentry_input(hass, "test_api_key", data)
+
+        assert result["title"] == "Stop 123 (T1 → Hornsby)"
+        mock_transport_nsw_config_flow.async_get_departure_monitor.assert_awaited_once_with("123")
 
     @pytest.mark.asyncio
-    async def test_validate_subentry_input_none_response(self, hass: HomeAssistant):
+    async def test_validate_subentry_input_none_response(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test subentry validation with None response."""
-        with patch("custom_components.transport_nsw.config_flow.TransportNSW") as mock_transport_class:
-            mock_transport_instance = mock_transport_class.return_value
-            mock_transport_instance.get_departures.return_value = None
-            
-            # Mock hass.async_add_executor_job to return None
-            hass.async_add_executor_job.return_value = None
-            
-            data = {CONF_STOP_ID: "123"}
+        mock_transport_nsw_config_flow.async_get_departure_monitor.return_value = None
 
-            with pytest.raises(ValueError, match="Cannot connect to Transport NSW API"):
-                await validate_subentry_input(hass, "test_api_key", data)
+        data = {CONF_STOP_ID: "123"}
+
+        with pytest.raises(ValueError, match="Cannot connect to Transport NSW API"):
+            await validate_subentry_input(hass, "test_api_key", data)
 
     @pytest.mark.asyncio
-    async def test_validate_subentry_input_api_error(self, hass: HomeAssistant):
+    async def test_validate_subentry_input_api_error(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test subentry validation with API error."""
-        with patch("custom_components.transport_nsw.config_flow.TransportNSW") as mock_transport_class:
-            mock_transport_instance = mock_transport_class.return_value
-            mock_transport_instance.get_departures.side_effect = Exception("API Error")
-            
-            # Mock hass.async_add_executor_job to raise the exception
-            hass.async_add_executor_job.side_effect = Exception("API Error")
-            
-            data = {CONF_STOP_ID: "123"}
+        mock_transport_nsw_config_flow.async_get_departure_monitor.side_effect = TransportNSWConnectionError("API Error")
+
+        data = {CONF_STOP_ID: "123"}
 
-            with pytest.raises(ValueError, match="Cannot connect to Transport NSW API"):
-                await validate_subentry_input(hass, "test_api_key", data)
+        with pytest.raises(ValueError, match="Cannot connect to Transport NSW API"):
+            await validate_subentry_input(hass, "test_api_key", data)
 
 
 class TestTransportNSWConfigFlow:
@@ -254,7 +265,10 @@ class TestTransportNSWConfigFlow:
         """Test getting supported subentry types."""
         config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test"})
         types = TransportNSWConfigFlow.async_get_supported_subentry_types(config_entry)
-        assert types == {SUBENTRY_TYPE_STOP: TransportNSWSubentryFlowHandler}
+        assert types == {
+            SUBENTRY_TYPE_STOP: TransportNSWSubentryFlowHandler,
+            SUBENTRY_TYPE_JOURNEY: TransportNSWJourneySubentryFlowHandler,
+        }
 
 
 class TestTransportNSWOptionsFlow:
@@ -300,7 +314,7 @@ class TestTransportNSWOptionsFlow:
         assert call_args[1]["title"] == "New Name"
 
     @pytest.mark.asyncio
-    async def test_update_api_key_only(self, hass: HomeAssistant):
+    async def test_update_api_key_only(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test updating API key only."""
         config_entry = MockConfigEntry(
             domain=DOMAIN,
@@ -321,7 +335,7 @@ class TestTransportNSWOptionsFlow:
         mock_update.assert_called_once()
 
     @pytest.mark.asyncio
-    async def test_update_api_key_without_custom_name(self, hass: HomeAssistant):
+    async def test_update_api_key_without_custom_name(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test updating API key without custom name generates new title."""
         config_entry = MockConfigEntry(
             domain=DOMAIN,
@@ -364,6 +378,54 @@ class TestTransportNSWOptionsFlow:
         assert result["type"] is FlowResultType.CREATE_ENTRY
         mock_update.assert_not_called()
 
+    @pytest.mark.asyncio
+    async def test_invalid_update_interval(self, hass: HomeAssistant):
+        """Test a maximum interval below the minimum is rejected."""
+        config_entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key", CONF_NAME: "Test Name"},
+        )
+        config_entry.add_to_hass(hass)
+
+        flow = TransportNSWOptionsFlow(config_entry)
+        flow.hass = hass
+
+        with patch.object(hass.config_entries, "async_update_entry") as mock_update:
+            result = await flow.async_step_init({
+                CONF_API_KEY: "test_api_key",
+                CONF_NAME: "Test Name",
+                CONF_ADAPTIVE_POLLING: True,
+                CONF_MIN_UPDATE_INTERVAL: 120,
+                CONF_MAX_UPDATE_INTERVAL: 60,
+            })
+
+        assert result["type"] is FlowResultType.FORM
+        assert result["errors"] == {CONF_MAX_UPDATE_INTERVAL: "invalid_update_interval"}
+        mock_update.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_update_api_key_rejected(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
+        """Test a new API key that doesn't work is not saved."""
+        mock_transport_nsw_config_flow.async_get_stop_finder.side_effect = TransportNSWAuthError("API Error")
+        config_entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key", CONF_NAME: "Test Name"},
+        )
+        config_entry.add_to_hass(hass)
+
+        flow = TransportNSWOptionsFlow(config_entry)
+        flow.hass = hass
+
+        with patch.object(hass.config_entries, "async_update_entry") as mock_update:
+            result = await flow.async_step_init({
+                CONF_API_KEY: "bad_api_key",
+                CONF_NAME: "Test Name",
+            })
+
+        assert result["type"] is FlowResultType.FORM
+        assert result["errors"] == {"base": "cannot_connect"}
+        mock_update.assert_not_called()
+
 
 class TestTransportNSWSubentryFlowHandler:
     """Test the subentry flow handler."""
@@ -427,25 +489,19 @@ class TestTransportNSWSubentryFlowHandler:
         assert result["step_id"] == "user"
         assert result["errors"] == {}
 
-    @pytest.mark.skip(reason="Complex mocking issue with hass.async_add_executor_job")
     @pytest.mark.asyncio
-    async def test_subentry_flow_success(self, hass: HomeAssistant):
+    async def test_subentry_flow_success(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
         """Test successful subentry creation."""
         parent_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
         parent_entry.add_to_hass(hass)
 
         flow = TransportNSWSubentryFlowHandler()
         flow.hass = hass
-        
-        # Configure hass.async_add_executor_job to return a successful API response
-        hass.async_add_executor_job.return_value = {"route": "T1"}
-        
+
+        mock_transport_nsw_config_flow.async_get_departure_monitor.return_value = {"stopEvents": []}
+
         with patch.object(flow, '_get_entry', return_value=parent_entry), \
-             patch("custom_components.transport_nsw.config_flow.TransportNSW") as mock_transport_class:
-            
-            mock_transport_instance = mock_transport_class.return_value
-            mock_transport_instance.get_departures.return_value = {"route": "T1"}
-            
+             patch.object(flow, "async_create_entry", side_effect=lambda **kwargs: {"type": FlowResultType.CREATE_ENTRY, **kwargs}):
             result = await flow.async_step_user({
                 CONF_STOP_ID: "123", 
                 CONF_ROUTE: "T1", 
@@ -456,6 +512,70 @@ class TestTransportNSWSubentryFlowHandler:
         assert result["title"] == "Stop 123 (T1 → Hornsby)"
         assert result["unique_id"] == f"{parent_entry.entry_id}_123_route_T1_dest_Hornsby"
 
+    @pytest.fixture
+    def stop_index(self, tmp_path, mock_stop_index):
+        """Provide an offline stop index to the flow."""
+        path = tmp_path / "stops.idx"
+        build_stop_index(
+            [
+                ("200060", "Central Station"),
+                ("2000321", "Central Station, Platform 21"),
+                ("2000421", "Town Hall Station"),
+            ],
+            path,
+        )
+        index = StopIndex(path)
+        mock_stop_index.return_value = index
+        yield index
+        index.close()
+
+    @pytest.mark.asyncio
+    async def test_subentry_flow_search(self, hass: HomeAssistant, stop_index, mock_transport_nsw_config_flow):
+        """Test stops found by name are offered and validated locally."""
+        parent_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        parent_entry.add_to_hass(hass)
+
+        flow = TransportNSWSubentryFlowHandler()
+        flow.hass = hass
+
+        result = await flow.async_step_user()
+        assert result["type"] is FlowResultType.FORM
+        assert result["step_id"] == "search"
+
+        result = await flow.async_step_search({CONF_STOP_SEARCH: "central"})
+        assert result["type"] is FlowResultType.FORM
+        assert result["step_id"] == "user"
+        stop_selector = result["data_schema"].schema[CONF_STOP_ID]
+        assert [option["value"] for option in stop_selector.config["options"]] == ["200060", "2000321"]
+
+        with patch.object(flow, '_get_entry', return_value=parent_entry),              patch.object(flow, "async_create_entry", side_effect=lambda **kwargs: {"type": FlowResultType.CREATE_ENTRY, **kwargs}):
+            result = await flow.async_step_user({CONF_STOP_ID: "200060", CONF_ROUTE: "T1"})
+
+        assert result["type"] is FlowResultType.CREATE_ENTRY
+        assert result["title"] == "Central Station (Route T1)"
+        mock_transport_nsw_config_flow.async_get_departure_monitor.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_subentry_flow_search_no_results(self, hass: HomeAssistant, stop_index):
+        """Test a search without results asks again."""
+        flow = TransportNSWSubentryFlowHandler()
+        flow.hass = hass
+
+        result = await flow.async_step_search({CONF_STOP_SEARCH: "Wynyard"})
+
+        assert result["step_id"] == "search"
+        assert result["errors"] == {CONF_STOP_SEARCH: "no_stops_found"}
+
+    @pytest.mark.asyncio
+    async def test_validate_unindexed_stop_with_api(self, hass: HomeAssistant, stop_index, mock_transport_nsw_config_flow):
+        """Test stop IDs missing from the index are still checked with the API."""
+        mock_transport_nsw_config_flow.async_get_departure_monitor.return_value = {"stopEvents": []}
+
+        result = await validate_subentry_input(hass, "test_api_key", {CONF_STOP_ID: "10101100"})
+
+        assert result["title"] == "Stop 10101100"
+        mock_transport_nsw_config_flow.async_get_departure_monitor.assert_awaited_once_with("10101100")
+
     @pytest.mark.asyncio
     async def test_subentry_flow_cannot_connect(self, hass: HomeAssistant):
         """Test subentry flow with connection error."""
@@ -603,4 +723,104 @@ class TestTransportNSWSubentryFlowHandler:
             result = await flow.async_step_reconfigure({CONF_STOP_ID: "invalid"})
 
         assert result["type"] is FlowResultType.FORM
-        assert result["errors"] == {"base": "unknown"}
\ No newline at end of file
+        assert result["errors"] == {"base": "unknown"}
+
+
+class TestTransportNSWJourneySubentryFlowHandler:
+    """Test TransportNSWJourneySubentryFlowHandler."""
+
+    @staticmethod
+    def create_flow(hass: HomeAssistant) -> TransportNSWJourneySubentryFlowHandler:
+        """Return a journey flow for an entry with an API key."""
+        parent_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        parent_entry.add_to_hass(hass)
+        flow = TransportNSWJourneySubentryFlowHandler()
+        flow.hass = hass
+        flow._get_entry = lambda: parent_entry
+        return flow
+
+    @pytest.mark.asyncio
+    async def test_form_show(self, hass: HomeAssistant):
+        """Test the journey form is shown."""
+        result = await self.create_flow(hass).async_step_user()
+
+        assert result["type"] is FlowResultType.FORM
+        assert result["step_id"] == "user"
+        assert result["errors"] == {}
+
+    @pytest.mark.asyncio
+    async def test_success(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
+        """Test a journey is checked with one trip request and created."""
+        flow = self.create_flow(hass)
+
+        with patch.object(flow, "async_create_entry", side_effect=lambda **kwargs: {"type": FlowResultType.CREATE_ENTRY, **kwargs}):
+            result = await flow.async_step_user({
+                CONF_ORIGIN_ID: "200060",
+                CONF_DESTINATION_ID: "2000338",
+                CONF_VIA_ID: "2000441",
+            })
+
+        assert result["type"] is FlowResultType.CREATE_ENTRY
+        assert result["title"] == "Stop 200060 → Stop 2000338 via Stop 2000441"
+        assert result["unique_id"] == f"{flow._get_entry().entry_id}_journey_200060_2000338_via_2000441"
+        mock_transport_nsw_config_flow.async_get_trip.assert_awaited_once()
+        assert mock_transport_nsw_config_flow.async_get_trip.await_args.args[0] == JourneyQuery(
+            "200060", "2000338", "2000441"
+        )
+
+    @pytest.mark.asyncio
+    async def test_same_stop(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
+        """Test a journey must end at another stop than it starts from."""
+        result = await self.create_flow(hass).async_step_user(
+            {CONF_ORIGIN_ID: "200060", CONF_DESTINATION_ID: " 200060"}
+        )
+
+        assert result["type"] is FlowResultType.FORM
+        assert result["errors"] == {CONF_DESTINATION_ID: "same_stop"}
+        mock_transport_nsw_config_flow.async_get_trip.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_cannot_connect(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
+        """Test a failed trip request is shown as a connection error."""
+        mock_transport_nsw_config_flow.async_get_trip.side_effect = TransportNSWConnectionError("timeout")
+
+        result = await self.create_flow(hass).async_step_user(
+            {CONF_ORIGIN_ID: "200060", CONF_DESTINATION_ID: "2000338"}
+        )
+
+        assert result["errors"] == {"base": "cannot_connect"}
+
+    @pytest.mark.asyncio
+    async def test_indexed_stops_are_named(self, hass: HomeAssistant, mock_stop_index, mock_transport_nsw_config_flow):
+        """Test journeys between indexed stops take their names and need no request."""
+        mock_stop_index.return_value = {"200060": "Central Station", "2000421": "Town Hall Station"}
+
+        result = await validate_journey_input(
+            hass, "test_api_key", {CONF_ORIGIN_ID: "200060", CONF_DESTINATION_ID: "2000421"}
+        )
+
+        assert result["title"] == "Central Station → Town Hall Station"
+        mock_transport_nsw_config_flow.async_get_trip.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_reconfigure(self, hass: HomeAssistant, mock_transport_nsw_config_flow):
+        """Test a journey's stops can be changed."""
+        flow = self.create_flow(hass)
+        subentry = ConfigSubentry(
+            data={CONF_ORIGIN_ID: "200060", CONF_DESTINATION_ID: "2000338"},
+            subentry_id="journey1",
+            subentry_type=SUBENTRY_TYPE_JOURNEY,
+            title="Stop 200060 → Stop 2000338",
+            unique_id="journey1",
+        )
+
+        with patch.object(flow, "_get_reconfigure_subentry", return_value=subentry), \
+             patch.object(flow, "async_update_and_abort") as mock_update:
+            form = await flow.async_step_reconfigure()
+            await flow.async_step_reconfigure(
+                {CONF_ORIGIN_ID: "200060", CONF_DESTINATION_ID: "2000421", CONF_NAME: "Work"}
+            )
+
+        assert form["step_id"] == "reconfigure"
+        assert mock_update.call_args[1]["title"] == "Work"
+        assert mock_update.call_args[1]["data_updates"][CONF_DESTINATION_ID] == "2000421"
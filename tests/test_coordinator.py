@@ -1,50 +1,62 @@
 """Test the Transport NSW coordinator."""
 
-from unittest.mock import AsyncMock, patch
+from dataclasses import replace
+from datetime import timedelta
+import os
+from unittest.mock import ANY, AsyncMock, Mock, patch
 
 import pytest
 from homeassistant.config_entries import ConfigSubentry
-from homeassistant.const import CONF_API_KEY, CONF_NAME
+from homeassistant.const import ATTR_MODE, CONF_API_KEY, CONF_NAME
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.update_coordinator import UpdateFailed
+from homeassistant.util import dt as dt_util
 
+from custom_components.transport_nsw.api import TransportNSWConnectionError
 from custom_components.transport_nsw.const import (
     ATTR_DELAY,
+    ATTR_DEPARTURE_TIME,
+    ATTR_DEPARTURES,
     ATTR_DESTINATION,
     ATTR_DUE_IN,
+    ATTR_FETCHED_AT,
     ATTR_REAL_TIME,
     ATTR_ROUTE,
+    ATTR_STOP_ID,
+    CONF_ADAPTIVE_POLLING,
+    CONF_DEPARTURE_COUNT,
+    CONF_DEPARTURE_OFFSET,
     CONF_DESTINATION,
+    CONF_DESTINATION_ID,
+    CONF_EXCLUDED_MODES,
+    CONF_MAX_UPDATE_INTERVAL,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_ORIGIN_ID,
     CONF_ROUTE,
     CONF_STOP_ID,
     DOMAIN,
+    JOURNEY_COUNT,
+    SUBENTRY_TYPE_JOURNEY,
     SUBENTRY_TYPE_STOP,
 )
 from custom_components.transport_nsw.coordinator import (
+    SCAN_INTERVAL,
+    DepartureSnapshot,
     TransportNSWCoordinator,
-    _get_value,
+    TransportNSWJourneyCoordinator,
+    UpcomingDeparture,
     _raise_update_failed,
 )
+from custom_components.transport_nsw.departures import Departure, DepartureQuery
+from custom_components.transport_nsw.gtfs import async_get_timetable
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
+from .conftest import make_journey, make_stop_event, make_trip_response
+
 
 class TestCoordinatorHelperFunctions:
     """Test coordinator helper functions."""
 
-    def test_get_value_with_none(self):
-        """Test _get_value with None."""
-        assert _get_value(None) is None
-
-    def test_get_value_with_na(self):
-        """Test _get_value with 'n/a'."""
-        assert _get_value("n/a") is None
-
-    def test_get_value_with_valid_value(self):
-        """Test _get_value with valid value."""
-        assert _get_value("test") == "test"
-        assert _get_value(5) == 5
-        assert _get_value(True) is True
-
     def test_raise_update_failed_without_exception(self):
         """Test _raise_update_failed without exception."""
         with pytest.raises(UpdateFailed, match="Test message"):
@@ -137,49 +149,42 @@ class TestTransportNSWCoordinator:
     @pytest.mark.asyncio
     async def test_update_data_success(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response):
         """Test successful data update."""
-        mock_transport_nsw_api.get_departures.return_value = mock_api_response
         coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
 
-        # Configure the hass async_add_executor_job to return the API response
-        hass.async_add_executor_job.return_value = mock_api_response
+        # Configure the API client to return the response
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
 
         data = await coordinator._async_update_data()
 
-        assert data[ATTR_ROUTE] == "T1"
-        assert data[ATTR_DUE_IN] == 5
-        assert data[ATTR_DELAY] == 0
-        assert data[ATTR_REAL_TIME] is True
-        assert data[ATTR_DESTINATION] == "Hornsby"
-        hass.async_add_executor_job.assert_called_once_with(
-            mock_transport_nsw_api.get_departures,
-            "test_stop_id", "", "", "test_api_key"
-        )
+        assert data.next.departure.route == "T1"
+        assert data.next.due == 5
+        assert data.next.departure.delay == 0
+        assert data.next.departure.real_time == "y"
+        assert data.next.departure.destination == "Hornsby"
+        assert data.next.departure.mode == "Train"
+        assert data.next.departure.departure_time > dt_util.utcnow()
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once_with("test_stop_id", ANY, DepartureQuery())
 
     @pytest.mark.asyncio
     async def test_update_data_with_nulls(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response_with_nulls):
-        """Test data update with None and n/a values."""
-        mock_transport_nsw_api.get_departures.return_value = mock_api_response_with_nulls
+        """Test data update when the stop has no departures."""
         coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
 
-        # Configure the hass async_add_executor_job to return the API response
-        hass.async_add_executor_job.return_value = mock_api_response_with_nulls
+        # Configure the API client to return the response
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response_with_nulls
 
         data = await coordinator._async_update_data()
 
-        assert data[ATTR_ROUTE] is None
-        assert data[ATTR_DUE_IN] is None  # "n/a" should become None
-        assert data[ATTR_DELAY] == 0
-        assert data[ATTR_REAL_TIME] is True
-        assert data[ATTR_DESTINATION] is None
+        assert data.next is None
+        assert data.departures == ()
 
     @pytest.mark.asyncio
     async def test_update_data_none_response(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api):
         """Test data update with None response from API."""
-        mock_transport_nsw_api.get_departures.return_value = None
         coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
 
-        # Configure the hass async_add_executor_job to return None
-        hass.async_add_executor_job.return_value = None
+        # Configure the API client to return None
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = None
 
         with pytest.raises(UpdateFailed, match="No data returned from Transport NSW API"):
             await coordinator._async_update_data()
@@ -187,11 +192,10 @@ class TestTransportNSWCoordinator:
     @pytest.mark.asyncio
     async def test_update_data_api_error(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api):
         """Test data update with API error."""
-        mock_transport_nsw_api.get_departures.side_effect = Exception("API Error")
         coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
 
-        # Configure the hass async_add_executor_job to raise an exception
-        hass.async_add_executor_job.side_effect = Exception("API Error")
+        # Configure the API client to raise an exception
+        mock_transport_nsw_api.async_get_departure_monitor.side_effect = Exception("API Error")
 
         with pytest.raises(UpdateFailed, match="Error communicating with Transport NSW API"):
             await coordinator._async_update_data()
@@ -199,19 +203,112 @@ class TestTransportNSWCoordinator:
     @pytest.mark.asyncio
     async def test_update_data_with_subentry_filters(self, hass: HomeAssistant, mock_config_entry_with_subentries, mock_transport_nsw_api, mock_api_response):
         """Test data update with subentry route and destination filters."""
-        mock_transport_nsw_api.get_departures.return_value = mock_api_response
         subentry = list(mock_config_entry_with_subentries.subentries.values())[0]
         coordinator = TransportNSWCoordinator(hass, mock_config_entry_with_subentries, subentry)
 
-        # Configure the hass async_add_executor_job to return the API response
-        hass.async_add_executor_job.return_value = mock_api_response
+        # Configure the API client to return the response
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
 
-        await coordinator._async_update_data()
+        data = await coordinator._async_update_data()
 
-        hass.async_add_executor_job.assert_called_once_with(
-            mock_transport_nsw_api.get_departures,
-            "stop_001", "T1", "Hornsby", "test_api_key"
+        assert data.next.departure.route == "T1"
+        assert data.next.departure.destination == "Hornsby"
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once_with("stop_001", ANY, DepartureQuery())
+
+    @pytest.mark.asyncio
+    async def test_update_data_filters_route_locally(self, hass: HomeAssistant, mock_transport_nsw_api, mock_api_response):
+        """Test the route filter picks the first matching departure."""
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key", CONF_STOP_ID: "123"},
+            options={CONF_ROUTE: "T9"},
         )
+        coordinator = TransportNSWCoordinator(hass, entry, None)
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+
+        data = await coordinator._async_update_data()
+
+        assert data.next.departure.route == "T9"
+        assert data.next.departure.destination == "Gordon"
+        assert data.next.due == 8
+        assert data.next.departure.delay == 2
+
+    @pytest.mark.asyncio
+    async def test_reconfigured_filter_is_recompiled(self, hass: HomeAssistant, mock_config_entry_with_subentries, mock_transport_nsw_api, mock_api_response):
+        """Test a reconfigured route filter with alternatives is compiled again."""
+        subentry = list(mock_config_entry_with_subentries.subentries.values())[0]
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_with_subentries, subentry)
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+
+        with patch.object(coordinator, "async_request_refresh"):
+            await coordinator.async_update_config(
+                mock_config_entry_with_subentries,
+                ConfigSubentry(
+                    data={**subentry.data, CONF_ROUTE: "t9, T1", CONF_DESTINATION: ""},
+                    subentry_id=subentry.subentry_id,
+                    subentry_type=SUBENTRY_TYPE_STOP,
+                    title=subentry.title,
+                    unique_id=subentry.unique_id,
+                ),
+            )
+        data = await coordinator._async_update_data()
+
+        assert [upcoming.departure.route for upcoming in data.departures] == ["T1", "T9", "T1"]
+
+    @pytest.mark.asyncio
+    async def test_update_data_applies_query_locally(self, hass: HomeAssistant, mock_transport_nsw_api):
+        """Test excluded modes and the offset are applied to shared departures too."""
+        entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        subentry = ConfigSubentry(
+            data={CONF_STOP_ID: "123", CONF_EXCLUDED_MODES: ["Bus"], CONF_DEPARTURE_OFFSET: 6},
+            subentry_id="sub",
+            subentry_type=SUBENTRY_TYPE_STOP,
+            title="Stop",
+            unique_id="entry_123",
+        )
+        coordinator = TransportNSWCoordinator(hass, entry, subentry)
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = {
+            "stopEvents": [
+                make_stop_event("T1", "Hornsby", 1, minutes=5),
+                make_stop_event("380", "Bondi", 5, minutes=7),
+                make_stop_event("T9", "Gordon", 1, minutes=8),
+            ]
+        }
+
+        data = await coordinator._async_update_data()
+
+        assert [upcoming.departure.route for upcoming in data.departures] == ["T9"]
+
+    @pytest.mark.asyncio
+    async def test_update_data_shares_stop_fetch(self, hass: HomeAssistant, mock_transport_nsw_api, mock_api_response):
+        """Test subentries watching the same stop share a single request."""
+        entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        subentries = [
+            ConfigSubentry(
+                data={CONF_STOP_ID: "123", CONF_ROUTE: route, CONF_DESTINATION: destination},
+                subentry_id=f"sub_{index}",
+                subentry_type=SUBENTRY_TYPE_STOP,
+                title=f"Stop {index}",
+                unique_id=f"entry_123_{index}",
+            )
+            for index, (route, destination) in enumerate(
+                [("T1", "Hornsby"), ("T9", ""), ("", "Berowra")]
+            )
+        ]
+        coordinators = [
+            TransportNSWCoordinator(hass, entry, subentry) for subentry in subentries
+        ]
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+
+        results = [await coordinator._async_update_data() for coordinator in coordinators]
+
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once()
+        assert [result.next.departure.destination for result in results] == [
+            "Hornsby",
+            "Gordon",
+            "Berowra",
+        ]
+        assert results[2].next.departure.real_time == "n"
 
     @pytest.mark.asyncio
     async def test_async_update_config(self, hass: HomeAssistant, mock_config_entry_legacy):
@@ -280,4 +377,608 @@ class TestTransportNSWCoordinator:
         coordinator = TransportNSWCoordinator(hass, entry, None)
 
         assert coordinator.route == "T2"
-        assert coordinator.destination == "Parramatta"
\ No newline at end of file
+        assert coordinator.destination == "Parramatta"
+
+
+class TestAdaptivePolling:
+    """Test adaptive update intervals."""
+
+    @pytest.fixture
+    def adaptive_entry(self):
+        """Return a legacy entry with adaptive polling enabled."""
+        return MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key", CONF_STOP_ID: "123"},
+            options={
+                CONF_ADAPTIVE_POLLING: True,
+                CONF_MIN_UPDATE_INTERVAL: 30,
+                CONF_MAX_UPDATE_INTERVAL: 900,
+            },
+        )
+
+    @pytest.mark.asyncio
+    async def test_fixed_interval_by_default(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api):
+        """Test the interval stays fixed without adaptive polling."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = {
+            "stopEvents": [make_stop_event(minutes=40)]
+        }
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        await coordinator._async_update_data()
+
+        assert coordinator.update_interval == SCAN_INTERVAL
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("minutes", "expected"),
+        [(40, timedelta(minutes=10)), (8, timedelta(minutes=2)), (1, timedelta(seconds=30)), (120, timedelta(minutes=15))],
+    )
+    async def test_interval_follows_due_time(self, hass: HomeAssistant, adaptive_entry, mock_transport_nsw_api, minutes, expected):
+        """Test the interval scales with the next departure within bounds."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = {
+            "stopEvents": [make_stop_event(minutes=minutes)]
+        }
+        coordinator = TransportNSWCoordinator(hass, adaptive_entry, None)
+
+        await coordinator._async_update_data()
+
+        assert coordinator.update_interval == expected
+
+    @pytest.mark.asyncio
+    async def test_no_departures_backs_off(self, hass: HomeAssistant, adaptive_entry, mock_transport_nsw_api):
+        """Test the maximum interval is used when nothing is departing."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = {"stopEvents": []}
+        coordinator = TransportNSWCoordinator(hass, adaptive_entry, None)
+
+        await coordinator._async_update_data()
+
+        assert coordinator.update_interval == timedelta(seconds=900)
+
+    @pytest.mark.asyncio
+    async def test_changing_delay_polls_often(self, hass: HomeAssistant, adaptive_entry, mock_transport_nsw_api):
+        """Test the minimum interval is used while the delay is changing."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = {
+            "stopEvents": [make_stop_event(minutes=20, delay=2)]
+        }
+        coordinator = TransportNSWCoordinator(hass, adaptive_entry, None)
+        coordinator.data = DepartureSnapshot(
+            (UpcomingDeparture.build(scheduled_departure(minutes=20), "123", dt_util.utcnow()),)
+        )
+
+        await coordinator._async_update_data()
+
+        assert coordinator.update_interval == timedelta(seconds=30)
+
+    @pytest.mark.asyncio
+    async def test_shared_fetch_uses_update_interval(self, hass: HomeAssistant, adaptive_entry, mock_transport_nsw_api):
+        """Test the shared stop fetch is refreshed no later than the interval."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = {
+            "stopEvents": [make_stop_event(minutes=1)]
+        }
+        coordinator = TransportNSWCoordinator(hass, adaptive_entry, None)
+        await coordinator._async_update_data()
+        assert coordinator.update_interval == timedelta(seconds=30)
+
+        with patch.object(coordinator.hub, "async_get_departures", AsyncMock(return_value=[])) as mock_get:
+            await coordinator._async_update_data()
+
+        mock_get.assert_awaited_once_with("123", max_age=timedelta(seconds=25), trace=ANY)
+
+
+class TestUpcomingDepartures:
+    """Test the coordinator keeps several upcoming departures."""
+
+    @pytest.mark.asyncio
+    async def test_upcoming_departures_from_one_request(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response):
+        """Test the upcoming departures are kept in order."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        data = await coordinator._async_update_data()
+
+        assert [upcoming.departure.route for upcoming in data.departures] == ["T1", "T9", "T1"]
+        assert [upcoming.due for upcoming in data.departures] == [5, 8, 12]
+        assert data.departures[0] is data.next
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_upcoming_departures_are_bounded(self, hass: HomeAssistant, mock_transport_nsw_api):
+        """Test the departure count limits the list and skips departed services."""
+        entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        subentry = ConfigSubentry(
+            data={CONF_STOP_ID: "123", CONF_ROUTE: "T1", CONF_DEPARTURE_COUNT: 2.0},
+            subentry_id="sub1",
+            subentry_type=SUBENTRY_TYPE_STOP,
+            title="Stop 123",
+            unique_id="entry_123_route_T1",
+        )
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = {
+            "stopEvents": [
+                make_stop_event("T1", minutes=-3),
+                make_stop_event("T1", minutes=2),
+                make_stop_event("T2", minutes=4),
+                make_stop_event("T1", minutes=6),
+                make_stop_event("T1", minutes=9),
+            ]
+        }
+        coordinator = TransportNSWCoordinator(hass, entry, subentry)
+
+        data = await coordinator._async_update_data()
+
+        assert coordinator.departure_count == 2
+        assert [upcoming.due for upcoming in data.departures] == [2, 6]
+        assert data.next.due == 2
+
+    @pytest.mark.asyncio
+    async def test_no_upcoming_departures(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response_with_nulls):
+        """Test the list is empty when nothing is departing."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response_with_nulls
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        data = await coordinator._async_update_data()
+
+        assert data.departures == ()
+        assert data.next is None
+
+    def test_snapshot_ranks(self):
+        """Test departures are looked up by their rank."""
+        now = dt_util.utcnow()
+        upcoming = tuple(
+            UpcomingDeparture.build(scheduled_departure(route, minutes), "123", now)
+            for route, minutes in [("T1", 2), ("T9", 6)]
+        )
+        snapshot = DepartureSnapshot(upcoming)
+
+        assert snapshot.next is upcoming[0]
+        assert snapshot.at_rank(2) is upcoming[1]
+        assert snapshot.at_rank(3) is None
+        assert upcoming[1].due == 6
+        assert upcoming[1].attributes == {
+            ATTR_STOP_ID: "123",
+            ATTR_ROUTE: "T9",
+            ATTR_DELAY: 0,
+            ATTR_REAL_TIME: "n",
+            ATTR_DESTINATION: "Hornsby",
+            ATTR_MODE: "Train",
+        }
+
+    def test_snapshot_is_immutable(self):
+        """Test neither the snapshot nor its attributes can be changed in place."""
+        upcoming = UpcomingDeparture.build(scheduled_departure(), "123", dt_util.utcnow())
+        snapshot = DepartureSnapshot((upcoming,))
+
+        with pytest.raises(AttributeError):
+            snapshot.fetched_at = dt_util.utcnow()
+        with pytest.raises(TypeError):
+            upcoming.attributes[ATTR_ROUTE] = "T9"
+
+    def test_snapshot_as_dict(self):
+        """Test the snapshot is shown as plain data in diagnostics."""
+        now = dt_util.utcnow()
+        departure = scheduled_departure()
+        snapshot = DepartureSnapshot((UpcomingDeparture.build(departure, "123", now),), now)
+
+        assert snapshot.as_dict() == {
+            ATTR_DEPARTURES: [
+                {
+                    ATTR_STOP_ID: "123",
+                    ATTR_ROUTE: "T1",
+                    ATTR_DELAY: 0,
+                    ATTR_REAL_TIME: "n",
+                    ATTR_DESTINATION: "Hornsby",
+                    ATTR_MODE: "Train",
+                    ATTR_DUE_IN: 5,
+                    ATTR_DEPARTURE_TIME: departure.departure_time,
+                }
+            ],
+            ATTR_FETCHED_AT: now,
+        }
+
+
+class TestSnapshotRestore:
+    """Test departures are saved and restored across restarts."""
+
+    @pytest.mark.asyncio
+    async def test_update_saves_snapshot(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response, mock_store):
+        """Test each update saves the upcoming departures."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        await coordinator._async_update_data()
+
+        snapshot = await coordinator.hub.async_get_snapshot(coordinator.snapshot_key)
+        assert [departure[ATTR_ROUTE] for departure in snapshot[ATTR_DEPARTURES]] == ["T1", "T9", "T1"]
+        assert isinstance(snapshot[ATTR_DEPARTURES][0][ATTR_DEPARTURE_TIME], str)
+        mock_store.async_delay_save.assert_called()
+
+    @pytest.mark.asyncio
+    async def test_restore_round_trip(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response):
+        """Test a new coordinator restores what the last one saved."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        saved = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        await saved._async_update_data()
+
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        assert await coordinator.async_restore() is True
+
+        assert coordinator.data.next.departure.route == "T1"
+        assert coordinator.data.next.due == 5
+        assert [upcoming.due for upcoming in coordinator.data.departures] == [5, 8, 12]
+        assert coordinator.data.fetched_at <= dt_util.utcnow()
+
+    @pytest.mark.asyncio
+    async def test_restore_drops_departed(self, hass: HomeAssistant, mock_config_entry_legacy, mock_store):
+        """Test departures that have left since the snapshot are dropped."""
+        now = dt_util.utcnow()
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        mock_store.async_load.return_value = {
+            "snapshots": {
+                coordinator.snapshot_key: {
+                    "filter": coordinator._snapshot_filter(),
+                    ATTR_FETCHED_AT: (now - timedelta(minutes=10)).isoformat(),
+                    ATTR_DEPARTURES: [
+                        {
+                            ATTR_ROUTE: route,
+                            ATTR_DEPARTURE_TIME: (now + timedelta(minutes=minutes, seconds=10)).isoformat(),
+                            ATTR_DELAY: 0,
+                            ATTR_REAL_TIME: "y",
+                            ATTR_DESTINATION: "Hornsby",
+                            ATTR_MODE: "Train",
+                        }
+                        for route, minutes in [("T1", -2), ("T9", 4)]
+                    ],
+                }
+            }
+        }
+
+        assert await coordinator.async_restore() is True
+        assert coordinator.data.next.departure.route == "T9"
+        assert len(coordinator.data.departures) == 1
+
+    @pytest.mark.asyncio
+    async def test_restore_nothing_upcoming(self, hass: HomeAssistant, mock_config_entry_legacy, mock_store):
+        """Test nothing is restored once every departure has left."""
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        mock_store.async_load.return_value = {
+            "snapshots": {
+                coordinator.snapshot_key: {
+                    "filter": coordinator._snapshot_filter(),
+                    ATTR_FETCHED_AT: dt_util.utcnow().isoformat(),
+                    ATTR_DEPARTURES: [],
+                }
+            }
+        }
+
+        assert await coordinator.async_restore() is False
+        assert coordinator.data is None
+
+    @pytest.mark.asyncio
+    async def test_restore_ignores_changed_filter(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response):
+        """Test a snapshot taken with another route or destination is ignored."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        saved = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        await saved._async_update_data()
+
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        coordinator.route = "T9"
+
+        assert await coordinator.async_restore() is False
+
+    @pytest.mark.asyncio
+    async def test_restore_ignores_invalid_snapshot(self, hass: HomeAssistant, mock_config_entry_legacy, mock_store):
+        """Test a corrupt snapshot is ignored."""
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        mock_store.async_load.return_value = {
+            "snapshots": {
+                coordinator.snapshot_key: {"filter": coordinator._snapshot_filter()}
+            }
+        }
+
+        assert await coordinator.async_restore() is False
+
+
+def scheduled_departure(route="T1", minutes=5):
+    """Build a timetabled departure leaving in the given minutes."""
+    return Departure(
+        route=route,
+        destination="Hornsby",
+        mode="Train",
+        real_time="n",
+        delay=0,
+        departure_time=dt_util.utcnow() + timedelta(minutes=minutes, seconds=10),
+    )
+
+
+class TestTimetableFallback:
+    """Test timetabled departures stand in for the departure monitor."""
+
+    @pytest.fixture
+    def timetable(self, hass: HomeAssistant, mock_timetable):
+        """Provide an offline timetable to the coordinator."""
+        hass.async_add_executor_job = AsyncMock(side_effect=lambda target, *args: target(*args))
+        timetable = Mock()
+        timetable.departures.return_value = [
+            scheduled_departure("T1", 3),
+            scheduled_departure("T9", 7),
+        ]
+        mock_timetable.return_value = timetable
+        return timetable
+
+    @pytest.mark.asyncio
+    async def test_api_error_uses_timetable(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, timetable, mock_store):
+        """Test the timetable is used when the API fails."""
+        mock_transport_nsw_api.async_get_departure_monitor.side_effect = Exception("API Error")
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        data = await coordinator._async_update_data()
+
+        assert [upcoming.departure.route for upcoming in data.departures] == ["T1", "T9"]
+        assert data.next.due == 3
+        assert data.next.departure.real_time == "n"
+        assert timetable.departures.call_args[0][0] == "test_stop_id"
+        assert await coordinator.hub.async_get_snapshot(coordinator.snapshot_key) is None
+
+    @pytest.mark.asyncio
+    async def test_quota_exceeded_uses_timetable(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, timetable):
+        """Test the timetable is used once the daily quota is used up."""
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        coordinator.hub.scheduler.daily_budget = 0
+
+        data = await coordinator._async_update_data()
+
+        assert data.next.departure.route == "T1"
+        mock_transport_nsw_api.async_get_departure_monitor.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_timetable_is_filtered(self, hass: HomeAssistant, mock_transport_nsw_api, timetable):
+        """Test timetabled departures are filtered like real-time ones."""
+        entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        subentry = ConfigSubentry(
+            data={CONF_STOP_ID: "123", CONF_ROUTE: "T9"},
+            subentry_id="sub1",
+            subentry_type=SUBENTRY_TYPE_STOP,
+            title="Stop 123",
+            unique_id="entry_123_route_T9",
+        )
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = None
+        coordinator = TransportNSWCoordinator(hass, entry, subentry)
+
+        data = await coordinator._async_update_data()
+
+        assert data.next.departure.route == "T9"
+        assert data.next.due == 7
+
+    @pytest.mark.asyncio
+    async def test_timetable_fills_in_quiet_periods(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response_with_nulls, timetable):
+        """Test the timetable is used when nothing real-time is upcoming."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response_with_nulls
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        data = await coordinator._async_update_data()
+
+        assert data.next.departure.route == "T1"
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_real_time_departures_are_preferred(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response, timetable):
+        """Test the timetable isn't read while real-time departures are upcoming."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        data = await coordinator._async_update_data()
+
+        assert data.next.departure.real_time == "y"
+        timetable.departures.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_missing_timetable_is_looked_up_once(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, tmp_path):
+        """Test updates without a timetable don't look for its file every time."""
+        hass.config.path = lambda *parts: os.path.join(tmp_path, *parts)
+        hass.async_add_executor_job = AsyncMock(side_effect=lambda target, *args: target(*args))
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = {"stopEvents": []}
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        # The real lookup rather than the autouse mock_timetable
+        with patch("custom_components.transport_nsw.coordinator.async_get_timetable", async_get_timetable):
+            for _ in range(3):
+                data = await coordinator._async_update_data()
+
+        assert data.departures == ()
+        hass.async_add_executor_job.assert_awaited_once()
+
+
+class TestUpdateStats:
+    """Test the coordinator records how its updates went."""
+
+    @pytest.mark.asyncio
+    async def test_successful_update(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response):
+        """Test a successful update is recorded with its phases."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        await coordinator._async_update_data()
+
+        assert coordinator.stats.successes == 1
+        assert coordinator.stats.failures == 0
+        assert coordinator.stats.last_duration > 0
+        assert set(coordinator.stats.last_phases) == {"queue", "parse"}
+        assert coordinator.hub.stats.successes == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_update(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api):
+        """Test a failed update is recorded for the stop and the API key."""
+        mock_transport_nsw_api.async_get_departure_monitor.side_effect = TransportNSWConnectionError("timeout")
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        with pytest.raises(UpdateFailed):
+            await coordinator._async_update_data()
+
+        assert coordinator.stats.failures == 1
+        assert coordinator.hub.stats.failures == 1
+
+    @pytest.mark.asyncio
+    async def test_cached_update_sends_no_request(self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api, mock_api_response):
+        """Test updates served from the shared cache count for the stop only."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+
+        await coordinator._async_update_data()
+        await coordinator._async_update_data()
+
+        assert coordinator.stats.successes == 2
+        assert coordinator.stats.last_phases == {}
+        assert coordinator.hub.stats.successes == 1
+
+
+class TestChangeDetection:
+    """Test listeners only hear about refreshes that changed the departures."""
+
+    def test_snapshots_compare_shown_fields(self):
+        """Test snapshots are equal when the sensors would show them the same."""
+        now = dt_util.utcnow()
+        # Ten seconds past the minute, so a 20 second shift rounds the same
+        departure = replace(
+            scheduled_departure(),
+            departure_time=now.replace(second=10, microsecond=0) + timedelta(minutes=5),
+        )
+
+        def snapshot(**changes):
+            changed = replace(departure, **changes)
+            return DepartureSnapshot((UpcomingDeparture.build(changed, "123", now),))
+
+        assert snapshot() == snapshot()
+        assert snapshot() == snapshot(departure_time=departure.departure_time - timedelta(seconds=20))
+        assert snapshot() != snapshot(delay=2)
+        assert snapshot() != snapshot(destination="Berowra")
+        assert snapshot() != snapshot(departure_time=departure.departure_time + timedelta(minutes=1))
+        assert snapshot() != DepartureSnapshot(snapshot().departures, now)
+
+    def test_snapshots_minutes_apart_are_equal(self):
+        """Test the same departures refreshed later still compare equal."""
+        now = dt_util.utcnow()
+        departure = scheduled_departure(minutes=20)
+
+        earlier = UpcomingDeparture.build(departure, "123", now)
+        later = UpcomingDeparture.build(departure, "123", now + timedelta(seconds=61))
+
+        assert (earlier.due, later.due) == (20, 19)
+        assert DepartureSnapshot((earlier,)) == DepartureSnapshot((later,))
+
+    @pytest.mark.asyncio
+    async def test_refresh_a_minute_later_is_not_passed_on(self, hass: HomeAssistant, mock_config_entry_legacy, freezer):
+        """Test a refresh with the same departures a minute later skips listeners."""
+        hass.loop.time.return_value = 0
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        listener = Mock()
+        coordinator.async_add_listener(listener)
+        departure = scheduled_departure(minutes=20)
+
+        async def fetch_result(*args):
+            now = dt_util.utcnow()
+            return DepartureSnapshot((UpcomingDeparture.build(departure, "123", now),))
+
+        with patch.object(coordinator, "_async_fetch_result", side_effect=fetch_result):
+            await coordinator.async_refresh()
+            freezer.tick(timedelta(seconds=60))
+            await coordinator.async_refresh()
+
+        assert coordinator.data.next.due == 19
+        assert listener.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_unchanged_refresh_is_not_passed_on(self, hass: HomeAssistant, mock_config_entry_legacy):
+        """Test listeners are skipped while stats listeners hear every update."""
+        hass.loop.time.return_value = 0
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_legacy, None)
+        listener = Mock()
+        stats_listener = Mock()
+        coordinator.async_add_listener(listener)
+        remove_stats_listener = coordinator.async_add_stats_listener(stats_listener)
+        now = dt_util.utcnow()
+        departure = scheduled_departure()
+
+        def snapshot(departure):
+            return DepartureSnapshot((UpcomingDeparture.build(departure, "123", now),))
+
+        with patch.object(
+            coordinator,
+            "_async_fetch_result",
+            side_effect=[
+                snapshot(departure),
+                snapshot(departure),
+                snapshot(replace(departure, delay=3)),
+                snapshot(replace(departure, delay=3)),
+            ],
+        ):
+            await coordinator.async_refresh()
+            await coordinator.async_refresh()
+            assert listener.call_count == 1
+            assert stats_listener.call_count == 2
+
+            await coordinator.async_refresh()
+            assert listener.call_count == 2
+
+            remove_stats_listener()
+            await coordinator.async_refresh()
+
+        assert listener.call_count == 2
+        assert stats_listener.call_count == 3
+
+
+class TestJourneyCoordinator:
+    """Test TransportNSWJourneyCoordinator."""
+
+    @pytest.fixture
+    def journey_entry(self):
+        """Return an entry with two journey subentries between the same stops."""
+        entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        entry.subentries = {
+            f"journey{index}": ConfigSubentry(
+                data={CONF_ORIGIN_ID: "200060", CONF_DESTINATION_ID: "2000338"},
+                subentry_id=f"journey{index}",
+                subentry_type=SUBENTRY_TYPE_JOURNEY,
+                title=f"Journey {index}",
+                unique_id=f"journey{index}",
+            )
+            for index in range(2)
+        }
+        return entry
+
+    @pytest.mark.asyncio
+    async def test_upcoming_journeys(self, hass: HomeAssistant, journey_entry, mock_transport_nsw_api):
+        """Test journeys that have left are dropped and the rest are capped."""
+        mock_transport_nsw_api.async_get_trip.return_value = make_trip_response(
+            *(make_journey([("T1", 1, minutes, 20)]) for minutes in (-3, 2, 6, 10, 14))
+        )
+        subentry = journey_entry.subentries["journey0"]
+        coordinator = TransportNSWJourneyCoordinator(hass, journey_entry, subentry)
+
+        data = await coordinator._async_update_data()
+
+        assert len(data.journeys) == JOURNEY_COUNT
+        assert data.next.departure_time > dt_util.utcnow()
+        assert coordinator.stats.successes == 1
+
+    @pytest.mark.asyncio
+    async def test_identical_journeys_share_request(self, hass: HomeAssistant, journey_entry, mock_transport_nsw_api):
+        """Test journeys between the same stops cost one request per bucket."""
+        mock_transport_nsw_api.async_get_trip.return_value = make_trip_response(make_journey())
+        first, second = (
+            TransportNSWJourneyCoordinator(hass, journey_entry, subentry)
+            for subentry in journey_entry.subentries.values()
+        )
+
+        assert await first._async_update_data() == await second._async_update_data()
+        mock_transport_nsw_api.async_get_trip.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_update(self, hass: HomeAssistant, journey_entry, mock_transport_nsw_api):
+        """Test a failed trip request fails the update."""
+        mock_transport_nsw_api.async_get_trip.side_effect = TransportNSWConnectionError("timeout")
+        subentry = journey_entry.subentries["journey0"]
+        coordinator = TransportNSWJourneyCoordinator(hass, journey_entry, subentry)
+
+        with pytest.raises(UpdateFailed):
+            await coordinator._async_update_data()
+
+        assert coordinator.stats.failures == 1
@@ -0,0 +1,125 @@
+"""Test the Transport NSW departure monitor helpers."""
+
+from datetime import timedelta
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.transport_nsw.departures import (
+    DepartureFilter,
+    minutes_until,
+    parse_stop_events,
+)
+
+from .conftest import make_stop_event
+
+
+class TestParseStopEvents:
+    """Test parse_stop_events."""
+
+    def test_parse_realtime_event(self):
+        """Test a real-time event is normalised."""
+        departures = parse_stop_events(
+            {"stopEvents": [make_stop_event("T1", "Hornsby", 1, minutes=5, delay=3)]}
+        )
+
+        assert len(departures) == 1
+        departure = departures[0]
+        assert departure.route == "T1"
+        assert departure.destination == "Hornsby"
+        assert departure.mode == "Train"
+        assert departure.real_time == "y"
+        assert departure.delay == 3
+
+    def test_parse_scheduled_event(self):
+        """Test an event without real-time data uses the planned time."""
+        departures = parse_stop_events(
+            {"stopEvents": [make_stop_event("380", "Bondi", 5, real_time=False)]}
+        )
+
+        assert departures[0].real_time == "n"
+        assert departures[0].delay == 0
+        assert departures[0].mode == "Bus"
+
+    def test_parse_unknown_mode(self):
+        """Test an unknown product class has no mode."""
+        departures = parse_stop_events({"stopEvents": [make_stop_event(product_class=99)]})
+        assert departures[0].mode is None
+
+    def test_parse_missing_details(self):
+        """Test an event without a destination or product is still a departure."""
+        event = make_stop_event()
+        event["transportation"]["destination"] = None
+        del event["transportation"]["product"]
+
+        (departure,) = parse_stop_events({"stopEvents": [event]})
+
+        assert departure.destination is None
+        assert departure.mode is None
+
+    def test_parse_skips_invalid_events(self):
+        """Test malformed events are skipped."""
+        departures = parse_stop_events(
+            {"stopEvents": [{"transportation": {}}, make_stop_event()]}
+        )
+        assert len(departures) == 1
+
+    def test_parse_without_stop_events(self):
+        """Test a response without stop events."""
+        assert parse_stop_events({}) == []
+
+
+class TestDepartureFilter:
+    """Test DepartureFilter."""
+
+    departures = parse_stop_events(
+        {
+            "stopEvents": [
+                make_stop_event("T1", "Hornsby"),
+                make_stop_event("T1", "Berowra"),
+                make_stop_event("T9", "Hornsby"),
+                make_stop_event("M20", "Gore Hill"),
+            ]
+        }
+    )
+
+    def matching(self, route, destination):
+        """Return the route and destination of the departures a filter matches."""
+        departure_filter = DepartureFilter.compile(route, destination)
+        return [
+            (departure.route, departure.destination)
+            for departure in self.departures
+            if departure_filter.matches(departure)
+        ]
+
+    def test_filter(self):
+        """Test route and destination filters are combined."""
+        assert len(self.matching("", "")) == 4
+        assert len(self.matching("T1", "")) == 2
+        assert len(self.matching("", "Hornsby")) == 2
+        assert self.matching("T1", "Hornsby") == [("T1", "Hornsby")]
+
+    def test_alternatives(self):
+        """Test filters accept comma separated alternatives in any case."""
+        assert self.matching("t1, T9", "hornsby") == [("T1", "Hornsby"), ("T9", "Hornsby")]
+        assert self.matching("", "Berowra,GORE HILL") == [("T1", "Berowra"), ("M20", "Gore Hill")]
+
+    def test_whole_names(self):
+        """Test alternatives must match a whole route or destination."""
+        assert self.matching("T", "") == []
+        assert self.matching("", "Gore") == []
+
+    def test_compiled_once(self):
+        """Test the filter is compiled to case-folded sets."""
+        assert DepartureFilter.compile(" T1 ,t9,", "") == DepartureFilter(frozenset({"t1", "t9"}))
+
+
+class TestMinutesUntil:
+    """Test minutes_until."""
+
+    def test_rounds_to_whole_minutes(self):
+        """Test minutes_until rounds to whole minutes."""
+        now = dt_util.utcnow()
+        assert minutes_until(now + timedelta(minutes=4, seconds=50), now) == 5
+        assert minutes_until(now + timedelta(seconds=20), now) == 0
+        departure = parse_stop_events({"stopEvents": [make_stop_event(minutes=7)]})[0]
+        assert minutes_until(departure.departure_time, now) == 7
@@ -0,0 +1,112 @@
+"""Test the Transport NSW diagnostics."""
+
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from homeassistant.config_entries import ConfigSubentry
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant
+
+from custom_components.transport_nsw.api import TransportNSWConnectionError
+from custom_components.transport_nsw.const import (
+    CONF_DESTINATION_ID,
+    CONF_ORIGIN_ID,
+    SUBENTRY_TYPE_JOURNEY,
+)
+from custom_components.transport_nsw.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from custom_components.transport_nsw.hub import get_hub
+from custom_components.transport_nsw.sensor import (
+    JourneySensors,
+    StopSensors,
+    async_setup_entry,
+)
+
+
+class TestConfigEntryDiagnostics:
+    """Test async_get_config_entry_diagnostics."""
+
+    @pytest.mark.asyncio
+    async def test_without_hub(self, hass: HomeAssistant, mock_config_entry_with_subentries):
+        """Test an entry that isn't set up only has the redacted entry."""
+        diagnostics = await async_get_config_entry_diagnostics(hass, mock_config_entry_with_subentries)
+
+        assert diagnostics["entry"]["data"][CONF_API_KEY] == "**REDACTED**"
+        assert "stops" not in diagnostics
+
+    @pytest.mark.asyncio
+    async def test_stops_and_responses(
+        self, hass: HomeAssistant, fake_api, fake_api_client, mock_config_entry_with_subentries
+    ):
+        """Test every stop's state and timings and the raw responses are included."""
+        hub = get_hub(hass, mock_config_entry_with_subentries)
+        hub._client = fake_api_client
+        hub.stops = {
+            subentry_id: StopSensors.create(hass, mock_config_entry_with_subentries, subentry)
+            for subentry_id, subentry in mock_config_entry_with_subentries.subentries.items()
+        }
+        for stop in hub.stops.values():
+            await stop.coordinator.async_refresh()
+
+        diagnostics = await async_get_config_entry_diagnostics(hass, mock_config_entry_with_subentries)
+
+        (subentry_id,) = mock_config_entry_with_subentries.subentries
+        stop = diagnostics["stops"][subentry_id]
+        assert stop["last_update_success"] is True
+        assert stop["stats"]["successes"] == 1
+        assert set(stop["recent_fetches"][0]["phases"]) == {"queue", "request", "parse"}
+        assert diagnostics["api_key"]["requests_today"] == 1
+        (response,) = diagnostics["recent_responses"]
+        assert response["request"] == f"departure_mon {stop['stop_id']}"
+        assert len(response["response"]["stopEvents"]) == fake_api.events_per_stop
+        assert "test_api_key" not in repr(diagnostics)
+
+    @pytest.mark.asyncio
+    async def test_journeys(
+        self, hass: HomeAssistant, fake_api, fake_api_client, mock_config_entry_with_subentries
+    ):
+        """Test every journey's state and upcoming journeys are included."""
+        subentry = ConfigSubentry(
+            data={CONF_ORIGIN_ID: "200060", CONF_DESTINATION_ID: "2000338"},
+            subentry_id="journey1",
+            subentry_type=SUBENTRY_TYPE_JOURNEY,
+            title="Central → Circular Quay",
+            unique_id="journey1",
+        )
+        hub = get_hub(hass, mock_config_entry_with_subentries)
+        hub._client = fake_api_client
+        hub.journeys = {
+            "journey1": JourneySensors.create(hass, mock_config_entry_with_subentries, subentry)
+        }
+        await hub.journeys["journey1"].coordinator.async_refresh()
+
+        diagnostics = await async_get_config_entry_diagnostics(hass, mock_config_entry_with_subentries)
+
+        journey = diagnostics["journeys"]["journey1"]
+        assert journey["origin_id"] == "200060"
+        assert journey["last_update_success"] is True
+        assert journey["journeys"][0]["routes"] == ["T1", "333"]
+        (response,) = diagnostics["recent_responses"]
+        assert response["request"] == "trip 200060 2000338"
+
+    @pytest.mark.asyncio
+    async def test_failed_update(
+        self, hass: HomeAssistant, mock_config_entry_legacy, mock_transport_nsw_api
+    ):
+        """Test a legacy entry's failing stop is included with its error."""
+        mock_transport_nsw_api.async_get_departure_monitor.side_effect = TransportNSWConnectionError("timeout")
+        with patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_config_entry_first_refresh",
+            new_callable=AsyncMock,
+        ):
+            await async_setup_entry(hass, mock_config_entry_legacy, Mock())
+        await get_hub(hass, mock_config_entry_legacy).stops[mock_config_entry_legacy.entry_id].coordinator.async_refresh()
+
+        diagnostics = await async_get_config_entry_diagnostics(hass, mock_config_entry_legacy)
+
+        stop = diagnostics["stops"][mock_config_entry_legacy.entry_id]
+        assert stop["last_update_success"] is False
+        assert "timeout" in stop["last_exception"]
+        assert diagnostics["recent_responses"][0]["error"] == "timeout"
+
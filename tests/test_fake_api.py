@@ -0,0 +1,196 @@
+"""Test the Transport NSW integration against the fake API server."""
+
+import asyncio
+import random
+from unittest.mock import patch
+
+import pytest
+from homeassistant.config_entries import ConfigSubentry
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from custom_components.transport_nsw.api import (
+    TransportNSWAuthError,
+    TransportNSWConnectionError,
+    TransportNSWRateLimitError,
+    TransportNSWResponseError,
+)
+from custom_components.transport_nsw.const import (
+    CONF_MAX_RESULTS,
+    CONF_ROUTE,
+    CONF_STOP_ID,
+    DOMAIN,
+    SUBENTRY_TYPE_STOP,
+)
+from custom_components.transport_nsw.coordinator import TransportNSWCoordinator
+from custom_components.transport_nsw.departures import DepartureQuery
+from custom_components.transport_nsw.hub import get_hub
+from custom_components.transport_nsw.journeys import JourneyQuery, parse_journeys
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .fake_api import constant_latency, lognormal_latency, uniform_latency
+
+
+class TestFakeApi:
+    """Test the API client against the fake API server."""
+
+    @pytest.mark.asyncio
+    async def test_departure_monitor(self, fake_api, fake_api_client):
+        """Test departures are generated for every request."""
+        fake_api.events_per_stop = 500
+
+        response = await fake_api_client.async_get_departure_monitor("200060")
+
+        assert len(response["stopEvents"]) == 500
+        assert fake_api.stats.requests["departure_mon"] == 1
+        assert fake_api.stats.statuses[200] == 1
+
+    @pytest.mark.asyncio
+    async def test_departure_monitor_narrowed(self, fake_api_client):
+        """Test departures are narrowed like the API narrows them."""
+        capped = await fake_api_client.async_get_departure_monitor(
+            "200060", None, DepartureQuery(max_results=3)
+        )
+        no_trains = await fake_api_client.async_get_departure_monitor(
+            "200060", None, DepartureQuery(excluded_modes=frozenset({"Train"}))
+        )
+
+        assert len(capped["stopEvents"]) == 3
+        assert no_trains["stopEvents"] == []
+
+    @pytest.mark.asyncio
+    async def test_trip(self, fake_api, fake_api_client):
+        """Test journeys are generated for every trip request."""
+        response = await fake_api_client.async_get_trip(
+            JourneyQuery("200060", "2000338"), dt_util.utcnow()
+        )
+
+        journeys = parse_journeys(response)
+        assert len(journeys) == 6
+        assert [journey.changes for journey in journeys[:2]] == [1, 0]
+        assert fake_api.stats.requests["trip"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stop_finder(self, fake_api_client):
+        """Test the stop finder finds the requested stop."""
+        response = await fake_api_client.async_get_stop_finder("200060")
+
+        assert response["locations"][0]["id"] == "200060"
+
+    @pytest.mark.asyncio
+    async def test_unknown_api_key(self, fake_api, fake_api_client):
+        """Test unknown API keys are rejected."""
+        fake_api.api_keys = {"another_key"}
+
+        with pytest.raises(TransportNSWAuthError):
+            await fake_api_client.async_get_departure_monitor("200060")
+
+    @pytest.mark.asyncio
+    async def test_rate_limit(self, fake_api, fake_api_client):
+        """Test requests over the rate limit get a 429 response."""
+        fake_api.rate_limit = (0.001, 2)
+
+        await fake_api_client.async_get_departure_monitor("200060")
+        await fake_api_client.async_get_departure_monitor("200060")
+        with pytest.raises(TransportNSWResponseError) as exc_info:
+            await fake_api_client.async_get_departure_monitor("200060")
+
+        assert isinstance(exc_info.value, TransportNSWRateLimitError)
+        assert exc_info.value.retry_after >= 1
+        assert fake_api.stats.statuses == {200: 2, 429: 1}
+
+    @pytest.mark.asyncio
+    async def test_injected_errors(self, fake_api, fake_api_client):
+        """Test error_rate of requests fail with error_status."""
+        fake_api.error_rate = 1.0
+        fake_api.error_status = 503
+
+        with pytest.raises(TransportNSWResponseError) as exc_info:
+            await fake_api_client.async_get_departure_monitor("200060")
+
+        assert exc_info.value.status == 503
+
+    @pytest.mark.asyncio
+    async def test_injected_timeouts(self, fake_api, fake_api_client):
+        """Test timeout_rate of requests time out in the client."""
+        fake_api.timeout_rate = 1.0
+
+        with (
+            patch("custom_components.transport_nsw.api.REQUEST_TIMEOUT", 0.05),
+            pytest.raises(TransportNSWConnectionError),
+        ):
+            await fake_api_client.async_get_departure_monitor("200060")
+
+    @pytest.mark.asyncio
+    async def test_latency(self, fake_api, fake_api_client):
+        """Test concurrent requests are held for the latency."""
+        fake_api.latency = constant_latency(0.05)
+
+        await asyncio.gather(
+            *(fake_api_client.async_get_departure_monitor(f"{stop}") for stop in range(5))
+        )
+
+        assert fake_api.stats.peak_in_flight == 5
+        assert fake_api.stats.in_flight == 0
+
+    def test_latency_distributions(self):
+        """Test the latency distributions stay in their expected ranges."""
+        rng = random.Random(0)
+
+        assert all(0.1 <= uniform_latency(0.1, 0.2)(rng) <= 0.2 for _ in range(100))
+        assert all(lognormal_latency(0.2)(rng) > 0 for _ in range(100))
+
+
+class TestFakeApiCoordinator:
+    """Test coordinators end to end against the fake API server."""
+
+    @pytest.mark.asyncio
+    async def test_update(
+        self, hass: HomeAssistant, fake_api, fake_api_client, mock_config_entry_with_subentries
+    ):
+        """Test a coordinator update fetches and parses departures over HTTP."""
+        get_hub(hass, mock_config_entry_with_subentries)._client = fake_api_client
+        subentry = next(iter(mock_config_entry_with_subentries.subentries.values()))
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_with_subentries, subentry)
+
+        data = await coordinator._async_update_data()
+
+        assert data.departures
+        assert fake_api.stats.requests["departure_mon"] == 1
+
+    @pytest.mark.asyncio
+    async def test_update_failed(
+        self, hass: HomeAssistant, fake_api, fake_api_client, mock_config_entry_with_subentries
+    ):
+        """Test a failing API fails the update."""
+        fake_api.error_rate = 1.0
+        get_hub(hass, mock_config_entry_with_subentries)._client = fake_api_client
+        subentry = next(iter(mock_config_entry_with_subentries.subentries.values()))
+        coordinator = TransportNSWCoordinator(hass, mock_config_entry_with_subentries, subentry)
+
+        with pytest.raises(UpdateFailed):
+            await coordinator._async_update_data()
+
+    @pytest.mark.asyncio
+    async def test_route_beyond_cap(self, hass: HomeAssistant, fake_api, fake_api_client):
+        """Test a filtered route is found even when other routes fill the cap."""
+        entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        subentry = ConfigSubentry(
+            # T9 only leaves third, after a T1 and a T2
+            data={CONF_STOP_ID: "200060", CONF_ROUTE: "T9", CONF_MAX_RESULTS: 2},
+            subentry_id="subentry_1",
+            subentry_type=SUBENTRY_TYPE_STOP,
+            title="Central Station",
+            unique_id="unique_1",
+        )
+        entry.subentries = {"subentry_1": subentry}
+        get_hub(hass, entry)._client = fake_api_client
+        coordinator = TransportNSWCoordinator(hass, entry, subentry)
+
+        data = await coordinator._async_update_data()
+
+        assert data.next is not None
+        assert data.next.departure.route == "T9"
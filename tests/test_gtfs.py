@@ -0,0 +1,167 @@
+"""Test the Transport NSW GTFS static data."""
+
+import io
+import os
+import time
+from unittest.mock import AsyncMock, Mock, patch
+import zipfile
+
+import pytest
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant
+
+from custom_components.transport_nsw.api import TransportNSWConnectionError
+from custom_components.transport_nsw.const import CONF_GTFS_STATIC, DOMAIN
+from custom_components.transport_nsw.gtfs import (
+    DATA_STOP_INDEX,
+    GTFS_BUNDLE_FILE,
+    GTFS_MAX_AGE,
+    STOP_INDEX_FILE,
+    TIMETABLE_FILE,
+    async_get_stop_index,
+    async_get_timetable,
+    async_schedule_gtfs_updates,
+    async_update_gtfs,
+    gtfs_path,
+)
+from custom_components.transport_nsw.hub import get_hub
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+
+def make_bundle(stops: str) -> bytes:
+    """Return a GTFS zip bundle with the given stops.txt."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as bundle:
+        bundle.writestr("stops.txt", stops)
+    return buffer.getvalue()
+
+
+BUNDLE = make_bundle("stop_id,stop_name\n200060,Central Station\n2000421,Town Hall Station\n")
+
+
+@pytest.fixture
+def gtfs_hass(hass: HomeAssistant, tmp_path):
+    """Return hass with a config directory and a working executor."""
+    hass.config.path = lambda *parts: os.path.join(tmp_path, *parts)
+    hass.async_add_executor_job = AsyncMock(side_effect=lambda target, *args: target(*args))
+    return hass
+
+
+@pytest.fixture
+def hub(gtfs_hass, mock_transport_nsw_api):
+    """Return a hub whose client downloads BUNDLE."""
+
+    async def _download(write):
+        for start in range(0, len(BUNDLE), 100):
+            await write(BUNDLE[start : start + 100])
+
+    mock_transport_nsw_api.async_download_gtfs_schedule = AsyncMock(side_effect=_download)
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+    return get_hub(gtfs_hass, entry)
+
+
+class TestUpdateGtfs:
+    """Test async_update_gtfs."""
+
+    @pytest.mark.asyncio
+    async def test_download_and_index(self, gtfs_hass, hub, mock_transport_nsw_api):
+        """Test the bundle is downloaded and the stop index built from it."""
+        assert await async_get_stop_index(gtfs_hass) is None
+
+        await async_update_gtfs(gtfs_hass, hub)
+
+        assert gtfs_path(gtfs_hass, GTFS_BUNDLE_FILE).read_bytes() == BUNDLE
+        index = await async_get_stop_index(gtfs_hass)
+        assert index.get("2000421") == "Town Hall Station"
+        assert await async_get_timetable(gtfs_hass) is not None
+        assert hub.scheduler.requests_today == 1
+        mock_transport_nsw_api.async_download_gtfs_schedule.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_recent_bundle_is_kept(self, gtfs_hass, hub, mock_transport_nsw_api):
+        """Test a recent bundle is not downloaded again."""
+        await async_update_gtfs(gtfs_hass, hub)
+        await async_update_gtfs(gtfs_hass, hub)
+
+        mock_transport_nsw_api.async_download_gtfs_schedule.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_missing_index_is_rebuilt(self, gtfs_hass, hub, mock_transport_nsw_api):
+        """Test the index is rebuilt from a recent bundle without a download."""
+        bundle = gtfs_path(gtfs_hass, GTFS_BUNDLE_FILE)
+        bundle.parent.mkdir(parents=True)
+        bundle.write_bytes(BUNDLE)
+
+        await async_update_gtfs(gtfs_hass, hub)
+
+        assert gtfs_path(gtfs_hass, STOP_INDEX_FILE).exists()
+        assert gtfs_path(gtfs_hass, TIMETABLE_FILE).exists()
+        mock_transport_nsw_api.async_download_gtfs_schedule.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_outdated_bundle_is_downloaded(self, gtfs_hass, hub, mock_transport_nsw_api):
+        """Test a bundle older than a week is downloaded again."""
+        await async_update_gtfs(gtfs_hass, hub)
+        bundle = gtfs_path(gtfs_hass, GTFS_BUNDLE_FILE)
+        old = time.time() - GTFS_MAX_AGE.total_seconds() - 60
+        os.utime(bundle, (old, old))
+
+        await async_update_gtfs(gtfs_hass, hub)
+
+        assert mock_transport_nsw_api.async_download_gtfs_schedule.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_download(self, gtfs_hass, hub, mock_transport_nsw_api):
+        """Test a failed download leaves no partial files behind."""
+        mock_transport_nsw_api.async_download_gtfs_schedule.side_effect = TransportNSWConnectionError("timeout")
+
+        await async_update_gtfs(gtfs_hass, hub)
+
+        directory = gtfs_path(gtfs_hass, GTFS_BUNDLE_FILE).parent
+        assert list(directory.iterdir()) == []
+        assert DATA_STOP_INDEX not in gtfs_hass.data
+
+    @pytest.mark.asyncio
+    async def test_missing_index_is_remembered(self, gtfs_hass, hub):
+        """Test a missing index isn't looked for again until it is built."""
+        assert await async_get_timetable(gtfs_hass) is None
+        assert await async_get_timetable(gtfs_hass) is None
+        assert gtfs_hass.async_add_executor_job.await_count == 1
+
+        await async_update_gtfs(gtfs_hass, hub)
+
+        assert await async_get_timetable(gtfs_hass) is not None
+
+    @pytest.mark.asyncio
+    async def test_invalid_bundle(self, gtfs_hass, hub):
+        """Test a bundle without stops.txt is not indexed."""
+        bundle = gtfs_path(gtfs_hass, GTFS_BUNDLE_FILE)
+        bundle.parent.mkdir(parents=True)
+        bundle.write_bytes(make_bundle("").replace(b"stops.txt", b"trips.txt"))
+
+        await async_update_gtfs(gtfs_hass, hub)
+
+        assert await async_get_stop_index(gtfs_hass) is None
+        assert await async_get_timetable(gtfs_hass) is None
+
+
+class TestScheduleGtfsUpdates:
+    """Test async_schedule_gtfs_updates."""
+
+    def test_schedule_gtfs_updates(self, hass: HomeAssistant):
+        """Test updates are started right away and then checked daily."""
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key"},
+            options={CONF_GTFS_STATIC: True},
+        )
+        hub = Mock()
+
+        with patch.object(entry, "async_create_background_task") as mock_create_task, \
+             patch("custom_components.transport_nsw.gtfs.async_track_time_interval") as mock_track, \
+             patch("custom_components.transport_nsw.gtfs.async_update_gtfs", new=Mock()) as mock_update:
+            async_schedule_gtfs_updates(hass, entry, hub)
+
+        mock_create_task.assert_called_once()
+        mock_update.assert_called_once_with(hass, hub)
+        mock_track.assert_called_once()
@@ -0,0 +1,499 @@
+"""Test the Transport NSW hub."""
+
+import asyncio
+from datetime import timedelta
+from unittest.mock import ANY, AsyncMock
+
+import pytest
+from homeassistant.config_entries import ConfigSubentry
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.transport_nsw.api import TransportNSWConnectionError
+from custom_components.transport_nsw.const import (
+    CONF_DEPARTURE_OFFSET,
+    CONF_DESTINATION_ID,
+    CONF_EXCLUDED_MODES,
+    CONF_MAX_RESULTS,
+    CONF_ORIGIN_ID,
+    CONF_REALTIME_FEEDS,
+    CONF_STOP_ID,
+    CONF_VIA_ID,
+    DOMAIN,
+    SUBENTRY_TYPE_JOURNEY,
+    SUBENTRY_TYPE_STOP,
+)
+from custom_components.transport_nsw.departures import DepartureQuery
+from custom_components.transport_nsw.journeys import JourneyQuery
+from custom_components.transport_nsw.hub import (
+    JOURNEY_TIME_BUCKET,
+    SNAPSHOT_SAVE_DELAY,
+    TransportNSWHub,
+    get_hub,
+)
+from custom_components.transport_nsw.realtime import FileFeedSource
+from custom_components.transport_nsw.scheduler import (
+    BREAKER_THRESHOLD,
+    CIRCUIT_CLOSED,
+    CircuitOpenError,
+    QuotaExceededError,
+)
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .conftest import (
+    make_feed,
+    make_journey,
+    make_trip_response,
+    make_trip_update,
+)
+
+
+@pytest.fixture
+def config_entry():
+    """Return a config entry for the hub."""
+    return MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+
+
+class TestGetHub:
+    """Test get_hub."""
+
+    def test_get_hub_creates_once(self, hass: HomeAssistant, config_entry):
+        """Test the hub is created on first use and then reused."""
+        hub = get_hub(hass, config_entry)
+
+        assert isinstance(hub, TransportNSWHub)
+        assert hass.data[DOMAIN][config_entry.entry_id] is hub
+        assert get_hub(hass, config_entry) is hub
+
+
+class TestTransportNSWHub:
+    """Test TransportNSWHub."""
+
+    @pytest.mark.asyncio
+    async def test_departures_are_cached(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, mock_api_response):
+        """Test a stop is fetched once while its departures are fresh."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        hub = get_hub(hass, config_entry)
+
+        first = await hub.async_get_departures("123")
+        second = await hub.async_get_departures("123")
+
+        assert first is second
+        assert len(first) == 3
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once_with("123", ANY, DepartureQuery())
+
+    @pytest.mark.asyncio
+    async def test_failing_api_opens_circuit(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api):
+        """Test the hub stops sending requests for any stop while the API is failing."""
+        mock_transport_nsw_api.async_get_departure_monitor.side_effect = TransportNSWConnectionError("timeout")
+        hub = get_hub(hass, config_entry)
+
+        for _ in range(BREAKER_THRESHOLD):
+            with pytest.raises(TransportNSWConnectionError):
+                await hub.async_get_departures("123")
+        with pytest.raises(CircuitOpenError):
+            await hub.async_get_departures("456")
+
+        assert mock_transport_nsw_api.async_get_departure_monitor.await_count == BREAKER_THRESHOLD
+        assert hub.scheduler.requests_today == BREAKER_THRESHOLD
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("queued", [True, False])
+    async def test_cancelled_trial_frees_circuit(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, mock_api_response, queued):
+        """Test a half-open trial cancelled while queued or in flight lets the next one through."""
+        hub = get_hub(hass, config_entry)
+        for _ in range(BREAKER_THRESHOLD):
+            hub.breaker.record_failure(TransportNSWConnectionError("timeout"))
+        hub.breaker._open_until = 0
+        started = asyncio.Event()
+
+        async def _hang(*args):
+            started.set()
+            await asyncio.Event().wait()
+
+        if queued:
+            hub.scheduler.async_acquire = AsyncMock(side_effect=_hang)
+        else:
+            mock_transport_nsw_api.async_get_departure_monitor.side_effect = _hang
+        trial = asyncio.create_task(hub.async_get_departures("123"))
+        await started.wait()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        hub.scheduler.async_acquire = AsyncMock()
+        mock_transport_nsw_api.async_get_departure_monitor.side_effect = None
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        assert len(await hub.async_get_departures("456")) == 3
+        assert hub.breaker.state == CIRCUIT_CLOSED
+
+    @pytest.mark.asyncio
+    async def test_stale_departures_are_refetched(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, mock_api_response):
+        """Test departures older than max_age are fetched again."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        hub = get_hub(hass, config_entry)
+
+        await hub.async_get_departures("123")
+        await hub.async_get_departures("123", max_age=timedelta(0))
+
+        assert mock_transport_nsw_api.async_get_departure_monitor.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stops_are_fetched_separately(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, mock_api_response):
+        """Test each stop gets its own request."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        hub = get_hub(hass, config_entry)
+
+        await hub.async_get_departures("123")
+        await hub.async_get_departures("456")
+
+        assert mock_transport_nsw_api.async_get_departure_monitor.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_are_coalesced(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, mock_api_response):
+        """Test concurrent callers for the same stop share the request in flight."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        hub = get_hub(hass, config_entry)
+
+        results = await asyncio.gather(
+            *(hub.async_get_departures("123") for _ in range(5))
+        )
+
+        assert all(result is results[0] for result in results)
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_none_response_is_not_cached(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, mock_api_response):
+        """Test an empty response is retried on the next call."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = None
+        hub = get_hub(hass, config_entry)
+
+        assert await hub.async_get_departures("123") is None
+
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        assert len(await hub.async_get_departures("123")) == 3
+
+    @pytest.mark.asyncio
+    async def test_requests_go_through_scheduler(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, mock_api_response):
+        """Test the hub stops sending requests once the daily budget is used up."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        hub = get_hub(hass, config_entry)
+        hub.scheduler.daily_budget = 1
+
+        await hub.async_get_departures("123")
+        with pytest.raises(QuotaExceededError):
+            await hub.async_get_departures("456")
+
+        assert hub.scheduler.requests_today == 1
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once_with("123", ANY, DepartureQuery())
+
+
+class TestDepartureQuery:
+    """Test departure requests are narrowed by the stops watching them."""
+
+    @staticmethod
+    def stop_entry(*subentry_data):
+        """Return an entry with a stop subentry for each data dict."""
+        entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        entry.subentries = {
+            f"sub{index}": ConfigSubentry(
+                data={CONF_STOP_ID: "123", **data},
+                subentry_id=f"sub{index}",
+                subentry_type=SUBENTRY_TYPE_STOP,
+                title=f"Stop {index}",
+                unique_id=f"sub{index}",
+            )
+            for index, data in enumerate(subentry_data)
+        }
+        return entry
+
+    @pytest.mark.asyncio
+    async def test_query_covers_every_subentry(self, hass: HomeAssistant, mock_transport_nsw_api, mock_api_response):
+        """Test a stop's request is narrowed only as far as all its subentries allow."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        entry = self.stop_entry(
+            {CONF_MAX_RESULTS: 5, CONF_EXCLUDED_MODES: ["Bus", "Ferry"], CONF_DEPARTURE_OFFSET: 10},
+            {CONF_MAX_RESULTS: 8, CONF_EXCLUDED_MODES: ["Ferry"], CONF_DEPARTURE_OFFSET: 5},
+        )
+
+        await get_hub(hass, entry).async_get_departures("123")
+
+        mock_transport_nsw_api.async_get_departure_monitor.assert_awaited_once_with(
+            "123", ANY, DepartureQuery(8, frozenset({"Ferry"}), timedelta(minutes=5))
+        )
+
+    @pytest.mark.asyncio
+    async def test_uncapped_subentry(self, hass: HomeAssistant, mock_transport_nsw_api, mock_api_response):
+        """Test one subentry without a cap leaves the request uncapped."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        entry = self.stop_entry({CONF_MAX_RESULTS: 5}, {})
+
+        await get_hub(hass, entry).async_get_departures("123")
+
+        assert mock_transport_nsw_api.async_get_departure_monitor.await_args.args[2] == DepartureQuery()
+
+    @pytest.mark.asyncio
+    async def test_changed_query_is_refetched(self, hass: HomeAssistant, mock_transport_nsw_api, mock_api_response):
+        """Test cached departures aren't reused once the stop's query changes."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        entry = self.stop_entry({CONF_EXCLUDED_MODES: ["Bus"]})
+        hub = get_hub(hass, entry)
+        await hub.async_get_departures("123")
+
+        hub.config_entry = self.stop_entry({})
+        await hub.async_get_departures("123")
+
+        assert mock_transport_nsw_api.async_get_departure_monitor.await_count == 2
+
+
+class TestJourneys:
+    """Test journeys are shared per query and time bucket."""
+
+    @pytest.mark.asyncio
+    async def test_same_bucket_is_fetched_once(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, freezer):
+        """Test identical queries within a bucket cost a single request."""
+        freezer.move_to("2026-03-02 08:01:00+00:00")
+        mock_transport_nsw_api.async_get_trip.return_value = make_trip_response(make_journey())
+        hub = get_hub(hass, config_entry)
+        query = JourneyQuery("200060", "2000338")
+
+        first, second = await asyncio.gather(
+            hub.async_get_journeys(query), hub.async_get_journeys(JourneyQuery("200060", "2000338"))
+        )
+        freezer.tick(timedelta(minutes=3))
+        third = await hub.async_get_journeys(query)
+
+        assert first is second is third
+        assert len(first) == 1
+        mock_transport_nsw_api.async_get_trip.assert_awaited_once_with(
+            query, dt_util.parse_datetime("2026-03-02 08:00:00+00:00"), ANY
+        )
+
+    @pytest.mark.asyncio
+    async def test_next_bucket_is_refetched(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, freezer):
+        """Test journeys are planned again once their bucket ends."""
+        freezer.move_to("2026-03-02 08:01:00+00:00")
+        mock_transport_nsw_api.async_get_trip.return_value = make_trip_response(make_journey())
+        hub = get_hub(hass, config_entry)
+        query = JourneyQuery("200060", "2000338")
+
+        await hub.async_get_journeys(query)
+        freezer.tick(JOURNEY_TIME_BUCKET)
+        await hub.async_get_journeys(query)
+
+        assert mock_transport_nsw_api.async_get_trip.await_count == 2
+        assert mock_transport_nsw_api.async_get_trip.await_args.args[1] == dt_util.parse_datetime(
+            "2026-03-02 08:05:00+00:00"
+        )
+
+    @pytest.mark.asyncio
+    async def test_queries_are_fetched_separately(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api):
+        """Test journeys via another stop aren't shared."""
+        mock_transport_nsw_api.async_get_trip.return_value = make_trip_response(make_journey())
+        hub = get_hub(hass, config_entry)
+
+        await hub.async_get_journeys(JourneyQuery("200060", "2000338"))
+        await hub.async_get_journeys(JourneyQuery("200060", "2000338", "2000441"))
+
+        assert mock_transport_nsw_api.async_get_trip.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failure_is_not_cached(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api):
+        """Test a failed request is retried by the next caller."""
+        mock_transport_nsw_api.async_get_trip.side_effect = [
+            TransportNSWConnectionError("boom"),
+            make_trip_response(make_journey()),
+        ]
+        hub = get_hub(hass, config_entry)
+        query = JourneyQuery("200060", "2000338")
+
+        with pytest.raises(TransportNSWConnectionError):
+            await hub.async_get_journeys(query)
+        journeys = await hub.async_get_journeys(query)
+
+        assert len(journeys) == 1
+        assert hub.stats.failures == 1
+
+    @pytest.mark.asyncio
+    async def test_prune_forgets_unused_queries(self, hass: HomeAssistant, config_entry, mock_transport_nsw_api, freezer):
+        """Test journeys of queries no subentry asks for any more are dropped."""
+        freezer.move_to("2026-03-02 08:01:00+00:00")
+        mock_transport_nsw_api.async_get_trip.return_value = make_trip_response(make_journey())
+        config_entry.subentries = {
+            "journey1": ConfigSubentry(
+                data={CONF_ORIGIN_ID: "200060", CONF_DESTINATION_ID: "2000338", CONF_VIA_ID: ""},
+                subentry_id="journey1",
+                subentry_type=SUBENTRY_TYPE_JOURNEY,
+                title="Central → Circular Quay",
+                unique_id="unique_journey1",
+            )
+        }
+        hub = get_hub(hass, config_entry)
+        kept = JourneyQuery("200060", "2000338")
+        removed = JourneyQuery("200060", "2000338", "2000441")
+        await hub.async_get_journeys(kept)
+        await hub.async_get_journeys(removed)
+
+        hub.async_prune_journeys()
+        await hub.async_get_journeys(kept)
+        await hub.async_get_journeys(removed)
+
+        assert [call.args[0] for call in mock_transport_nsw_api.async_get_trip.await_args_list] == [
+            kept,
+            removed,
+            removed,
+        ]
+
+
+class TestSnapshots:
+    """Test the snapshots saved for restoring departures after a restart."""
+
+    @pytest.mark.asyncio
+    async def test_snapshots_load_once(self, hass: HomeAssistant, config_entry, mock_store):
+        """Test storage is read on first use only."""
+        mock_store.async_load.return_value = {"snapshots": {"sub1": {"fetched_at": "x"}}}
+        hub = get_hub(hass, config_entry)
+
+        assert await hub.async_get_snapshot("sub1") == {"fetched_at": "x"}
+        assert await hub.async_get_snapshot("sub2") is None
+        mock_store.async_load.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_save_is_delayed(self, hass: HomeAssistant, config_entry, mock_store):
+        """Test snapshots are batched into a delayed write."""
+        hub = get_hub(hass, config_entry)
+        await hub.async_get_snapshot("sub1")
+
+        hub.async_save_snapshot("sub1", {"fetched_at": "x"})
+        hub.async_save_snapshot("sub2", {"fetched_at": "y"})
+
+        assert mock_store.async_delay_save.call_count == 2
+        data_func, delay = mock_store.async_delay_save.call_args[0]
+        assert delay == SNAPSHOT_SAVE_DELAY
+        assert data_func()["snapshots"] == {
+            "sub1": {"fetched_at": "x"},
+            "sub2": {"fetched_at": "y"},
+        }
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_pending_snapshots(self, hass: HomeAssistant, config_entry, mock_store):
+        """Test flushing only writes when there is something to write."""
+        hub = get_hub(hass, config_entry)
+
+        await hub.async_flush_snapshots()
+        mock_store.async_save.assert_not_awaited()
+
+        hub.async_save_snapshot("sub1", {"fetched_at": "x"})
+        await hub.async_flush_snapshots()
+        await hub.async_flush_snapshots()
+
+        mock_store.async_save.assert_awaited_once()
+        assert mock_store.async_save.call_args[0][0]["snapshots"] == {
+            "sub1": {"fetched_at": "x"}
+        }
+
+    @pytest.mark.asyncio
+    async def test_remove_snapshot(self, hass: HomeAssistant, config_entry, mock_store):
+        """Test the snapshot of a removed stop is dropped from storage."""
+        mock_store.async_load.return_value = {"snapshots": {"sub1": {"fetched_at": "x"}}}
+        hub = get_hub(hass, config_entry)
+        await hub.async_get_snapshot("sub1")
+
+        hub.async_remove_snapshot("sub2")
+        mock_store.async_delay_save.assert_not_called()
+
+        hub.async_remove_snapshot("sub1")
+        assert await hub.async_get_snapshot("sub1") is None
+        mock_store.async_delay_save.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_request_count_is_saved(self, hass: HomeAssistant, config_entry, mock_store, mock_transport_nsw_api, mock_api_response):
+        """Test each request schedules a write of today's request count."""
+        mock_transport_nsw_api.async_get_departure_monitor.return_value = mock_api_response
+        hub = get_hub(hass, config_entry)
+        await hub.async_load()
+
+        await hub.async_get_departures("test_stop_id")
+
+        data_func, delay = mock_store.async_delay_save.call_args[0]
+        assert delay == SNAPSHOT_SAVE_DELAY
+        assert data_func()["requests"] == {
+            "date": dt_util.now().date().isoformat(),
+            "count": 1,
+        }
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(("days_ago", "requests_today"), [(0, 120), (1, 0)])
+    async def test_request_count_is_restored(self, hass: HomeAssistant, config_entry, mock_store, days_ago, requests_today):
+        """Test a new hub carries on with today's saved request count only."""
+        day = dt_util.now().date() - timedelta(days=days_ago)
+        mock_store.async_load.return_value = {
+            "snapshots": {},
+            "requests": {"date": day.isoformat(), "count": 120},
+        }
+        hub = get_hub(hass, config_entry)
+
+        await hub.async_load()
+        await hub.async_load()
+
+        assert hub.scheduler.requests_today == requests_today
+        mock_store.async_load.assert_awaited_once()
+
+
+class TestRealtimeFeeds:
+    """Test departures from GTFS-realtime feeds."""
+
+    @pytest.fixture
+    def realtime_entry(self, hass: HomeAssistant):
+        """Return an entry with two stops that uses the metro feed."""
+        hass.async_add_executor_job = AsyncMock(side_effect=lambda target, *args: target(*args))
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key"},
+            options={CONF_REALTIME_FEEDS: ["metro"]},
+        )
+        entry.subentries = {
+            f"sub{stop_id}": ConfigSubentry(
+                data={CONF_STOP_ID: stop_id},
+                subentry_id=f"sub{stop_id}",
+                subentry_type=SUBENTRY_TYPE_STOP,
+                title=f"Stop {stop_id}",
+                unique_id=f"entry_{stop_id}",
+            )
+            for stop_id in ("2155384", "2155385")
+        }
+        return entry
+
+    @pytest.mark.asyncio
+    async def test_stops_share_feed(self, hass: HomeAssistant, realtime_entry, mock_transport_nsw_api, tmp_path):
+        """Test every stop of the entry is served from one read of the feed."""
+        departure_time = dt_util.utcnow() + timedelta(minutes=5)
+        (tmp_path / "metro.pb").write_bytes(
+            make_feed(
+                make_trip_update(
+                    "M1.1", "SMNW_M1", [("2155384", departure_time, 0), ("2155385", departure_time, 60)]
+                )
+            )
+        )
+        hub = get_hub(hass, realtime_entry)
+        hub.async_get_feed = AsyncMock(wraps=FileFeedSource(hass, tmp_path).async_get_feed)
+
+        first = await hub.async_get_departures("2155384")
+        second = await hub.async_get_departures("2155385")
+
+        assert [departure.route for departure in first] == ["SMNW_M1"]
+        assert [departure.delay for departure in second] == [1]
+        hub.async_get_feed.assert_awaited_once_with("metro")
+        mock_transport_nsw_api.async_get_departure_monitor.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_feeds_come_from_api(self, hass: HomeAssistant, realtime_entry, mock_transport_nsw_api):
+        """Test feeds are fetched from the API through the scheduler."""
+        mock_transport_nsw_api.async_get_realtime_feed = AsyncMock(return_value=make_feed())
+        hub = get_hub(hass, realtime_entry)
+
+        assert await hub.async_get_departures("2155384") == []
+
+        mock_transport_nsw_api.async_get_realtime_feed.assert_awaited_once_with("v2/gtfs/realtime/metro", ANY)
+        assert hub.scheduler.requests_today == 1
@@ -6,19 +6,23 @@ import pytest
 from homeassistant.config_entries import ConfigEntry, ConfigEntryState, ConfigSubentry
 from homeassistant.const import CONF_API_KEY, CONF_NAME
 from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
 
 from custom_components.transport_nsw import (
     async_reload_entry,
+    async_remove_entry,
     async_setup_entry,
     async_unload_entry,
 )
 from custom_components.transport_nsw.const import (
     CONF_DESTINATION,
+    CONF_GTFS_STATIC,
     CONF_ROUTE,
     CONF_STOP_ID,
     DOMAIN,
     SUBENTRY_TYPE_STOP,
 )
+from custom_components.transport_nsw.hub import get_hub
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 
@@ -53,7 +57,23 @@ class TestAsyncSetupEntry:
         result = await async_setup_entry(hass, config_entry)
 
         assert result is True
-        assert hass.data[DOMAIN] == {"existing": "data"}
+        assert hass.data[DOMAIN]["existing"] == "data"
+
+    @pytest.mark.asyncio
+    async def test_setup_entry_restores_requests_today(self, hass: HomeAssistant, mock_store):
+        """Test requests sent before a restart still count against today's budget."""
+        mock_store.async_load.return_value = {
+            "requests": {"date": dt_util.now().date().isoformat(), "count": 7},
+        }
+        config_entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key"},
+        )
+
+        with patch.object(hass.config_entries, "async_forward_entry_setups"):
+            assert await async_setup_entry(hass, config_entry) is True
+
+        assert get_hub(hass, config_entry).scheduler.requests_today == 7
 
     @pytest.mark.asyncio
     async def test_setup_entry_adds_update_listener(self, hass: HomeAssistant):
@@ -89,6 +109,22 @@ class TestAsyncSetupEntry:
         assert call_args[0][0] == config_entry
         assert "sensor" in call_args[0][1]
 
+    @pytest.mark.asyncio
+    async def test_setup_entry_schedules_gtfs_updates(self, hass: HomeAssistant):
+        """Test the GTFS timetable is kept up to date when enabled."""
+        config_entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key"},
+            options={CONF_GTFS_STATIC: True},
+        )
+
+        with patch(
+            "custom_components.transport_nsw.async_schedule_gtfs_updates"
+        ) as mock_schedule:
+            assert await async_setup_entry(hass, config_entry) is True
+
+        mock_schedule.assert_called_once_with(hass, config_entry, get_hub(hass, config_entry))
+
 
 class TestAsyncUnloadEntry:
     """Test the async_unload_entry function."""
@@ -117,6 +153,21 @@ class TestAsyncUnloadEntry:
         # Check that entry data was removed
         assert config_entry.entry_id not in hass.data.get(DOMAIN, {})
 
+    @pytest.mark.asyncio
+    async def test_unload_entry_flushes_snapshots(self, hass: HomeAssistant, mock_store):
+        """Test pending snapshots are written before the hub is dropped."""
+        config_entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key"},
+        )
+        hub = get_hub(hass, config_entry)
+        hub.async_save_snapshot("sub1", {"fetched_at": "x"})
+
+        with patch.object(hass.config_entries, "async_unload_platforms", return_value=True):
+            assert await async_unload_entry(hass, config_entry) is True
+
+        mock_store.async_save.assert_awaited_once()
+
     @pytest.mark.asyncio
     async def test_unload_entry_failure(self, hass: HomeAssistant):
         """Test unload failure."""
@@ -174,6 +225,15 @@ class TestAsyncUnloadEntry:
         # Check that other data is preserved
         assert hass.data[DOMAIN] == {"other_entry": "other_data"}
 
+    @pytest.mark.asyncio
+    async def test_remove_entry_removes_snapshots(self, hass: HomeAssistant, mock_store):
+        """Test the saved departures are deleted with the config entry."""
+        config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+
+        await async_remove_entry(hass, config_entry)
+
+        mock_store.async_remove.assert_awaited_once()
+
 
 class TestAsyncReloadEntry:
     """Test the async_reload_entry function."""
@@ -192,6 +252,24 @@ class TestAsyncReloadEntry:
 
         mock_reload.assert_called_once_with(config_entry.entry_id)
 
+    @pytest.mark.asyncio
+    async def test_reload_entry_applies_stop_changes(self, hass: HomeAssistant):
+        """Test stop changes are applied without reloading the entry."""
+        config_entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key"},
+        )
+
+        with patch(
+            "custom_components.transport_nsw.async_update_stops", return_value=True
+        ) as mock_update_stops, patch.object(
+            hass.config_entries, "async_reload"
+        ) as mock_reload:
+            await async_reload_entry(hass, config_entry)
+
+        mock_update_stops.assert_awaited_once_with(hass, config_entry)
+        mock_reload.assert_not_called()
+
 
 class TestIntegrationFlow:
     """Test the complete integration flow."""
@@ -353,4 +431,4 @@ class TestIntegrationFlow:
         with patch.object(hass.config_entries, "async_unload_platforms", return_value=True):
             result = await async_unload_entry(hass, config_entry)
 
-        assert result is True
\ No newline at end of file
+        assert result is True
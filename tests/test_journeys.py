@@ -0,0 +1,114 @@
+"""Test the Transport NSW trip planner helpers."""
+
+from datetime import datetime, timedelta
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.transport_nsw.const import (
+    CONF_DESTINATION_ID,
+    CONF_ORIGIN_ID,
+    CONF_VIA_ID,
+)
+from custom_components.transport_nsw.journeys import (
+    JourneyQuery,
+    parse_journeys,
+    time_bucket,
+)
+
+from .conftest import make_journey, make_trip_response
+
+
+class TestJourneyQuery:
+    """Test JourneyQuery."""
+
+    def test_from_config(self):
+        """Test stop IDs are stripped and an empty via stop is left out."""
+        query = JourneyQuery.from_config(
+            {CONF_ORIGIN_ID: " 200060 ", CONF_DESTINATION_ID: "2000338", CONF_VIA_ID: " "}
+        )
+
+        assert query == JourneyQuery("200060", "2000338")
+        assert query.via is None
+
+    def test_from_config_with_via(self):
+        """Test a via stop is part of the query."""
+        query = JourneyQuery.from_config(
+            {CONF_ORIGIN_ID: "1", CONF_DESTINATION_ID: "2", CONF_VIA_ID: "3"}
+        )
+
+        assert query == JourneyQuery("1", "2", "3")
+        assert query != JourneyQuery("1", "2")
+
+    def test_unique_id(self):
+        """Test the unique ID names the stops, with the via stop if any."""
+        assert JourneyQuery("1", "2").unique_id("entry") == "entry_journey_1_2"
+        assert JourneyQuery("1", "2", "3").unique_id("entry") == "entry_journey_1_2_via_3"
+
+
+class TestParseJourneys:
+    """Test parse_journeys."""
+
+    def test_parse_direct_journey(self):
+        """Test a single-leg journey is normalised."""
+        (journey,) = parse_journeys(
+            make_trip_response(make_journey([("T1", 1, 5, 20)], delay=2))
+        )
+
+        assert journey.routes == ("T1",)
+        assert journey.mode == "Train"
+        assert journey.real_time == "y"
+        assert journey.delay == 2
+        assert journey.duration == 20
+        assert journey.changes == 0
+
+    def test_parse_journey_with_changes(self):
+        """Test the routes of every service leg are kept in order."""
+        (journey,) = parse_journeys(
+            make_trip_response(
+                make_journey([("T1", 1, 5, 10), ("333", 5, 18, 12)], real_time=False)
+            )
+        )
+
+        assert journey.routes == ("T1", "333")
+        assert journey.changes == 1
+        assert journey.duration == 25
+        assert journey.real_time == "n"
+        assert journey.delay == 0
+
+    def test_walk_to_first_service(self):
+        """Test a journey leaves with its walk but has its service's details."""
+        (journey,) = parse_journeys(
+            make_trip_response(make_journey([("F1", 9, 10, 20)], walk_first=4))
+        )
+
+        assert journey.routes == ("F1",)
+        assert journey.mode == "Ferry"
+        assert journey.duration == 24
+
+    def test_parse_skips_invalid_journeys(self):
+        """Test malformed journeys are skipped."""
+        journeys = parse_journeys(
+            {"journeys": [{"legs": []}, {}, make_journey(), {"legs": [{}]}]}
+        )
+
+        assert len(journeys) == 1
+
+    def test_parse_empty_response(self):
+        """Test a response without journeys has none."""
+        assert parse_journeys({}) == []
+        assert parse_journeys({"journeys": None}) == []
+
+
+class TestTimeBucket:
+    """Test time_bucket."""
+
+    def test_bucket_start(self):
+        """Test times are floored to the start of their bucket."""
+        size = timedelta(minutes=5)
+        now = datetime(2026, 3, 2, 8, 7, 42, tzinfo=dt_util.UTC)
+
+        assert time_bucket(now, size) == datetime(2026, 3, 2, 8, 5, tzinfo=dt_util.UTC)
+        assert time_bucket(now + timedelta(minutes=2), size) == time_bucket(now, size)
+        assert time_bucket(now + timedelta(minutes=3), size) == datetime(
+            2026, 3, 2, 8, 10, tzinfo=dt_util.UTC
+        )
@@ -0,0 +1,226 @@
+"""Test the Transport NSW GTFS-realtime feeds."""
+
+from datetime import timedelta
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from homeassistant.const import ATTR_MODE
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.transport_nsw.api import TransportNSWConnectionError
+from custom_components.transport_nsw.const import ATTR_DESTINATION, ATTR_ROUTE
+from custom_components.transport_nsw.departures import Departure
+from custom_components.transport_nsw.realtime import (
+    FileFeedSource,
+    RealtimeFeeds,
+    TripStopUpdate,
+    decode_trip_updates,
+    index_departures,
+)
+
+from .conftest import make_feed, make_trip_update
+
+NOW = dt_util.utcnow().replace(microsecond=0)
+
+
+def at(minutes):
+    """Return the time in the given minutes."""
+    return NOW + timedelta(minutes=minutes)
+
+
+FEED = make_feed(
+    make_trip_update(
+        "T1.1",
+        "BMT_1",
+        [("2000321", at(5), 60), ("2150", at(20), -30), ("2000330", at(25), 0)],
+    ),
+    make_trip_update("T1.2", "BMT_1", [("2000321", at(2), 0)], cancelled=True),
+    make_trip_update("333.1", "2441_333", [("2000321", at(9), 300)]),
+)
+
+
+def watching(*stop_ids):
+    """Return a watchers function for the given stops."""
+    return lambda stop_id: (stop_id,) if stop_id in stop_ids else ()
+
+
+@pytest.fixture
+def executor_hass(hass: HomeAssistant):
+    """Return hass with an executor that runs jobs straight away."""
+    hass.async_add_executor_job = AsyncMock(side_effect=lambda target, *args: target(*args))
+    return hass
+
+
+class TestDecodeTripUpdates:
+    """Test decode_trip_updates."""
+
+    def test_watched_stops(self):
+        """Test only the departures from watched stops are decoded."""
+        updates = list(decode_trip_updates(FEED, watching("2000321", "2150")))
+
+        assert updates == [
+            TripStopUpdate("T1.1", "BMT_1", ("2000321",), int(at(5).timestamp()), 60),
+            TripStopUpdate("T1.1", "BMT_1", ("2150",), int(at(20).timestamp()), -30),
+            TripStopUpdate("333.1", "2441_333", ("2000321",), int(at(9).timestamp()), 300),
+        ]
+
+    def test_cancelled_trips(self):
+        """Test cancelled trips are left out."""
+        updates = decode_trip_updates(FEED, watching("2000321"))
+
+        assert "T1.2" not in {update.trip_id for update in updates}
+
+    def test_deleted_entities(self):
+        """Test deleted entities are left out."""
+        entity = make_trip_update("T1.1", "BMT_1", [("2150", at(5), 0)])
+        # FeedEntity.is_deleted = true
+        feed = make_feed(entity + b"\x10\x01")
+
+        assert list(decode_trip_updates(feed, watching("2150"))) == []
+
+    def test_empty_feed(self):
+        """Test a feed without entities has no departures."""
+        assert list(decode_trip_updates(make_feed(), watching("2150"))) == []
+
+    def test_truncated_feed(self):
+        """Test a truncated feed is rejected."""
+        with pytest.raises(ValueError):
+            list(decode_trip_updates(FEED[:-10], watching("2000330")))
+
+
+class TestIndexDepartures:
+    """Test index_departures."""
+
+    def test_without_timetable(self):
+        """Test departures are named by route ID without a timetable."""
+        departures = index_departures([FEED], {"2000321", "2150"}, None)
+
+        assert departures["2000321"] == [
+            Departure(
+                route="BMT_1",
+                destination=None,
+                mode=None,
+                real_time="y",
+                delay=1,
+                departure_time=at(5),
+            ),
+            Departure(
+                route="2441_333",
+                destination=None,
+                mode=None,
+                real_time="y",
+                delay=5,
+                departure_time=at(9),
+            ),
+        ]
+        assert [departure.delay for departure in departures["2150"]] == [0]
+
+    def test_with_timetable(self):
+        """Test the timetable names trips and adds platforms to their station."""
+        timetable = Mock()
+        timetable.trip.side_effect = lambda trip_id: {
+            ATTR_ROUTE: "T1",
+            ATTR_DESTINATION: "Emu Plains",
+            ATTR_MODE: "Train",
+        } if trip_id.startswith("T1") else None
+        timetable.parent.side_effect = lambda stop_id: "200060" if stop_id.startswith("20003") else None
+
+        departures = index_departures([FEED], {"200060"}, timetable)
+
+        assert [
+            (departure.route, departure.destination, departure.departure_time)
+            for departure in departures["200060"]
+        ] == [
+            ("T1", "Emu Plains", at(5)),
+            ("2441_333", None, at(9)),
+            ("T1", "Emu Plains", at(25)),
+        ]
+        # Each trip and stop is looked up once
+        assert timetable.trip.call_count == 2
+        assert timetable.parent.call_count == 3
+
+    def test_several_feeds(self):
+        """Test the departures of several feeds are merged in time order."""
+        ferries = make_feed(make_trip_update("F1.1", "F1", [("2150", at(1), 0)]))
+
+        departures = index_departures([FEED, ferries], {"2150"}, None)
+
+        assert [departure.route for departure in departures["2150"]] == ["F1", "BMT_1"]
+
+
+class TestRealtimeFeeds:
+    """Test RealtimeFeeds."""
+
+    @pytest.mark.asyncio
+    async def test_stops_share_a_fetch(self, executor_hass):
+        """Test every stop is served from a single fetch of each feed."""
+        async_get_feed = AsyncMock(return_value=FEED)
+        feeds = RealtimeFeeds(executor_hass, ["sydneytrains", "buses"], async_get_feed)
+        stop_ids = {"2000321", "2150"}
+
+        first = await feeds.async_get_departures("2000321", stop_ids, timedelta(minutes=1))
+        second = await feeds.async_get_departures("2150", stop_ids, timedelta(minutes=1))
+
+        assert len(first) == 4
+        assert len(second) == 2
+        assert async_get_feed.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_feeds_are_refetched(self, executor_hass):
+        """Test feeds older than max_age and new stops are fetched again."""
+        async_get_feed = AsyncMock(return_value=FEED)
+        feeds = RealtimeFeeds(executor_hass, ["sydneytrains"], async_get_feed)
+
+        await feeds.async_get_departures("2000321", {"2000321"}, timedelta(minutes=1))
+        await feeds.async_get_departures("2000321", {"2000321"}, timedelta(0))
+        assert async_get_feed.await_count == 2
+
+        assert len(await feeds.async_get_departures("2150", {"2000321"}, timedelta(minutes=1))) == 1
+        assert async_get_feed.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_feed_is_left_out(self, executor_hass):
+        """Test the other feeds are used when one can't be fetched."""
+        async_get_feed = AsyncMock(side_effect=[TransportNSWConnectionError("timeout"), FEED])
+        feeds = RealtimeFeeds(executor_hass, ["buses", "sydneytrains"], async_get_feed)
+
+        departures = await feeds.async_get_departures("2150", {"2150"}, timedelta(minutes=1))
+
+        assert len(departures) == 1
+
+    @pytest.mark.asyncio
+    async def test_all_feeds_failed(self, executor_hass):
+        """Test an error is raised when no feed can be fetched."""
+        async_get_feed = AsyncMock(side_effect=TransportNSWConnectionError("timeout"))
+        feeds = RealtimeFeeds(executor_hass, ["buses", "sydneytrains"], async_get_feed)
+
+        with pytest.raises(TransportNSWConnectionError):
+            await feeds.async_get_departures("2150", {"2150"}, timedelta(minutes=1))
+
+    @pytest.mark.asyncio
+    async def test_timetable_is_used(self, executor_hass, mock_timetable):
+        """Test the offline timetable is used to name trips."""
+        timetable = Mock()
+        timetable.trip.return_value = {ATTR_ROUTE: "T1", ATTR_DESTINATION: "Emu Plains", ATTR_MODE: "Train"}
+        timetable.parent.return_value = None
+        mock_timetable.return_value = timetable
+        feeds = RealtimeFeeds(executor_hass, ["sydneytrains"], AsyncMock(return_value=FEED))
+
+        departures = await feeds.async_get_departures("2150", {"2150"}, timedelta(minutes=1))
+
+        assert departures[0].destination == "Emu Plains"
+
+
+class TestFileFeedSource:
+    """Test FileFeedSource."""
+
+    @pytest.mark.asyncio
+    async def test_file_feed_source(self, executor_hass, tmp_path):
+        """Test feeds are read from <feed>.pb files."""
+        (tmp_path / "metro.pb").write_bytes(FEED)
+        source = FileFeedSource(executor_hass, tmp_path)
+
+        assert await source.async_get_feed("metro") == FEED
+        with pytest.raises(FileNotFoundError):
+            await source.async_get_feed("buses")
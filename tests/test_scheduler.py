@@ -0,0 +1,208 @@
+"""Test the Transport NSW request scheduler."""
+
+import asyncio
+from datetime import timedelta
+from time import monotonic
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.transport_nsw.api import (
+    TransportNSWAuthError,
+    TransportNSWConnectionError,
+    TransportNSWRateLimitError,
+    TransportNSWResponseError,
+)
+from custom_components.transport_nsw.scheduler import (
+    BREAKER_AUTH_DELAY,
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    QuotaExceededError,
+    RequestScheduler,
+)
+
+
+class TestRequestScheduler:
+    """Test RequestScheduler."""
+
+    @pytest.mark.asyncio
+    async def test_burst_is_immediate(self):
+        """Test requests up to the burst limit are not delayed."""
+        scheduler = RequestScheduler(rate=1, burst=3)
+
+        start = monotonic()
+        for _ in range(3):
+            await scheduler.async_acquire()
+
+        assert monotonic() - start < 0.5
+        assert scheduler.requests_today == 3
+
+    @pytest.mark.asyncio
+    async def test_requests_beyond_burst_are_throttled(self):
+        """Test requests beyond the burst wait for the bucket to refill."""
+        scheduler = RequestScheduler(rate=20, burst=1)
+
+        start = monotonic()
+        await asyncio.gather(*(scheduler.async_acquire() for _ in range(4)))
+
+        # The first request uses the burst, the other three wait 1/20s each
+        assert monotonic() - start >= 0.14
+        assert scheduler.requests_today == 4
+        assert scheduler.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_daily_budget(self):
+        """Test the daily budget is enforced."""
+        scheduler = RequestScheduler(daily_budget=2)
+
+        await scheduler.async_acquire()
+        await scheduler.async_acquire()
+
+        assert scheduler.remaining_today == 0
+        with pytest.raises(QuotaExceededError):
+            await scheduler.async_acquire()
+
+    @pytest.mark.asyncio
+    async def test_daily_budget_resets(self):
+        """Test the daily counter resets on a new day."""
+        scheduler = RequestScheduler(daily_budget=1)
+        await scheduler.async_acquire()
+
+        scheduler._day -= timedelta(days=1)
+
+        assert scheduler.remaining_today == 1
+        await scheduler.async_acquire()
+        assert scheduler.requests_today == 1
+
+    def test_restore_today(self):
+        """Test requests counted earlier today are carried over."""
+        scheduler = RequestScheduler(daily_budget=10)
+
+        scheduler.restore(scheduler.day, 4)
+
+        assert scheduler.requests_today == 4
+        assert scheduler.remaining_today == 6
+
+    def test_restore_ignores_other_day(self):
+        """Test requests counted on an earlier day are not carried over."""
+        scheduler = RequestScheduler(daily_budget=10)
+
+        scheduler.restore(scheduler.day - timedelta(days=1), 4)
+
+        assert scheduler.remaining_today == 10
+
+
+class TestCircuitBreaker:
+    """Test CircuitBreaker."""
+
+    @pytest.fixture
+    def clock(self):
+        """Return a list holding the breaker's monotonic time."""
+        now = [1000.0]
+        with patch(
+            "custom_components.transport_nsw.scheduler.monotonic", lambda: now[0]
+        ):
+            yield now
+
+    def test_opens_after_threshold(self, clock):
+        """Test repeated timeouts and server errors open the circuit."""
+        breaker = CircuitBreaker(threshold=3, base_delay=30)
+
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+        breaker.record_failure(TransportNSWResponseError("bad gateway", 502))
+        breaker.check()
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+
+        assert breaker.state == CIRCUIT_OPEN
+        assert 15 <= breaker.retry_in <= 30
+        with pytest.raises(CircuitOpenError, match="timeout"):
+            breaker.check()
+
+    def test_success_resets_failures(self, clock):
+        """Test only failures in a row open the circuit."""
+        breaker = CircuitBreaker(threshold=2)
+
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+        breaker.record_success()
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+
+        assert breaker.state == CIRCUIT_CLOSED
+
+    def test_request_errors_do_not_count(self, clock):
+        """Test errors showing the API is up don't open the circuit."""
+        breaker = CircuitBreaker(threshold=2)
+
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+        breaker.record_failure(TransportNSWResponseError("bad request", 400))
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+
+        assert breaker.state == CIRCUIT_CLOSED
+
+    def test_rate_limit_honours_retry_after(self, clock):
+        """Test a rate limit opens the circuit for as long as the API asks."""
+        breaker = CircuitBreaker()
+
+        breaker.record_failure(TransportNSWRateLimitError("slow down", 429, 120))
+
+        assert breaker.retry_in == 120
+
+    def test_auth_error(self, clock):
+        """Test a rejected API key pauses requests for a long time."""
+        breaker = CircuitBreaker()
+
+        breaker.record_failure(TransportNSWAuthError("rejected"))
+
+        assert breaker.retry_in == BREAKER_AUTH_DELAY
+
+    def test_single_trial_request(self, clock):
+        """Test one request is let through once the wait is over."""
+        breaker = CircuitBreaker(threshold=1, base_delay=30)
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+        clock[0] += 30
+
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        breaker.check()
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+
+        breaker.record_success()
+        assert breaker.state == CIRCUIT_CLOSED
+        breaker.check()
+
+    def test_failed_trial_backs_off(self, clock):
+        """Test a failed trial reopens the circuit for twice as long."""
+        breaker = CircuitBreaker(threshold=1, base_delay=30, max_delay=100)
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+
+        for backoff in (60, 100, 100):
+            clock[0] += 30
+            clock[0] += breaker.retry_in
+            breaker.check()
+            breaker.record_failure(TransportNSWConnectionError("timeout"))
+            assert backoff / 2 <= breaker.retry_in <= backoff
+
+    def test_trial_that_never_reached_the_api(self, clock):
+        """Test the next caller may retry if the trial was never sent."""
+        breaker = CircuitBreaker(threshold=1)
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+        clock[0] += breaker.retry_in
+
+        breaker.check()
+        breaker.record_failure(QuotaExceededError("used up"))
+
+        breaker.check()
+
+    def test_abandoned_trial(self, clock):
+        """Test the next caller may send the trial after one was cancelled."""
+        breaker = CircuitBreaker(threshold=1)
+        breaker.record_failure(TransportNSWConnectionError("timeout"))
+        clock[0] += breaker.retry_in
+        breaker.check()
+
+        breaker.abandon_trial()
+
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        breaker.check()
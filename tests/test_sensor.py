@@ -1,33 +1,109 @@
 """Test the Transport NSW sensor."""
 
+import asyncio
+from dataclasses import replace
+from datetime import timedelta
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
+import pytest_asyncio
+from homeassistant.components.recorder.db_schema import StateAttributes
+from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigSubentry
-from homeassistant.const import CONF_API_KEY, CONF_NAME, ATTR_MODE
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    CONF_API_KEY,
+    CONF_NAME,
+    ATTR_MODE,
+    EVENT_STATE_CHANGED,
+    EntityCategory,
+)
+from homeassistant.core import Event, HomeAssistant, State
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import json_loads
 
 from custom_components.transport_nsw.const import (
+    ATTR_CHANGES,
     ATTR_DELAY,
+    ATTR_DEPARTURE_TIME,
+    ATTR_DEPARTURES,
     ATTR_DESTINATION,
     ATTR_DUE_IN,
+    ATTR_DURATION,
+    ATTR_FETCHED_AT,
+    ATTR_JOURNEYS,
     ATTR_REAL_TIME,
     ATTR_ROUTE,
+    ATTR_ROUTES,
     ATTR_STOP_ID,
+    CONF_DEFER_FIRST_REFRESH,
+    CONF_DEPARTURE_COUNT,
     CONF_DESTINATION,
+    CONF_DESTINATION_ID,
+    CONF_ORIGIN_ID,
+    CONF_RANKED_SENSORS,
+    CONF_RECORD_STATE_ONLY,
     CONF_ROUTE,
     CONF_STOP_ID,
+    CONF_VIA_ID,
     DOMAIN,
+    SUBENTRY_TYPE_JOURNEY,
     SUBENTRY_TYPE_STOP,
     TRANSPORT_ICONS,
 )
-from custom_components.transport_nsw.coordinator import TransportNSWCoordinator
+from custom_components.transport_nsw.coordinator import (
+    DepartureSnapshot,
+    JourneySnapshot,
+    TransportNSWCoordinator,
+    UpcomingDeparture,
+)
+from custom_components.transport_nsw.departures import Departure
+from custom_components.transport_nsw.journeys import JourneyQuery, parse_journeys
+from custom_components.transport_nsw.hub import get_hub
+from custom_components.transport_nsw.stats import FetchTrace
 from custom_components.transport_nsw.sensor import (
+    JourneySensors,
+    StopSensors,
+    TransportNSWApiKeySensor,
+    TransportNSWJourneySensor,
+    TransportNSWJourneyStateOnlySensor,
     TransportNSWSensor,
+    TransportNSWStateOnlySensor,
+    TransportNSWStatsSensor,
+    _ordinal,
     async_setup_entry,
+    async_update_stops,
 )
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
+from .conftest import make_journey, make_trip_response
+
+
+def make_snapshot(*departures, stop_id="test_stop_id", fetched_at=None):
+    """Return coordinator data for departures given as (minutes, fields) pairs."""
+    now = dt_util.utcnow()
+    defaults = {
+        "route": "T1",
+        "destination": "Hornsby",
+        "mode": "Train",
+        "real_time": "y",
+        "delay": 0,
+    }
+    return DepartureSnapshot(
+        tuple(
+            UpcomingDeparture.build(
+                Departure(
+                    **{**defaults, **fields},
+                    departure_time=now + timedelta(minutes=minutes, seconds=10),
+                ),
+                stop_id,
+                now,
+            )
+            for minutes, fields in departures
+        ),
+        fetched_at,
+    )
+
 
 class TestAsyncSetupEntry:
     """Test the async_setup_entry function."""
@@ -52,8 +128,12 @@ class TestAsyncSetupEntry:
 
         mock_add_entities.assert_called_once()
         entities = mock_add_entities.call_args[0][0]
-        assert len(entities) == 1
-        assert isinstance(entities[0], TransportNSWSensor)
+        assert [type(entity) for entity in entities] == [
+            TransportNSWSensor,
+            TransportNSWStatsSensor,
+            TransportNSWStatsSensor,
+            TransportNSWApiKeySensor,
+        ]
 
     @pytest.mark.asyncio
     async def test_setup_entry_with_subentries(self, hass: HomeAssistant, mock_transport_nsw_api, mock_api_response):
@@ -85,8 +165,12 @@ class TestAsyncSetupEntry:
 
         mock_add_entities.assert_called_once()
         entities = mock_add_entities.call_args[0][0]
-        assert len(entities) == 1
-        assert isinstance(entities[0], TransportNSWSensor)
+        assert [type(entity) for entity in entities] == [
+            TransportNSWSensor,
+            TransportNSWStatsSensor,
+            TransportNSWStatsSensor,
+            TransportNSWApiKeySensor,
+        ]
 
     @pytest.mark.asyncio
     async def test_setup_entry_with_multiple_subentries(self, hass: HomeAssistant, mock_transport_nsw_api, mock_api_response):
@@ -120,7 +204,8 @@ class TestAsyncSetupEntry:
 
         mock_add_entities.assert_called_once()
         entities = mock_add_entities.call_args[0][0]
-        assert len(entities) == 2
+        # Each stop has two diagnostic sensors, and the API key has one
+        assert len(entities) == 2 * 3 + 1
 
     @pytest.mark.asyncio
     async def test_setup_entry_no_subentries(self, hass: HomeAssistant):
@@ -136,7 +221,250 @@ class TestAsyncSetupEntry:
 
         mock_add_entities.assert_called_once()
         entities = mock_add_entities.call_args[0][0]
-        assert len(entities) == 0
+        assert [type(entity) for entity in entities] == [TransportNSWApiKeySensor]
+
+
+class TestConcurrentSetup:
+    """Test the first refresh of many stops during setup."""
+
+    @pytest.fixture
+    def config_entry(self):
+        """Return a config entry with ten stops."""
+        config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        config_entry.subentries = {
+            f"sub{index}": ConfigSubentry(
+                data={CONF_STOP_ID: f"stop_{index:03}"},
+                subentry_id=f"sub{index}",
+                subentry_type=SUBENTRY_TYPE_STOP,
+                title=f"Stop {index}",
+                unique_id=f"unique_{index}",
+            )
+            for index in range(10)
+        }
+        return config_entry
+
+    @pytest.mark.asyncio
+    async def test_first_refresh_is_concurrent_and_bounded(self, hass: HomeAssistant, config_entry):
+        """Test first refreshes overlap but never exceed the rate limit burst."""
+        mock_add_entities = Mock()
+        running = 0
+        peak = 0
+
+        async def _first_refresh(*args, **kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        with patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_config_entry_first_refresh",
+            new=_first_refresh,
+        ):
+            await async_setup_entry(hass, config_entry, mock_add_entities)
+
+        assert peak == get_hub(hass, config_entry).scheduler.burst
+        assert len(mock_add_entities.call_args[0][0]) == 10 * 3 + 1
+
+    @pytest.mark.asyncio
+    async def test_failed_first_refresh_cancels_the_others(
+        self, hass: HomeAssistant, config_entry
+    ):
+        """Test a failed first refresh cancels the rest before setup is retried."""
+        mock_add_entities = Mock()
+        started = 0
+        cancelled = 0
+
+        async def _first_refresh(coordinator):
+            nonlocal started, cancelled
+            started += 1
+            if coordinator.stop_id == "stop_000":
+                raise ConfigEntryNotReady("API unavailable")
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled += 1
+                raise
+
+        with patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_config_entry_first_refresh",
+            new=_first_refresh,
+        ), pytest.raises(ConfigEntryNotReady):
+            await async_setup_entry(hass, config_entry, mock_add_entities)
+
+        assert started > 1
+        assert cancelled == started - 1
+        mock_add_entities.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_deferred_first_refresh(self, hass: HomeAssistant, config_entry):
+        """Test sensors are added before their first refresh when deferred."""
+        mock_add_entities = Mock()
+        deferred_entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_KEY: "test_api_key"},
+            options={CONF_DEFER_FIRST_REFRESH: True},
+        )
+        deferred_entry.subentries = config_entry.subentries
+
+        with patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_refresh",
+            new_callable=AsyncMock,
+        ) as mock_refresh, patch.object(
+            deferred_entry, "async_create_background_task"
+        ) as mock_create_task:
+            await async_setup_entry(hass, deferred_entry, mock_add_entities)
+
+            mock_add_entities.assert_called_once()
+            assert len(mock_add_entities.call_args[0][0]) == 10 * 3 + 1
+            mock_refresh.assert_not_awaited()
+
+            # The refreshes run in a background task
+            await mock_create_task.call_args[0][1]
+            assert mock_refresh.await_count == 10
+
+    @pytest.mark.asyncio
+    async def test_restored_stops_refresh_in_background(self, hass: HomeAssistant, config_entry):
+        """Test only stops without saved departures hold up setup."""
+        mock_add_entities = Mock()
+
+        async def _restore(coordinator):
+            if coordinator.stop_id == "stop_000":
+                coordinator.data = make_snapshot((5, {}))
+                return True
+            return False
+
+        with patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_restore",
+            new=_restore,
+        ), patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_config_entry_first_refresh",
+            new_callable=AsyncMock,
+        ) as mock_first_refresh, patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_refresh",
+            new_callable=AsyncMock,
+        ) as mock_refresh, patch.object(
+            config_entry, "async_create_background_task"
+        ) as mock_create_task:
+            await async_setup_entry(hass, config_entry, mock_add_entities)
+
+            assert mock_first_refresh.await_count == 9
+            await mock_create_task.call_args[0][1]
+            mock_refresh.assert_awaited_once()
+
+
+class TestUpdateStops:
+    """Test stop subentry changes are applied without a reload."""
+
+    @staticmethod
+    def _subentry(subentry_id, stop_id, title, **data):
+        """Return a stop subentry."""
+        return ConfigSubentry(
+            data={CONF_STOP_ID: stop_id, **data},
+            subentry_id=subentry_id,
+            subentry_type=SUBENTRY_TYPE_STOP,
+            title=title,
+            unique_id=f"unique_{subentry_id}",
+        )
+
+    @pytest_asyncio.fixture
+    async def config_entry(self, hass: HomeAssistant):
+        """Return a config entry set up with two stops."""
+        config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        config_entry.subentries = {
+            "sub1": self._subentry("sub1", "111", "Central"),
+            "sub2": self._subentry("sub2", "222", "Town Hall"),
+        }
+        self.add_entities = Mock()
+        with patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_config_entry_first_refresh",
+            new_callable=AsyncMock,
+        ):
+            await async_setup_entry(hass, config_entry, self.add_entities)
+        self.add_entities.reset_mock()
+        return config_entry
+
+    async def _async_update_stops(self, hass, config_entry):
+        """Apply the entry's subentries and return whether it worked."""
+        with patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_refresh",
+            new_callable=AsyncMock,
+        ), patch("custom_components.transport_nsw.sensor.er.async_get"), patch(
+            "custom_components.transport_nsw.sensor.StopSensors.async_remove",
+            autospec=True,
+        ) as self.mock_remove, patch.object(
+            TransportNSWSensor, "async_update_config", autospec=True
+        ) as self.mock_update_config:
+            return await async_update_stops(hass, config_entry)
+
+    @pytest.mark.asyncio
+    async def test_add_and_remove_stops(self, hass: HomeAssistant, config_entry):
+        """Test only added and removed stops are touched."""
+        hub = get_hub(hass, config_entry)
+        kept = hub.stops["sub1"]
+        removed = hub.stops["sub2"]
+        config_entry.subentries = {
+            "sub1": config_entry.subentries["sub1"],
+            "sub3": self._subentry("sub3", "333", "Wynyard"),
+        }
+
+        assert await self._async_update_stops(hass, config_entry) is True
+
+        assert set(hub.stops) == {"sub1", "sub3"}
+        assert hub.stops["sub1"] is kept
+        self.mock_remove.assert_called_once()
+        assert self.mock_remove.call_args[0][0] is removed
+        sensor, *stats_sensors = self.add_entities.call_args[0][0]
+        assert len(stats_sensors) == 2
+        assert sensor.coordinator.stop_id == "333"
+        self.mock_update_config.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_edit_uses_update_hooks(self, hass: HomeAssistant, config_entry):
+        """Test an edit that keeps the unique IDs updates the sensors in place."""
+        hub = get_hub(hass, config_entry)
+        renamed = self._subentry("sub1", "111", "Central", **{CONF_NAME: "Home"})
+        config_entry.subentries = {**config_entry.subentries, "sub1": renamed}
+
+        assert await self._async_update_stops(hass, config_entry) is True
+
+        self.mock_update_config.assert_called_once_with(
+            hub.stops["sub1"].sensors[0], config_entry, renamed
+        )
+        assert hub.stops["sub1"].subentry is renamed
+        self.mock_remove.assert_not_called()
+        self.add_entities.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_edit_replaces_changed_sensors(self, hass: HomeAssistant, config_entry):
+        """Test an edit that changes unique IDs replaces the stop's sensors."""
+        hub = get_hub(hass, config_entry)
+        old = hub.stops["sub2"]
+        config_entry.subentries = {
+            **config_entry.subentries,
+            "sub2": self._subentry(
+                "sub2", "222", "Town Hall", **{CONF_RANKED_SENSORS: True, CONF_DEPARTURE_COUNT: 2}
+            ),
+        }
+
+        assert await self._async_update_stops(hass, config_entry) is True
+
+        assert self.mock_remove.call_args[0][0] is old
+        assert [sensor.rank for sensor in self.add_entities.call_args[0][0][:2]] == [1, 2]
+        self.mock_update_config.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_entry_change_needs_reload(self, hass: HomeAssistant, config_entry):
+        """Test changes to the entry itself fall back to a full reload."""
+        # Set up with another API key than the entry has now
+        get_hub(hass, config_entry).entry_config = ({CONF_API_KEY: "old_api_key"}, {})
+
+        assert await self._async_update_stops(hass, config_entry) is False
+
+    @pytest.mark.asyncio
+    async def test_not_set_up(self, hass: HomeAssistant, mock_config_entry_legacy):
+        """Test entries without tracked stops fall back to a full reload."""
+        assert await async_update_stops(hass, mock_config_entry_legacy) is False
 
 
 class TestTransportNSWSensor:
@@ -295,7 +623,7 @@ class TestTransportNSWSensor:
     async def test_native_value_with_data(self, hass: HomeAssistant, mock_config_entry_legacy):
         """Test native value with coordinator data."""
         coordinator = Mock(spec=TransportNSWCoordinator)
-        coordinator.data = {ATTR_DUE_IN: 5}
+        coordinator.data = make_snapshot((5, {}))
         sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
 
         assert sensor.native_value == 5
@@ -313,13 +641,7 @@ class TestTransportNSWSensor:
     async def test_extra_state_attributes_with_data(self, hass: HomeAssistant, mock_config_entry_legacy):
         """Test extra state attributes with coordinator data."""
         coordinator = Mock(spec=TransportNSWCoordinator)
-        coordinator.data = {
-            ATTR_ROUTE: "T1",
-            ATTR_DELAY: 2,
-            ATTR_REAL_TIME: True,
-            ATTR_DESTINATION: "Hornsby",
-            ATTR_MODE: "Train",
-        }
+        coordinator.data = make_snapshot((4, {"delay": 2, "real_time": True}))
         sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
 
         attributes = sensor.extra_state_attributes
@@ -331,6 +653,9 @@ class TestTransportNSWSensor:
             ATTR_REAL_TIME: True,
             ATTR_DESTINATION: "Hornsby",
             ATTR_MODE: "Train",
+            ATTR_DEPARTURES: [
+                {ATTR_ROUTE: "T1", ATTR_DESTINATION: "Hornsby", ATTR_DUE_IN: 4, ATTR_DELAY: 2}
+            ],
         }
         assert attributes == expected
 
@@ -338,7 +663,7 @@ class TestTransportNSWSensor:
     async def test_extra_state_attributes_subentry(self, hass: HomeAssistant, mock_config_entry_modern):
         """Test extra state attributes with subentry."""
         coordinator = Mock(spec=TransportNSWCoordinator)
-        coordinator.data = {ATTR_ROUTE: "T1"}
+        coordinator.data = make_snapshot((5, {}), stop_id="123")
         subentry = ConfigSubentry(
             data={CONF_STOP_ID: "123"},
             subentry_id="sub1",
@@ -361,11 +686,29 @@ class TestTransportNSWSensor:
 
         assert sensor.extra_state_attributes is None
 
+    @pytest.mark.asyncio
+    async def test_extra_state_attributes_no_departures(self, hass: HomeAssistant, mock_config_entry_legacy):
+        """Test the attributes are empty when no departures are coming."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.data = make_snapshot()
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
+
+        assert sensor.native_value is None
+        assert sensor.extra_state_attributes == {
+            ATTR_STOP_ID: "test_stop_id",
+            ATTR_ROUTE: None,
+            ATTR_DELAY: None,
+            ATTR_REAL_TIME: None,
+            ATTR_DESTINATION: None,
+            ATTR_MODE: None,
+            ATTR_DEPARTURES: [],
+        }
+
     @pytest.mark.asyncio
     async def test_icon_with_data(self, hass: HomeAssistant, mock_config_entry_legacy):
         """Test icon with coordinator data."""
         coordinator = Mock(spec=TransportNSWCoordinator)
-        coordinator.data = {ATTR_MODE: "Train"}
+        coordinator.data = make_snapshot((5, {"mode": "Train"}))
         sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
 
         assert sensor.icon == TRANSPORT_ICONS["Train"]
@@ -374,7 +717,7 @@ class TestTransportNSWSensor:
     async def test_icon_unknown_mode(self, hass: HomeAssistant, mock_config_entry_legacy):
         """Test icon with unknown transport mode."""
         coordinator = Mock(spec=TransportNSWCoordinator)
-        coordinator.data = {ATTR_MODE: "Unknown"}
+        coordinator.data = make_snapshot((5, {"mode": "Unknown"}))
         sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
 
         assert sensor.icon == TRANSPORT_ICONS[None]
@@ -395,7 +738,7 @@ class TestTransportNSWSensor:
         sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
 
         for mode, expected_icon in TRANSPORT_ICONS.items():
-            coordinator.data = {ATTR_MODE: mode}
+            coordinator.data = make_snapshot((5, {"mode": mode}))
             assert sensor.icon == expected_icon
 
     @pytest.mark.asyncio
@@ -460,4 +803,487 @@ class TestTransportNSWSensor:
         assert sensor.attribution == "Data provided by Transport NSW"
         assert sensor.device_class is not None
         assert sensor.state_class is not None
-        assert sensor.native_unit_of_measurement is not None
\ No newline at end of file
+        assert sensor.native_unit_of_measurement is not None
+
+    @pytest.mark.asyncio
+    async def test_restored_data_is_marked(self, hass: HomeAssistant, mock_config_entry_legacy):
+        """Test restored departures carry the time they were fetched."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        fetched_at = dt_util.utcnow() - timedelta(minutes=3)
+        coordinator.data = make_snapshot((5, {}), fetched_at=fetched_at)
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
+
+        assert sensor.extra_state_attributes[ATTR_FETCHED_AT] == fetched_at
+
+        coordinator.data = make_snapshot((5, {}))
+        assert ATTR_FETCHED_AT not in sensor.extra_state_attributes
+
+
+class TestLocalCountdown:
+    """Test the sensor counts down locally between refreshes."""
+
+    @pytest.mark.asyncio
+    async def test_native_value_from_departure_time(self, hass: HomeAssistant, mock_config_entry_legacy):
+        """Test the due time is computed from the departure time."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.data = make_snapshot((3, {}))
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
+
+        assert sensor.native_value == 3
+
+    @pytest.mark.asyncio
+    async def test_native_value_departed(self, hass: HomeAssistant, mock_config_entry_legacy):
+        """Test the countdown stops at zero once the service has left."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.data = make_snapshot((-3, {}))
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
+
+        assert sensor.native_value == 0
+
+    @pytest.mark.asyncio
+    async def test_countdown_tick_writes_changed_state(self, hass: HomeAssistant, mock_config_entry_legacy):
+        """Test the minute tick only writes state when the countdown changed."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.last_update_success = True
+        coordinator.data = make_snapshot((5, {}))
+        departure_time = coordinator.data.next.departure.departure_time
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
+
+        with patch.object(sensor, "async_write_ha_state") as mock_write_state:
+            sensor._handle_coordinator_update()
+            mock_write_state.reset_mock()
+
+            sensor._async_countdown_tick(dt_util.utcnow())
+            mock_write_state.assert_not_called()
+
+            with patch(
+                "custom_components.transport_nsw.sensor.dt_util.utcnow",
+                return_value=departure_time - timedelta(minutes=4),
+            ):
+                sensor._async_countdown_tick(dt_util.utcnow())
+            mock_write_state.assert_called_once()
+            assert sensor._written_due == 4
+
+    @pytest.mark.asyncio
+    async def test_countdown_timer_registered(self, hass: HomeAssistant, mock_config_entry_legacy):
+        """Test a clock-aligned minute timer is started when added."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_legacy, None)
+        sensor.hass = hass
+
+        with patch(
+            "custom_components.transport_nsw.sensor.CoordinatorEntity.async_added_to_hass",
+            new_callable=AsyncMock,
+        ), patch(
+            "custom_components.transport_nsw.sensor.async_track_utc_time_change"
+        ) as mock_track, patch.object(sensor, "async_on_remove") as mock_on_remove:
+            await sensor.async_added_to_hass()
+
+        mock_track.assert_called_once_with(hass, sensor._async_countdown_tick, second=0)
+        mock_on_remove.assert_called_once_with(mock_track.return_value)
+
+
+class TestRankedSensors:
+    """Test sensors for upcoming departures after the next one."""
+
+    @pytest.fixture
+    def ranked_subentry(self):
+        """Return a subentry with ranked sensors enabled."""
+        return ConfigSubentry(
+            data={
+                CONF_STOP_ID: "123",
+                CONF_ROUTE: "T1",
+                CONF_DEPARTURE_COUNT: 3,
+                CONF_RANKED_SENSORS: True,
+            },
+            subentry_id="sub1",
+            subentry_type=SUBENTRY_TYPE_STOP,
+            title="Central",
+            unique_id="unique_test",
+        )
+
+    @pytest.fixture
+    def upcoming_data(self):
+        """Return coordinator data with three upcoming departures."""
+        return make_snapshot(
+            (2, {"destination": "Hornsby"}),
+            (6, {"destination": "Berowra", "delay": 1}),
+            (11, {"destination": "Emu Plains", "mode": "Bus"}),
+            stop_id="123",
+        )
+
+    @pytest.mark.asyncio
+    async def test_setup_creates_ranked_sensors(self, hass: HomeAssistant, ranked_subentry):
+        """Test a sensor is added per upcoming departure sharing one coordinator."""
+        mock_add_entities = Mock()
+        config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        config_entry.subentries = {"sub1": ranked_subentry}
+
+        with patch("custom_components.transport_nsw.coordinator.TransportNSWCoordinator.async_config_entry_first_refresh", new_callable=AsyncMock):
+            await async_setup_entry(hass, config_entry, mock_add_entities)
+
+        entities = mock_add_entities.call_args[0][0][:3]
+        assert [entity.rank for entity in entities] == [1, 2, 3]
+        assert len({entity.coordinator for entity in entities}) == 1
+        assert [entity.name for entity in entities] == ["Central", "Central 2nd", "Central 3rd"]
+        assert entities[2].unique_id == f"{DOMAIN}_{config_entry.entry_id}_123_route_T1_rank_3"
+
+    @pytest.mark.asyncio
+    async def test_ranked_sensor_follows_its_departure(self, hass: HomeAssistant, mock_config_entry_modern, ranked_subentry, upcoming_data):
+        """Test a ranked sensor reports the departure at its rank."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.data = upcoming_data
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_modern, ranked_subentry, 3)
+
+        assert sensor.native_value == 11
+        assert sensor.extra_state_attributes[ATTR_DESTINATION] == "Emu Plains"
+        assert ATTR_DEPARTURES not in sensor.extra_state_attributes
+        assert sensor.icon == TRANSPORT_ICONS["Bus"]
+
+    @pytest.mark.asyncio
+    async def test_ranked_sensor_without_departure(self, hass: HomeAssistant, mock_config_entry_modern, ranked_subentry, upcoming_data):
+        """Test a ranked sensor has no value when fewer departures are coming."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.data = DepartureSnapshot(upcoming_data.departures[:1])
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_modern, ranked_subentry, 2)
+
+        assert sensor.native_value is None
+        assert sensor.icon == TRANSPORT_ICONS[None]
+        assert sensor.extra_state_attributes[ATTR_STOP_ID] == "123"
+        assert sensor.extra_state_attributes[ATTR_ROUTE] is None
+
+    @pytest.mark.asyncio
+    async def test_ranked_sensor_shares_attributes(self, hass: HomeAssistant, mock_config_entry_modern, ranked_subentry, upcoming_data):
+        """Test a ranked sensor reuses the attributes built with its departure."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.data = upcoming_data
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_modern, ranked_subentry, 2)
+
+        assert sensor.extra_state_attributes is upcoming_data.departures[1].attributes
+        assert sensor.extra_state_attributes is sensor.extra_state_attributes
+
+    @pytest.mark.asyncio
+    async def test_ranked_sensor_skips_others_changes(self, hass: HomeAssistant, mock_config_entry_modern, ranked_subentry, upcoming_data):
+        """Test a ranked sensor only writes state when its own departure changed."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.last_update_success = True
+        coordinator.data = upcoming_data
+        next_sensor = TransportNSWSensor(coordinator, mock_config_entry_modern, ranked_subentry)
+        third_sensor = TransportNSWSensor(coordinator, mock_config_entry_modern, ranked_subentry, 3)
+
+        with patch.object(next_sensor, "async_write_ha_state") as next_write, patch.object(
+            third_sensor, "async_write_ha_state"
+        ) as third_write:
+            for sensor in (next_sensor, third_sensor):
+                sensor._handle_coordinator_update()
+            first, second, third = upcoming_data.departures
+            delayed = UpcomingDeparture.build(
+                replace(first.departure, delay=3), "123", dt_util.utcnow()
+            )
+            coordinator.data = DepartureSnapshot((delayed, second, third))
+            for sensor in (next_sensor, third_sensor):
+                sensor._handle_coordinator_update()
+
+            assert next_write.call_count == 2
+            third_write.assert_called_once()
+
+            coordinator.last_update_success = False
+            third_sensor._handle_coordinator_update()
+            assert third_write.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_departures_attribute(self, hass: HomeAssistant, mock_config_entry_modern, ranked_subentry, upcoming_data):
+        """Test the next departure sensor lists the upcoming departures compactly."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.data = upcoming_data
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_modern, ranked_subentry)
+
+        assert sensor.extra_state_attributes[ATTR_DEPARTURES] == [
+            {ATTR_ROUTE: "T1", ATTR_DESTINATION: "Hornsby", ATTR_DUE_IN: 2, ATTR_DELAY: 0},
+            {ATTR_ROUTE: "T1", ATTR_DESTINATION: "Berowra", ATTR_DUE_IN: 6, ATTR_DELAY: 1},
+            {ATTR_ROUTE: "T1", ATTR_DESTINATION: "Emu Plains", ATTR_DUE_IN: 11, ATTR_DELAY: 0},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_next_sensor_shares_attributes(self, hass: HomeAssistant, mock_config_entry_modern, ranked_subentry, upcoming_data, freezer):
+        """Test the next departure sensor's attributes are built once a minute."""
+        coordinator = Mock(spec=TransportNSWCoordinator)
+        coordinator.data = upcoming_data
+        sensor = TransportNSWSensor(coordinator, mock_config_entry_modern, ranked_subentry)
+        freezer.move_to(dt_util.utcnow().replace(second=1))
+
+        attributes = sensor.extra_state_attributes
+        assert sensor.extra_state_attributes is attributes
+        assert upcoming_data.listed_attributes(dt_util.utcnow()) is attributes
+
+        freezer.tick(timedelta(minutes=1))
+        later = sensor.extra_state_attributes
+        assert later is not attributes
+        assert [departure[ATTR_DUE_IN] for departure in later[ATTR_DEPARTURES]] == [
+            departure[ATTR_DUE_IN] - 1 for departure in attributes[ATTR_DEPARTURES]
+        ]
+
+    def test_ordinal(self):
+        """Test ordinal suffixes for ranks."""
+        assert [_ordinal(rank) for rank in (1, 2, 3, 4, 11, 12, 13, 21, 22)] == [
+            "1st", "2nd", "3rd", "4th", "11th", "12th", "13th", "21st", "22nd"
+        ]
+
+
+def recorded_attributes(sensor: SensorEntity) -> dict:
+    """Return the state attributes of a sensor as the recorder stores them."""
+    sensor_class = type(sensor)
+    state = State(
+        "sensor.test",
+        str(sensor.native_value),
+        {**(sensor.extra_state_attributes or {}), "friendly_name": "Test"},
+        state_info={
+            "unrecorded_attributes": sensor_class._entity_component_unrecorded_attributes
+            | sensor_class._unrecorded_attributes
+        },
+    )
+    event = Event(EVENT_STATE_CHANGED, {"new_state": state})
+    return json_loads(StateAttributes.shared_attrs_bytes_from_event(event, None))
+
+
+class TestRecordedAttributes:
+    """Test which state attributes are kept in the history database."""
+
+    @staticmethod
+    def create_stop(hass: HomeAssistant, options: dict) -> StopSensors:
+        """Return the sensors of a stop with ranked sensors and saved departures."""
+        subentry = ConfigSubentry(
+            data={CONF_STOP_ID: "123", CONF_DEPARTURE_COUNT: 2, CONF_RANKED_SENSORS: True},
+            subentry_id="sub1",
+            subentry_type=SUBENTRY_TYPE_STOP,
+            title="Central",
+            unique_id="unique_test",
+        )
+        config_entry = MockConfigEntry(
+            domain=DOMAIN, data={CONF_API_KEY: "test_api_key"}, options=options
+        )
+        config_entry.subentries = {"sub1": subentry}
+        stop = StopSensors.create(hass, config_entry, subentry)
+        stop.coordinator.data = make_snapshot(
+            (4, {}), (9, {"delay": 2}), stop_id="123", fetched_at=dt_util.utcnow()
+        )
+        return stop
+
+    def test_volatile_attributes_not_recorded(self, hass: HomeAssistant):
+        """Test the stop, departures list and restore marker are left out."""
+        stop = self.create_stop(hass, {})
+
+        assert [type(sensor) for sensor in stop.sensors] == [TransportNSWSensor] * 2
+        assert recorded_attributes(stop.sensors[0]) == {
+            ATTR_ROUTE: "T1",
+            ATTR_DELAY: 0,
+            ATTR_REAL_TIME: "y",
+            ATTR_DESTINATION: "Hornsby",
+            ATTR_MODE: "Train",
+            "friendly_name": "Test",
+        }
+        assert recorded_attributes(stop.sensors[1])[ATTR_DELAY] == 2
+
+    def test_record_state_only(self, hass: HomeAssistant):
+        """Test no departure details are recorded with the option set."""
+        stop = self.create_stop(hass, {CONF_RECORD_STATE_ONLY: True})
+
+        assert [type(sensor) for sensor in stop.sensors] == [TransportNSWStateOnlySensor] * 2
+        for sensor in stop.sensors:
+            assert sensor.extra_state_attributes[ATTR_ROUTE] == "T1"
+            assert recorded_attributes(sensor) == {"friendly_name": "Test"}
+
+    def test_diagnostic_sensors_record_value_only(self, hass: HomeAssistant, mock_config_entry_with_subentries):
+        """Test the stats in the diagnostic sensors' attributes are not recorded."""
+        stop = self.create_stop(hass, {})
+        api_key_sensor = TransportNSWApiKeySensor(hass, mock_config_entry_with_subentries)
+
+        for sensor in [*stop.stats_sensors, api_key_sensor]:
+            assert recorded_attributes(sensor) == {"friendly_name": "Test"}
+
+
+class TestDiagnosticSensors:
+    """Test the diagnostic sensors reporting update stats."""
+
+    @pytest.fixture
+    def stop(self, hass: HomeAssistant, mock_config_entry_with_subentries):
+        """Return the sensors of a stop."""
+        subentry = next(iter(mock_config_entry_with_subentries.subentries.values()))
+        return StopSensors.create(hass, mock_config_entry_with_subentries, subentry)
+
+    def test_stats_sensors(self, stop):
+        """Test the stop's diagnostic sensors follow its coordinator's stats."""
+        duration, size = stop.stats_sensors
+        stop.coordinator.stats.record(0.25, FetchTrace({"request": 0.2}, 2048), success=True)
+
+        assert duration.unique_id == f"{stop.sensors[0].unique_id}_update_duration"
+        assert duration.name == f"{stop.sensors[0].name} update duration"
+        assert duration.entity_category is EntityCategory.DIAGNOSTIC
+        assert duration.entity_registry_enabled_default is False
+        assert duration.native_value == 250
+        assert duration.extra_state_attributes["last_phases"] == {"request": 0.2}
+        assert size.native_value == 2048
+
+    def test_stats_sensors_stay_available(self, stop):
+        """Test failed updates are still reported."""
+        stop.coordinator.last_update_success = False
+
+        assert all(sensor.available for sensor in stop.stats_sensors)
+
+    def test_api_key_sensor(self, hass: HomeAssistant, mock_config_entry_with_subentries):
+        """Test the API key sensor reports today's requests and budget."""
+        hub = get_hub(hass, mock_config_entry_with_subentries)
+        hub.scheduler.requests_today = 120
+        sensor = TransportNSWApiKeySensor(hass, mock_config_entry_with_subentries)
+
+        assert sensor.native_value == 120
+        assert sensor.extra_state_attributes["remaining_today"] == hub.scheduler.daily_budget - 120
+        assert sensor.entity_registry_enabled_default is False
+
+
+class TestJourneySensors:
+    """Test the sensors of journey subentries."""
+
+    @staticmethod
+    def _subentry(subentry_id="journey1", via=""):
+        """Return a journey subentry."""
+        return ConfigSubentry(
+            data={CONF_ORIGIN_ID: "200060", CONF_DESTINATION_ID: "2000338", CONF_VIA_ID: via},
+            subentry_id=subentry_id,
+            subentry_type=SUBENTRY_TYPE_JOURNEY,
+            title="Central → Circular Quay",
+            unique_id=f"unique_{subentry_id}",
+        )
+
+    @classmethod
+    def create_journey(cls, hass: HomeAssistant, options: dict | None = None) -> JourneySensors:
+        """Return the sensor of a journey with a change, and the one after it."""
+        subentry = cls._subentry()
+        config_entry = MockConfigEntry(
+            domain=DOMAIN, data={CONF_API_KEY: "test_api_key"}, options=options or {}
+        )
+        config_entry.subentries = {subentry.subentry_id: subentry}
+        journey = JourneySensors.create(hass, config_entry, subentry)
+        journey.coordinator.data = JourneySnapshot(
+            tuple(
+                parse_journeys(
+                    make_trip_response(
+                        make_journey([("T1", 1, 4, 6), ("F1", 9, 12, 10)], delay=1),
+                        make_journey([("T2", 1, 9, 15)], real_time=False),
+                    )
+                )
+            )
+        )
+        return journey
+
+    @pytest.mark.asyncio
+    async def test_setup_entry_with_journey(self, hass: HomeAssistant):
+        """Test journey subentries get a sensor and no stats sensors."""
+        mock_add_entities = Mock()
+        config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        config_entry.subentries = {"journey1": self._subentry()}
+
+        with patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWJourneyCoordinator.async_config_entry_first_refresh",
+            new_callable=AsyncMock,
+        ) as mock_first_refresh:
+            await async_setup_entry(hass, config_entry, mock_add_entities)
+
+        sensor, api_key_sensor = mock_add_entities.call_args[0][0]
+        assert type(sensor) is TransportNSWJourneySensor
+        assert isinstance(api_key_sensor, TransportNSWApiKeySensor)
+        assert set(get_hub(hass, config_entry).journeys) == {"journey1"}
+        mock_first_refresh.assert_awaited_once()
+
+    def test_unique_id(self, hass: HomeAssistant):
+        """Test the unique ID follows the stops of the journey."""
+        journey = self.create_journey(hass)
+        entry_id = journey.coordinator.config_entry.entry_id
+        (sensor,) = journey.sensors
+
+        assert sensor.unique_id == f"{DOMAIN}_{entry_id}_journey_200060_2000338"
+        assert sensor.name == "Central → Circular Quay"
+
+        subentry = self._subentry(via="2000441")
+        via_sensor = TransportNSWJourneySensor(
+            Mock(query=JourneyQuery("200060", "2000338", "2000441")),
+            journey.coordinator.config_entry,
+            subentry,
+        )
+        assert via_sensor.unique_id.endswith("_journey_200060_2000338_via_2000441")
+
+    def test_next_journey(self, hass: HomeAssistant):
+        """Test the state counts down to the next journey and details its legs."""
+        (sensor,) = self.create_journey(hass).sensors
+
+        assert sensor.native_value == 4
+        assert sensor.icon == TRANSPORT_ICONS["Train"]
+        attributes = sensor.extra_state_attributes
+        assert attributes[ATTR_ROUTES] == ["T1", "F1"]
+        assert attributes[ATTR_CHANGES] == 1
+        assert attributes[ATTR_DURATION] == 18
+        assert attributes[ATTR_DELAY] == 1
+        assert attributes[ATTR_MODE] == "Train"
+        assert [journey[ATTR_DUE_IN] for journey in attributes[ATTR_JOURNEYS]] == [4, 9]
+
+    def test_no_journey(self, hass: HomeAssistant):
+        """Test a sensor without an upcoming journey keeps its attribute keys."""
+        journey = self.create_journey(hass)
+        journey.coordinator.data = JourneySnapshot(())
+        (sensor,) = journey.sensors
+
+        assert sensor.native_value is None
+        assert sensor.icon == TRANSPORT_ICONS[None]
+        attributes = sensor.extra_state_attributes
+        assert attributes[ATTR_ROUTES] is None
+        assert attributes[ATTR_DEPARTURE_TIME] is None
+        assert attributes[ATTR_JOURNEYS] == []
+
+    def test_recorded_attributes(self, hass: HomeAssistant):
+        """Test only the next journey's details are recorded."""
+        (sensor,) = self.create_journey(hass).sensors
+
+        assert recorded_attributes(sensor) == {
+            ATTR_ROUTES: ["T1", "F1"],
+            ATTR_MODE: "Train",
+            ATTR_DELAY: 1,
+            ATTR_REAL_TIME: "y",
+            ATTR_DURATION: 18,
+            ATTR_CHANGES: 1,
+            "friendly_name": "Test",
+        }
+
+        (sensor,) = self.create_journey(hass, {CONF_RECORD_STATE_ONLY: True}).sensors
+        assert type(sensor) is TransportNSWJourneyStateOnlySensor
+        assert recorded_attributes(sensor) == {"friendly_name": "Test"}
+
+    @pytest.mark.asyncio
+    async def test_update_journeys(self, hass: HomeAssistant, mock_transport_nsw_api):
+        """Test journey subentries are added and removed without a reload."""
+        mock_transport_nsw_api.async_get_trip.return_value = make_trip_response(make_journey())
+        add_entities = Mock()
+        config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_API_KEY: "test_api_key"})
+        config_entry.subentries = {"journey1": self._subentry()}
+        with patch(
+            "custom_components.transport_nsw.coordinator.TransportNSWJourneyCoordinator.async_config_entry_first_refresh",
+            new_callable=AsyncMock,
+        ):
+            await async_setup_entry(hass, config_entry, add_entities)
+        hub = get_hub(hass, config_entry)
+        removed = hub.journeys["journey1"]
+        await hub.async_get_journeys(removed.coordinator.query)
+        config_entry.subentries = {"journey2": self._subentry("journey2", via="2000441")}
+
+        with patch("custom_components.transport_nsw.sensor.er.async_get"), patch(
+            "custom_components.transport_nsw.sensor.SubentrySensors.async_remove",
+            autospec=True,
+        ) as mock_remove:
+            assert await async_update_stops(hass, config_entry) is True
+
+        assert set(hub.journeys) == {"journey2"}
+        assert mock_remove.call_args[0][0] is removed
+        (sensor,) = add_entities.call_args[0][0]
+        assert sensor.coordinator.query.via == "2000441"
+        assert sensor.coordinator.data.next.routes == ("T1",)
+        # Only the remaining journey's query is still cached
+        assert list(hub._journeys) == [sensor.coordinator.query]
@@ -0,0 +1,123 @@
+"""Test the Transport NSW fetch instrumentation."""
+
+from custom_components.transport_nsw.stats import (
+    PHASE_QUEUE,
+    PHASE_REQUEST,
+    FetchStats,
+    FetchTrace,
+    Histogram,
+    ResponseLog,
+)
+
+
+class TestHistogram:
+    """Test Histogram."""
+
+    def test_observe(self):
+        """Test values are counted into the first bucket that holds them."""
+        histogram = Histogram((0.1, 1.0))
+
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        assert histogram.as_dict() == {"le_0.1": 2, "le_1": 1, "le_inf": 1}
+        assert histogram.count == 4
+        assert histogram.total == 3.65
+
+
+class TestFetchTrace:
+    """Test FetchTrace."""
+
+    def test_phases_add_up(self):
+        """Test time spent in a phase several times is added up."""
+        trace = FetchTrace()
+
+        with trace.phase(PHASE_QUEUE):
+            pass
+        first = trace.phases[PHASE_QUEUE]
+        with trace.phase(PHASE_QUEUE):
+            pass
+
+        assert trace.phases[PHASE_QUEUE] >= first
+        assert PHASE_REQUEST not in trace.phases
+
+    def test_phase_is_timed_on_error(self):
+        """Test a phase that raises is still timed."""
+        trace = FetchTrace()
+
+        try:
+            with trace.phase(PHASE_REQUEST):
+                raise ValueError
+        except ValueError:
+            pass
+
+        assert PHASE_REQUEST in trace.phases
+
+
+class TestFetchStats:
+    """Test FetchStats."""
+
+    def test_record(self):
+        """Test successes, failures, durations and sizes are totalled."""
+        stats = FetchStats()
+
+        stats.record(0.2, FetchTrace({PHASE_REQUEST: 0.15}, 1000), success=True)
+        stats.record(12.0, FetchTrace({PHASE_REQUEST: 12.0}), success=False)
+
+        assert stats.successes == 1
+        assert stats.failures == 1
+        assert stats.last_duration == 12.0
+        assert stats.last_payload_bytes == 1000
+        assert stats.as_dict() == {
+            "successes": 1,
+            "failures": 1,
+            "last_phases": {PHASE_REQUEST: 12.0},
+            "last_payload_bytes": 1000,
+            "payload_bytes": 1000,
+            "latency_histogram": {
+                "le_0.1": 0,
+                "le_0.25": 1,
+                "le_0.5": 0,
+                "le_1": 0,
+                "le_2.5": 0,
+                "le_5": 0,
+                "le_10": 0,
+                "le_inf": 1,
+            },
+        }
+
+
+class TestResponseLog:
+    """Test ResponseLog."""
+
+    def test_limits(self):
+        """Test the oldest responses are dropped beyond the count and size limits."""
+        log = ResponseLog(max_count=3, max_bytes=10)
+
+        for index in range(4):
+            log.add(f"request {index}", b"1234")
+
+        assert [entry["request"] for entry in log.as_list()] == ["request 2", "request 3"]
+        assert log.size == 8
+
+    def test_oversized_response(self):
+        """Test a response larger than the whole log is logged without its body."""
+        log = ResponseLog(max_bytes=10)
+
+        log.add("request", b"x" * 11)
+
+        (entry,) = log.as_list()
+        assert entry["response"] is None
+        assert "too large" in entry["error"]
+        assert log.size == 0
+
+    def test_secrets_are_redacted(self):
+        """Test secrets are replaced and JSON is decoded."""
+        log = ResponseLog()
+        log.add("json", b'{"key": "secret_key"}')
+        log.add("text", b"not json secret_key")
+
+        assert [entry["response"] for entry in log.as_list(["secret_key"])] == [
+            {"key": "**REDACTED**"},
+            "not json **REDACTED**",
+        ]
@@ -0,0 +1,122 @@
+"""Test the Transport NSW offline stop index."""
+
+import zipfile
+
+import pytest
+
+from custom_components.transport_nsw.stops import (
+    StopIndex,
+    build_stop_index,
+    read_gtfs_stops,
+)
+
+STOPS_TXT = """\
+stop_id,stop_code,stop_name,stop_lat,stop_lon,location_type,parent_station
+200060,,Central Station,-33.884,151.206,1,
+2000321,,"Central Station, Platform 21",-33.883,151.205,0,200060
+200060_E1,,Central Station Entrance,-33.884,151.206,2,200060
+2000421,,Town Hall Station,-33.873,151.206,1,
+203311,,Circular Quay,-33.861,151.211,,
+2155384,,central coast hwy at Wyoming,-33.405,151.359,0,
+"""
+
+
+@pytest.fixture
+def stops_txt(tmp_path):
+    """Return the path of a small stops.txt."""
+    path = tmp_path / "stops.txt"
+    path.write_text(STOPS_TXT, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def stop_index(tmp_path, stops_txt):
+    """Return an index of the small stops.txt."""
+    path = tmp_path / "stops.idx"
+    build_stop_index(read_gtfs_stops(stops_txt), path)
+    index = StopIndex(path)
+    yield index
+    index.close()
+
+
+class TestReadGtfsStops:
+    """Test read_gtfs_stops."""
+
+    def test_read_stops_txt(self, stops_txt):
+        """Test stops are read and entrances skipped."""
+        stops = list(read_gtfs_stops(stops_txt))
+
+        assert ("200060", "Central Station") in stops
+        assert ("203311", "Circular Quay") in stops
+        assert all(stop_id != "200060_E1" for stop_id, _ in stops)
+        assert len(stops) == 5
+
+    def test_read_bundle(self, tmp_path, stops_txt):
+        """Test stops are read from a GTFS zip bundle."""
+        bundle = tmp_path / "gtfs.zip"
+        with zipfile.ZipFile(bundle, "w") as zip_file:
+            zip_file.write(stops_txt, "stops.txt")
+
+        assert list(read_gtfs_stops(bundle)) == list(read_gtfs_stops(stops_txt))
+
+
+class TestStopIndex:
+    """Test StopIndex."""
+
+    def test_get(self, stop_index):
+        """Test stops are looked up by ID."""
+        assert len(stop_index) == 5
+        assert stop_index.get("2000421") == "Town Hall Station"
+        assert stop_index.get("2000322") is None
+        assert stop_index.get("") is None
+
+    def test_search_by_name_prefix(self, stop_index):
+        """Test the search matches the start of names, ignoring case."""
+        assert stop_index.search("central") == [
+            ("2155384", "central coast hwy at Wyoming"),
+            ("200060", "Central Station"),
+            ("2000321", "Central Station, Platform 21"),
+        ]
+        assert stop_index.search("CENTRAL STATION,") == [
+            ("2000321", "Central Station, Platform 21")
+        ]
+        assert stop_index.search("Station") == []
+
+    def test_search_by_stop_id(self, stop_index):
+        """Test a stop ID is returned first."""
+        assert stop_index.search(" 203311 ") == [("203311", "Circular Quay")]
+
+    def test_search_limit(self, stop_index):
+        """Test the number of results is capped."""
+        assert len(stop_index.search("c", limit=2)) == 2
+        assert stop_index.search("") == []
+
+    def test_duplicate_stop_ids(self, tmp_path):
+        """Test only the first stop with an ID is kept."""
+        path = tmp_path / "stops.idx"
+
+        assert build_stop_index([("1", "First"), ("1", "Second"), ("2", "Ünïcode")], path) == 2
+        index = StopIndex(path)
+        assert index.get("1") == "First"
+        assert index.search("ünï") == [("2", "Ünïcode")]
+        index.close()
+
+    def test_rebuild_replaces_index(self, tmp_path):
+        """Test an open index keeps working while it is rebuilt."""
+        path = tmp_path / "stops.idx"
+        build_stop_index([("1", "Old")], path)
+        old = StopIndex(path)
+
+        build_stop_index([("1", "New")], path)
+
+        assert old.get("1") == "Old"
+        assert StopIndex(path).get("1") == "New"
+        assert not path.with_suffix(".tmp").exists()
+
+    def test_invalid_file(self, tmp_path):
+        """Test a file that isn't an index is rejected."""
+        path = tmp_path / "stops.idx"
+        path.write_bytes(b"not an index at all")
+
+        with pytest.raises(ValueError):
+            StopIndex(path)
@@ -0,0 +1,187 @@
+"""Test the Transport NSW offline timetable."""
+
+from datetime import datetime, timedelta
+import zipfile
+
+import pytest
+from homeassistant.const import ATTR_MODE
+from homeassistant.util import dt as dt_util
+
+from custom_components.transport_nsw.const import ATTR_DESTINATION, ATTR_ROUTE
+from custom_components.transport_nsw.departures import Departure
+from custom_components.transport_nsw.timetable import (
+    GTFS_TIME_ZONE,
+    Timetable,
+    build_timetable,
+)
+
+GTFS_FILES = {
+    "routes.txt": """\
+route_id,agency_id,route_short_name,route_long_name,route_type
+T1,SydneyTrains,T1,North Shore & Western Line,2
+333,StateTransit,333,City to Bondi Beach,700
+""",
+    "calendar.txt": """\
+service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date
+WKDY,1,1,1,1,1,0,0,20260101,20261231
+WKND,0,0,0,0,0,1,1,20260101,20261231
+""",
+    "calendar_dates.txt": """\
+service_id,date,exception_type
+WKDY,20261019,2
+WKND,20261019,1
+""",
+    "trips.txt": """\
+route_id,service_id,trip_id,trip_headsign
+T1,WKDY,weekday,Emu Plains
+T1,WKND,weekend,Richmond
+333,WKDY,night,Bondi Beach
+""",
+    "stops.txt": """\
+stop_id,stop_name,location_type,parent_station
+200060,Central Station,1,
+2000321,"Central Station, Platform 21",0,200060
+2000330,"Central Station, Platform 30",0,200060
+""",
+    "stop_times.txt": """\
+trip_id,arrival_time,departure_time,stop_id,stop_sequence,pickup_type
+weekday,08:00:00,08:00:00,2000321,1,0
+weekday,08:10:00,08:10:00,2000330,2,1
+weekend,09:00:00,09:00:00,2000321,1,0
+night,24:30:00,24:30:00,2000321,1,0
+""",
+}
+
+
+def local_time(*args: int) -> datetime:
+    """Return a time in Sydney."""
+    return datetime(*args, tzinfo=dt_util.get_time_zone(GTFS_TIME_ZONE))
+
+
+@pytest.fixture
+def timetable(tmp_path):
+    """Return the timetable of a small GTFS bundle."""
+    bundle = tmp_path / "gtfs.zip"
+    with zipfile.ZipFile(bundle, "w") as gtfs:
+        for name, content in GTFS_FILES.items():
+            gtfs.writestr(name, content)
+    path = tmp_path / "timetable.idx"
+    build_timetable(bundle, path)
+    timetable = Timetable(path)
+    yield timetable
+    timetable.close()
+
+
+def destinations(departures):
+    """Return the destinations of departures."""
+    return [departure.destination for departure in departures]
+
+
+class TestTimetable:
+    """Test Timetable."""
+
+    def test_build_counts_stop_times(self, timetable):
+        """Test boardable stop times are counted under the stop and its station."""
+        assert len(timetable) == 6
+
+    def test_departures(self, timetable):
+        """Test departures are in the same format as the departure monitor."""
+        departures = timetable.departures("2000321", local_time(2026, 10, 15, 7, 30))
+
+        assert departures == [
+            Departure(
+                route="T1",
+                destination="Emu Plains",
+                mode="Train",
+                real_time="n",
+                delay=0,
+                departure_time=dt_util.as_utc(local_time(2026, 10, 15, 8)),
+            )
+        ]
+
+    def test_departures_within_horizon(self, timetable):
+        """Test departures beyond the horizon are left out."""
+        now = local_time(2026, 10, 15, 7, 30)
+
+        assert timetable.departures("2000321", now, timedelta(minutes=20)) == []
+        assert destinations(timetable.departures("2000321", now, timedelta(hours=24))) == [
+            "Emu Plains",
+            "Bondi Beach",
+        ]
+
+    def test_departed_services_are_left_out(self, timetable):
+        """Test departures that have already left are not returned."""
+        assert timetable.departures("2000321", local_time(2026, 10, 15, 8, 1)) == []
+
+    def test_weekend_services(self, timetable):
+        """Test services only run on the days of their calendar."""
+        departures = timetable.departures("2000321", local_time(2026, 10, 17, 7, 30))
+
+        assert destinations(departures) == ["Richmond"]
+
+    def test_calendar_exceptions(self, timetable):
+        """Test calendar dates add and remove services."""
+        departures = timetable.departures("2000321", local_time(2026, 10, 19, 7, 30))
+
+        assert destinations(departures) == ["Richmond"]
+
+    def test_trips_past_midnight(self, timetable):
+        """Test trips of the previous service day can depart after midnight."""
+        departures = timetable.departures("2000321", local_time(2026, 10, 16, 0, 15))
+
+        assert destinations(departures) == ["Bondi Beach"]
+        assert departures[0].mode == "Bus"
+        assert departures[0].departure_time == dt_util.as_utc(
+            local_time(2026, 10, 16, 0, 30)
+        )
+
+    @pytest.mark.parametrize(
+        "day",
+        [(2026, 4, 5), (2026, 10, 4)],
+        ids=["dst_ends", "dst_starts"],
+    )
+    def test_daylight_saving_change(self, timetable, day):
+        """Test times count from noon minus 12 hours on daylight saving days."""
+        before = timetable.departures("2000321", dt_util.as_utc(local_time(*day, 8, 30)))
+        after = timetable.departures("2000321", dt_util.as_utc(local_time(*day, 9, 15)))
+
+        assert destinations(before) == ["Richmond"]
+        assert before[0].departure_time == dt_util.as_utc(local_time(*day, 9))
+        assert after == []
+
+    def test_parent_station(self, timetable):
+        """Test a station lists the departures from its platforms."""
+        departures = timetable.departures("200060", local_time(2026, 10, 15, 7, 30))
+
+        assert destinations(departures) == ["Emu Plains"]
+
+    def test_no_pickup(self, timetable):
+        """Test stop times that can't be boarded are not departures."""
+        assert timetable.departures("2000330", local_time(2026, 10, 15, 8)) == []
+
+    def test_unknown_stop(self, timetable):
+        """Test a stop without departures has an empty timetable."""
+        assert timetable.departures("999999", local_time(2026, 10, 15, 7, 30)) == []
+
+    def test_invalid_file(self, tmp_path):
+        """Test a file that isn't a timetable is rejected."""
+        path = tmp_path / "timetable.idx"
+        path.write_bytes(b"\0" * 64)
+
+        with pytest.raises(ValueError):
+            Timetable(path)
+
+    def test_trip(self, timetable):
+        """Test trips are looked up by trip ID."""
+        assert timetable.trip("night") == {
+            ATTR_ROUTE: "333",
+            ATTR_DESTINATION: "Bondi Beach",
+            ATTR_MODE: "Bus",
+        }
+        assert timetable.trip("unknown") is None
+
+    def test_parent(self, timetable):
+        """Test the parent station of a platform is looked up."""
+        assert timetable.parent("2000321") == "200060"
+        assert timetable.parent("200060") is None
+        assert timetable.parent("999999") is None